@@ -0,0 +1,110 @@
+"""
+Allocation Engine for LastWish Crypto Inheritance
+Splits balances in integer base units by basis points with largest-remainder rounding
+"""
+
+from decimal import Decimal, InvalidOperation
+from typing import Iterable, List, Sequence, Union
+
+import numpy as np
+
+BASIS_POINTS = 10000
+
+# Largest total whose product with BASIS_POINTS still fits in int64
+_INT64_SAFE_QUOTIENT = np.iinfo(np.int64).max // BASIS_POINTS
+
+Number = Union[int, float, str, Decimal]
+
+def _to_decimal(value: Number) -> Decimal:
+    try:
+        # str() first so floats keep the value the user typed (e.g. 33.33, not 33.3299999...)
+        parsed = Decimal(str(value))
+    except (InvalidOperation, ValueError):
+        raise ValueError(f'Invalid allocation percentage: {value}')
+    # NaN and Infinity parse, but NaN comparisons raise InvalidOperation further on
+    if not parsed.is_finite():
+        raise ValueError(f'Invalid allocation percentage: {value}')
+    return parsed
+
+def validate_allocations(percentages: Iterable[Number]) -> bool:
+    """Return whether the percentages are finite numbers, non-negative and total exactly 100"""
+    try:
+        values = [_to_decimal(p) for p in percentages]
+    except ValueError:
+        return False
+    return bool(values) and all(v >= 0 for v in values) and sum(values) == Decimal('100')
+
+def _largest_remainder(base: np.ndarray, remainders: np.ndarray, leftover: np.ndarray) -> np.ndarray:
+    """Add one unit to the `leftover` entries with the largest remainders in each row (ties go to the earlier index)"""
+    order = np.argsort(-remainders, axis=-1, kind='stable')
+    ranks = np.empty_like(order)
+    np.put_along_axis(ranks, order, np.arange(order.shape[-1]), axis=-1)
+    return base + (ranks < np.expand_dims(leftover, -1))
+
+def apportion(total: int, weights: Sequence[int]) -> np.ndarray:
+    """Split an integer total in proportion to integer weights so the parts sum exactly to total"""
+    weights = np.asarray([int(w) for w in weights], dtype=object)
+    weight_sum = int(weights.sum())
+    if weight_sum <= 0:
+        raise ValueError('Weights must sum to a positive value')
+
+    # Python-int object arrays: wei totals times arbitrary weights exceed int64
+    products = weights * int(total)
+    base = products // weight_sum
+    remainders = products % weight_sum
+    leftover = np.asarray(int(total) - int(base.sum()))
+    return _largest_remainder(base, remainders, leftover)
+
+def allocate_basis_points(percentages: Sequence[Number]) -> np.ndarray:
+    """Convert percentages totalling 100 into int64 basis points totalling exactly 10000"""
+    values = [_to_decimal(p) for p in percentages]
+    if not validate_allocations(values):
+        raise ValueError('Allocations must be non-negative and total 100%')
+
+    # Scale every percentage to an integer at the finest precision given, then apportion 10000 bp
+    exponent = max(0, -min(v.as_tuple().exponent for v in values))
+    scaled = [int(v.scaleb(exponent)) for v in values]
+    if exponent <= 2:
+        return np.asarray(scaled, dtype=np.int64) * (10 ** (2 - exponent))
+    return apportion(BASIS_POINTS, scaled).astype(np.int64)
+
+def split_by_basis_points(totals: Union[int, Sequence[int]], basis_points: Sequence[int]) -> np.ndarray:
+    """Split one total (or each of many) by basis points; every row sums exactly to its total
+
+    Returns a 1-D array for a single total, or a (len(totals), len(basis_points)) array.
+    The remainder math stays in int64 because each total is divided by 10000 first.
+    """
+    single = np.isscalar(totals)
+    totals_list = [int(totals)] if single else [int(t) for t in totals]
+    bps = np.asarray(basis_points, dtype=np.int64)
+    if int(bps.sum()) != BASIS_POINTS or (bps < 0).any():
+        raise ValueError('Basis points must be non-negative and total 10000')
+
+    # total = q * 10000 + r, so share_i = q * bp_i + (r * bp_i) / 10000 exactly
+    quotients, residues = zip(*(divmod(t, BASIS_POINTS) for t in totals_list))
+    residues = np.asarray(residues, dtype=np.int64)
+
+    products = residues[:, None] * bps[None, :]
+    small = products // BASIS_POINTS
+    remainders = products % BASIS_POINTS
+    leftover = residues - small.sum(axis=1)
+
+    if max(quotients) <= _INT64_SAFE_QUOTIENT:
+        large = np.asarray(quotients, dtype=np.int64)[:, None] * bps[None, :]
+    else:
+        large = np.asarray(quotients, dtype=object)[:, None] * bps.astype(object)[None, :]
+
+    shares = _largest_remainder(large + small, remainders, leftover)
+    return shares[0] if single else shares
+
+def to_base_units(amount: Number, decimals: int = 18) -> int:
+    """Convert a decimal token amount to integer base units (e.g. ETH to wei), truncating dust"""
+    return int(_to_decimal(amount).scaleb(decimals))
+
+def from_base_units(amount: int, decimals: int = 18) -> Decimal:
+    """Convert integer base units back to a decimal token amount"""
+    return Decimal(int(amount)).scaleb(-decimals)
+
+def shares_to_list(shares: np.ndarray) -> List[int]:
+    """Plain Python ints, safe for JSON and web3"""
+    return [int(share) for share in shares]
@@ -0,0 +1,63 @@
+"""
+Allocation Benchmark for LastWish Crypto Inheritance
+Compares the per-beneficiary Decimal/float loops with the vectorized basis-point engine
+
+Usage: python allocation_benchmark.py [beneficiaries] [assets]
+"""
+
+import random
+import sys
+import time
+from decimal import Decimal
+
+from utils.allocation import allocate_basis_points, split_by_basis_points, to_base_units
+
+def random_percentages(count: int, rng: random.Random) -> list:
+    """Percentages with two decimals that total exactly 100"""
+    weights = [rng.randint(1, 1000) for _ in range(count)]
+    total = sum(weights)
+    cents = [w * 10000 // total for w in weights]
+    cents[0] += 10000 - sum(cents)
+    return [c / 100 for c in cents]
+
+def decimal_loop(balances: list, percentages: list):
+    """The previous approach: Decimal per share, float per transfer, int(pct * 100) per contract slot"""
+    basis_points = [int(p * 100) for p in percentages]
+    shares = []
+    for balance in balances:
+        amounts = [float(balance * Decimal(str(p)) / Decimal('100')) for p in percentages]
+        shares.append([int(Decimal(str(a)) * Decimal('10') ** 18) for a in amounts])
+    return basis_points, shares
+
+def vectorized(balances: list, percentages: list):
+    basis_points = allocate_basis_points(percentages)
+    shares = split_by_basis_points([to_base_units(b) for b in balances], basis_points)
+    return basis_points, shares
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+def main():
+    beneficiaries = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    assets = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+
+    rng = random.Random(42)
+    percentages = random_percentages(beneficiaries, rng)
+    balances = [Decimal(rng.randint(1, 10 ** 24)) / Decimal('10') ** 18 for _ in range(assets)]
+    totals = [to_base_units(b) for b in balances]
+
+    (old_bps, old_shares), old_time = timed(decimal_loop, balances, percentages)
+    (new_bps, new_shares), new_time = timed(vectorized, balances, percentages)
+
+    old_drift = sum(abs(total - sum(row)) for total, row in zip(totals, old_shares))
+    new_drift = sum(abs(total - int(sum(int(s) for s in row))) for total, row in zip(totals, new_shares))
+
+    print(f"{beneficiaries} beneficiaries x {assets} assets")
+    print(f"  decimal loop: {old_time:8.3f}s  basis points total {sum(old_bps)}  wei drift {old_drift}")
+    print(f"  vectorized:   {new_time:8.3f}s  basis points total {int(new_bps.sum())}  wei drift {new_drift}")
+    print(f"  speedup:      {old_time / new_time:8.1f}x")
+
+if __name__ == '__main__':
+    main()
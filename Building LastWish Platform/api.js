@@ -108,6 +108,17 @@ export const updateCryptoAsset = (assetId, cryptoAssetData) =>
     body: cryptoAssetData,
   })
 
+// Market Data (served from the backend's price cache rather than external price APIs)
+export const getMarketPrices = (symbols) =>
+  apiRequest(`/market/prices?symbols=${encodeURIComponent(symbols.join(','))}`)
+
+export const getMarketChart = (symbol, { resolution = '1h', start, end } = {}) => {
+  const params = new URLSearchParams({ resolution })
+  if (start !== undefined) params.set('start', start)
+  if (end !== undefined) params.set('end', end)
+  return apiRequest(`/market/${encodeURIComponent(symbol)}/chart?${params}`)
+}
+
 // Beneficiary Management
 export const getBeneficiaries = () => apiRequest('/estate/beneficiaries')
 
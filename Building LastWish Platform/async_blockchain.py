@@ -0,0 +1,290 @@
+"""
+Async Blockchain Engine for LastWish Crypto Inheritance
+Fans out balance, gas and contract-status queries across networks concurrently
+"""
+
+import asyncio
+import concurrent.futures
+import threading
+import time
+import logging
+from decimal import Decimal
+from typing import Any, Awaitable, Dict, List, Tuple
+
+import aiohttp
+from web3 import Web3
+
+from utils.rpc_connections import build_batch_payload, get_connection_registry, parse_batch_response
+from utils.multicall import MULTICALL3_ADDRESS, ContractCall, decode_aggregate3, decode_call_results, encode_aggregate3
+
+logger = logging.getLogger(__name__)
+
+class AsyncBlockchainEngine:
+    """Runs RPC work on a dedicated event loop with per-network concurrency caps"""
+
+    def __init__(
+        self,
+        networks: Dict[str, Dict],
+        max_concurrency_per_network: int = 8,
+        deadline: float = 10.0,
+        request_timeout: float = 8.0
+    ):
+        self.networks = networks
+        self.max_concurrency_per_network = max_concurrency_per_network
+        self.deadline = deadline
+        self.request_timeout = request_timeout
+
+        self._loop = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+        # Loop-bound resources, created lazily on the engine loop
+        self._sessions: Dict[str, aiohttp.ClientSession] = {}
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        if self._loop and self._thread and self._thread.is_alive():
+            return self._loop
+
+        with self._lock:
+            if self._loop and self._thread and self._thread.is_alive():
+                return self._loop
+            loop = asyncio.new_event_loop()
+            self._thread = threading.Thread(target=loop.run_forever, name='async-blockchain', daemon=True)
+            self._thread.start()
+            self._loop = loop
+            return loop
+
+    def run_sync(self, coroutine: Awaitable, deadline: float = None) -> Any:
+        """Run a coroutine on the engine loop and wait for it from synchronous code (e.g. Flask routes)
+
+        deadline must be the one the coroutine was given, so the wait matches the work.
+        """
+        loop = self._ensure_loop()
+        future = asyncio.run_coroutine_threadsafe(coroutine, loop)
+        # The coroutines enforce the deadline themselves; the margin only guards against a stuck loop
+        try:
+            return future.result(timeout=(deadline or self.deadline) + 5)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise
+
+    async def _get_session(self, network: str) -> aiohttp.ClientSession:
+        session = self._sessions.get(network)
+        if session is None or session.closed:
+            connector = aiohttp.TCPConnector(limit_per_host=self.max_concurrency_per_network, keepalive_timeout=60)
+            session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.request_timeout)
+            )
+            self._sessions[network] = session
+        return session
+
+    async def _post(self, network: str, payload: Any) -> Any:
+        """POST a JSON-RPC payload through the network's endpoint pool, failing over in latency order
+
+        Outcomes are recorded on the pool's endpoints, so async traffic shares the sync path's
+        latency ranking and circuit breakers.
+        """
+        pool = get_connection_registry().get_endpoint_pool(network)
+        if pool is None:
+            raise ConnectionError(f'Unsupported network: {network}')
+        candidates = pool.ranked_endpoints()
+        if not candidates:
+            raise ConnectionError(f'No available RPC endpoints for {network}')
+
+        session = await self._get_session(network)
+        errors = []
+        for endpoint in candidates:
+            # Ranking only reads circuit state; the half-open trial is claimed here, just before sending
+            if not endpoint.try_acquire():
+                errors.append(f'{endpoint.url}: circuit open')
+                continue
+            start = time.monotonic()
+            try:
+                async with session.post(endpoint.url, json=payload) as response:
+                    response.raise_for_status()
+                    body = await response.json(content_type=None)
+            except asyncio.CancelledError:
+                # Cut off by the caller's deadline; still settle the endpoint so a half-open circuit can retry
+                endpoint.record_failure('Deadline exceeded')
+                raise
+            except Exception as e:
+                endpoint.record_failure(str(e))
+                errors.append(f'{endpoint.url}: {str(e)}')
+                continue
+            endpoint.record_success(time.monotonic() - start)
+            return body
+
+        raise ConnectionError(f"All RPC endpoints failed for {network}: {'; '.join(errors)}")
+
+    async def _call(self, network: str, method: str, params: List[Any]) -> Any:
+        """Send a single JSON-RPC call and return its result"""
+        response = parse_batch_response(await self._post(network, build_batch_payload([(method, params)])), 1)[0]
+        if response['error']:
+            raise ValueError(response['error'])
+        return response['result']
+
+    def _get_semaphore(self, network: str) -> asyncio.Semaphore:
+        semaphore = self._semaphores.get(network)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.max_concurrency_per_network)
+            self._semaphores[network] = semaphore
+        return semaphore
+
+    async def _limited(self, network: str, coroutine: Awaitable) -> Any:
+        async with self._get_semaphore(network):
+            return await coroutine
+
+    async def _gather_with_deadline(self, jobs: Dict[Any, Awaitable], deadline: float = None) -> Dict[Any, Dict]:
+        """Run keyed jobs concurrently and return {'result', 'error'} per key within one total deadline"""
+        deadline = deadline or self.deadline
+        tasks = {asyncio.ensure_future(job): key for key, job in jobs.items()}
+        if not tasks:
+            return {}
+
+        done, pending = await asyncio.wait(tasks.keys(), timeout=deadline)
+        for task in pending:
+            task.cancel()
+
+        results = {}
+        for task, key in tasks.items():
+            if task in pending:
+                results[key] = {'result': None, 'error': 'Deadline exceeded'}
+            elif task.exception() is not None:
+                results[key] = {'result': None, 'error': str(task.exception())}
+            else:
+                results[key] = {'result': task.result(), 'error': None}
+        return results
+
+    async def _post_balance_batch(self, network: str, addresses: List[str], block_identifier: str = 'latest') -> List[Dict]:
+        calls = [('eth_getBalance', [address, block_identifier]) for address in addresses]
+        return parse_batch_response(await self._post(network, build_batch_payload(calls)), len(calls))
+
+    async def get_balances_async(
+        self,
+        queries: Dict[str, List[str]],
+        deadline: float = None,
+        block_identifiers: Dict[str, str] = None
+    ) -> Dict[str, List[Dict]]:
+        """Fetch native balances for {network: [addresses]}, one batch chunk per concurrent request"""
+        block_identifiers = block_identifiers or {}
+        results = {
+            network: [{'address': address, 'balance': None, 'error': None} for address in addresses]
+            for network, addresses in queries.items()
+        }
+
+        jobs = {}
+        for network, addresses in queries.items():
+            if network not in self.networks:
+                for result in results[network]:
+                    result['error'] = f'Unsupported network: {network}'
+                continue
+
+            valid = [(i, Web3.to_checksum_address(a)) for i, a in enumerate(addresses) if Web3.is_address(a)]
+            for index, address in enumerate(addresses):
+                if not Web3.is_address(address):
+                    results[network][index]['error'] = 'Invalid wallet address'
+
+            batch_limit = self.networks[network].get('batch_limit', 100)
+            for start in range(0, len(valid), batch_limit):
+                chunk = valid[start:start + batch_limit]
+                jobs[(network, tuple(i for i, _ in chunk))] = self._limited(
+                    network,
+                    self._post_balance_batch(network, [a for _, a in chunk], block_identifiers.get(network, 'latest'))
+                )
+
+        outcomes = await self._gather_with_deadline(jobs, deadline)
+
+        for (network, positions), outcome in outcomes.items():
+            responses = outcome['result'] or [{'result': None, 'error': outcome['error']} for _ in positions]
+            for index, response in zip(positions, responses):
+                if response['error']:
+                    results[network][index]['error'] = response['error']
+                    continue
+                try:
+                    results[network][index]['balance'] = Decimal(int(response['result'], 16)) / Decimal('10') ** 18
+                except (TypeError, ValueError) as e:
+                    results[network][index]['error'] = f'Malformed balance response: {str(e)}'
+
+        return results
+
+    async def get_gas_prices_async(self, networks: List[str], deadline: float = None) -> Dict[str, Dict]:
+        """Fetch the current gas price on every network concurrently"""
+        async def fetch(network):
+            return int(await self._call(network, 'eth_gasPrice', []), 16)
+
+        jobs = {network: self._limited(network, fetch(network)) for network in networks if network in self.networks}
+        results = await self._gather_with_deadline(jobs, deadline)
+        for network in networks:
+            results.setdefault(network, {'result': None, 'error': f'Unsupported network: {network}'})
+        return results
+
+    async def get_contract_views_async(
+        self,
+        requests: List[Tuple[str, Dict[str, ContractCall]]],
+        deadline: float = None
+    ) -> List[Dict]:
+        """Run one Multicall3 aggregate per (network, named calls) request, all concurrently"""
+        async def fetch(network, calls):
+            keys = list(calls.keys())
+            ordered = [calls[key] for key in keys]
+            data = await self._call(network, 'eth_call', [
+                {'to': MULTICALL3_ADDRESS, 'data': Web3.to_hex(encode_aggregate3(ordered))}, 'latest'
+            ])
+            return dict(zip(keys, decode_call_results(ordered, decode_aggregate3(Web3.to_bytes(hexstr=data)))))
+
+        jobs = {
+            index: self._limited(network, fetch(network, calls))
+            for index, (network, calls) in enumerate(requests)
+            if network in self.networks
+        }
+        outcomes = await self._gather_with_deadline(jobs, deadline)
+        return [
+            outcomes.get(index, {'result': None, 'error': f'Unsupported network: {network}'})
+            for index, (network, _) in enumerate(requests)
+        ]
+
+    def get_balances(
+        self,
+        queries: Dict[str, List[str]],
+        deadline: float = None,
+        block_identifiers: Dict[str, str] = None
+    ) -> Dict[str, List[Dict]]:
+        """Synchronous wrapper around get_balances_async"""
+        return self.run_sync(self.get_balances_async(queries, deadline, block_identifiers), deadline)
+
+    def get_gas_prices(self, networks: List[str], deadline: float = None) -> Dict[str, Dict]:
+        """Synchronous wrapper around get_gas_prices_async"""
+        return self.run_sync(self.get_gas_prices_async(networks, deadline), deadline)
+
+    def get_contract_views(self, requests: List[Tuple[str, Dict[str, ContractCall]]], deadline: float = None) -> List[Dict]:
+        """Synchronous wrapper around get_contract_views_async"""
+        return self.run_sync(self.get_contract_views_async(requests, deadline), deadline)
+
+    def shutdown(self):
+        """Close every aiohttp session and stop the engine loop"""
+        if not self._loop:
+            return
+
+        async def close_sessions():
+            for session in self._sessions.values():
+                await session.close()
+            self._sessions.clear()
+
+        asyncio.run_coroutine_threadsafe(close_sessions(), self._loop).result(timeout=5)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+        self._loop = None
+
+_engine = None
+_engine_lock = threading.Lock()
+
+def get_async_engine(networks: Dict[str, Dict]) -> AsyncBlockchainEngine:
+    """Return the process-wide async engine"""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = AsyncBlockchainEngine(networks)
+    return _engine
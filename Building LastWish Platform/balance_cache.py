@@ -0,0 +1,197 @@
+"""
+Block-Aware Balance Cache for LastWish Crypto Inheritance
+Tags cached balances with the block they were read at and expires them as the chain head advances
+"""
+
+import threading
+import logging
+from decimal import Decimal
+from typing import Dict, Optional, Tuple
+
+from utils.rpc_connections import get_connection_registry
+
+logger = logging.getLogger(__name__)
+
+# Seconds between eth_blockNumber polls, roughly one block time per network
+DEFAULT_POLL_INTERVALS = {
+    'ethereum': 12,
+    'polygon': 2,
+    'binance_smart_chain': 3,
+    'avalanche': 2
+}
+
+class BlockHeadWatcher:
+    """Follows the chain head of every network with cheap eth_blockNumber polls"""
+
+    def __init__(self, poll_intervals: Dict[str, float] = None):
+        self.poll_intervals = dict(DEFAULT_POLL_INTERVALS, **(poll_intervals or {}))
+        self.connections = get_connection_registry()
+
+        self._heads: Dict[str, int] = {}
+        self._listeners = []
+        self._threads: Dict[str, threading.Thread] = {}
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+
+    def add_listener(self, listener):
+        """Register a callable(network, head) invoked whenever a head advances"""
+        self._listeners.append(listener)
+
+    def watch(self, network: str):
+        """Start following a network if it is not already being followed"""
+        thread = self._threads.get(network)
+        if thread and thread.is_alive():
+            return
+
+        with self._lock:
+            thread = self._threads.get(network)
+            if thread and thread.is_alive():
+                return
+            thread = threading.Thread(
+                target=self._poll_loop,
+                args=(network,),
+                name=f'block-head-{network}',
+                daemon=True
+            )
+            self._threads[network] = thread
+            thread.start()
+
+    def get_head(self, network: str) -> Optional[int]:
+        """Return the last observed head block for a network, starting the watcher if needed"""
+        self.watch(network)
+        return self._heads.get(network)
+
+    def _poll_loop(self, network: str):
+        interval = self.poll_intervals.get(network, 5)
+        while not self._stop_event.is_set():
+            try:
+                self.poll(network)
+            except Exception as e:
+                logger.error(f"Error polling block number on {network}: {str(e)}")
+            self._stop_event.wait(interval)
+
+    def poll(self, network: str) -> Optional[int]:
+        """Read eth_blockNumber once and notify listeners if the head advanced"""
+        w3 = self.connections.get_connection(network)
+        if not w3:
+            return None
+
+        head = w3.eth.block_number
+        previous = self._heads.get(network)
+        if previous is None or head > previous:
+            self._heads[network] = head
+            for listener in self._listeners:
+                try:
+                    listener(network, head)
+                except Exception as e:
+                    logger.error(f"Block head listener failed on {network}: {str(e)}")
+        return head
+
+    def stop(self):
+        """Stop every polling thread"""
+        self._stop_event.set()
+        for thread in self._threads.values():
+            thread.join(timeout=5)
+
+class BalanceCache:
+    """Caches balances keyed by (network, address, token) together with the block they were read at"""
+
+    def __init__(self, watcher: BlockHeadWatcher, confirmation_depths: Dict[str, int] = None, default_depth: int = 0):
+        self.watcher = watcher
+        self.confirmation_depths = confirmation_depths or {}
+        self.default_depth = default_depth
+
+        # (network, address, token) -> (balance, block_number)
+        self._entries: Dict[Tuple[str, str, Optional[str]], Tuple[Decimal, int]] = {}
+        self._lock = threading.Lock()
+
+        watcher.add_listener(self._on_new_head)
+
+    @staticmethod
+    def _key(network: str, address: str, token_contract: Optional[str]) -> Tuple[str, str, Optional[str]]:
+        return network, address.lower(), token_contract.lower() if token_contract else None
+
+    def get_depth(self, network: str) -> int:
+        return self.confirmation_depths.get(network, self.default_depth)
+
+    def get_head(self, network: str) -> Optional[int]:
+        return self.watcher.get_head(network)
+
+    def get(
+        self,
+        network: str,
+        address: str,
+        token_contract: Optional[str] = None,
+        block_number: Optional[int] = None
+    ) -> Optional[Tuple[Decimal, int]]:
+        """Return (balance, block) if still valid; pass block_number to require an exact block"""
+        with self._lock:
+            entry = self._entries.get(self._key(network, address, token_contract))
+        if entry is None:
+            return None
+
+        if block_number is not None:
+            return entry if entry[1] == block_number else None
+
+        head = self.watcher.get_head(network)
+        if head is None or head - entry[1] > self.get_depth(network):
+            return None
+        return entry
+
+    def put(
+        self,
+        network: str,
+        address: str,
+        balance: Decimal,
+        block_number: int,
+        token_contract: Optional[str] = None
+    ):
+        """Store a balance read at a known block, never replacing a newer read"""
+        key = self._key(network, address, token_contract)
+        with self._lock:
+            existing = self._entries.get(key)
+            if existing is None or existing[1] <= block_number:
+                self._entries[key] = (balance, block_number)
+
+    def clear(self, network: Optional[str] = None):
+        """Drop every cached balance, or only one network's"""
+        with self._lock:
+            if network is None:
+                self._entries.clear()
+            else:
+                for key in [key for key in self._entries if key[0] == network]:
+                    del self._entries[key]
+
+    def _on_new_head(self, network: str, head: int):
+        """Drop entries that fell behind the confirmation depth so memory stays bounded"""
+        depth = self.get_depth(network)
+        with self._lock:
+            expired = [
+                key for key, (_, block_number) in self._entries.items()
+                if key[0] == network and head - block_number > depth
+            ]
+            for key in expired:
+                del self._entries[key]
+
+_watcher = None
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_block_watcher() -> BlockHeadWatcher:
+    """Return the process-wide block head watcher"""
+    global _watcher
+    if _watcher is None:
+        with _cache_lock:
+            if _watcher is None:
+                _watcher = BlockHeadWatcher()
+    return _watcher
+
+def get_balance_cache() -> BalanceCache:
+    """Return the process-wide balance cache, following heads with the shared watcher"""
+    global _cache
+    if _cache is None:
+        watcher = get_block_watcher()
+        with _cache_lock:
+            if _cache is None:
+                _cache = BalanceCache(watcher)
+    return _cache
@@ -0,0 +1,274 @@
+"""
+Blockchain Benchmark for LastWish Crypto Inheritance
+Runs balance fan-out, contract reads, deployment and multi-beneficiary execution against the in-process dev chain,
+reporting latency and JSON-RPC traffic so regressions show up without a live network
+
+Usage: python blockchain_benchmark.py [--iterations N] [--contracts N] [--beneficiaries N]
+                                      [--save results.json] [--baseline results.json] [--tolerance 0.25]
+                                      [--record rpc.jsonl.gz | --replay rpc.jsonl.gz --latency-ms 80 --jitter-ms 30]
+
+--record captures the scenarios' JSON-RPC traffic; --replay serves it back at the given provider latency
+instead of the dev chain, so runs are repeatable at realistic round-trip times.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+# Must be set before the blockchain modules read it
+os.environ['BLOCKCHAIN_PROVIDER'] = 'dev'
+
+from cryptography.fernet import Fernet
+
+from utils.blockchain_integration import (
+    BlockchainManager, CryptoTransferManager, InheritanceSmartContract, encrypt_sensitive_data
+)
+from utils.dev_chain import get_dev_chain
+from utils.disperse import DISPERSE_ADDRESS
+from utils.multicall import MULTICALL3_ADDRESS
+from utils.rpc_cassette import RpcCassette, configure_rpc_cassette
+
+NETWORK = 'ethereum'
+
+# Polled by the head watcher, gas oracle and health checks on their own timers, so their counts depend on
+# wall time; they are reported but left out of the totals compared against a baseline
+BACKGROUND_METHODS = {'eth_blockNumber', 'eth_feeHistory', 'eth_gasPrice', 'web3_clientVersion'}
+
+class DevChainTraffic:
+    """RPC counters kept by the dev chains themselves"""
+
+    def reset(self, networks):
+        for network in networks:
+            get_dev_chain(network).reset_rpc_stats()
+
+    def stats(self, network: str) -> dict:
+        return get_dev_chain(network).get_rpc_stats()
+
+class CassetteTraffic:
+    """RPC counters kept by the cassette, which sees the traffic instead of the dev chains while replaying"""
+
+    def __init__(self, cassette: RpcCassette):
+        self.cassette = cassette
+
+    def reset(self, networks):
+        self.cassette.reset_stats()
+
+    def stats(self, network: str) -> dict:
+        return self.cassette.get_stats().get(network, {'requests': {}, 'methods': {}, 'misses': 0})
+
+def rpc_totals(traffic, networks) -> dict:
+    """Sum the RPC counters of every network touched by a scenario, excluding background polling"""
+    totals = {'http_requests': 0, 'rpc_calls': 0, 'methods': {}, 'background_calls': 0, 'misses': 0}
+    for network in networks:
+        stats = traffic.stats(network)
+        totals['misses'] += stats.get('misses', 0)
+        totals['http_requests'] += sum(
+            count for kind, count in stats['requests'].items() if kind not in BACKGROUND_METHODS
+        )
+        for method, count in stats['methods'].items():
+            if method in BACKGROUND_METHODS:
+                totals['background_calls'] += count
+                continue
+            totals['rpc_calls'] += count
+            totals['methods'][method] = totals['methods'].get(method, 0) + count
+    return totals
+
+def run_scenario(run, networks, traffic, iterations: int) -> dict:
+    """Time `run` and record the RPC traffic of its last iteration; counts should not vary between iterations"""
+    timings = []
+    for iteration in range(iterations):
+        traffic.reset(networks)
+        start = time.perf_counter()
+        run(iteration)
+        timings.append(time.perf_counter() - start)
+
+    result = rpc_totals(traffic, networks)
+    result['median_ms'] = round(statistics.median(timings) * 1000, 2)
+    result['max_ms'] = round(max(timings) * 1000, 2)
+    return result
+
+class WalletCursor:
+    """Hands out each dev wallet once, so scenarios that spend never share a sender or nonce"""
+
+    def __init__(self, wallets):
+        self._wallets = iter(wallets)
+
+    def take(self):
+        wallet = next(self._wallets, None)
+        if wallet is None:
+            raise RuntimeError('Ran out of dev wallets; raise DEV_CHAIN_WALLETS')
+        return wallet
+
+def build_scenarios(args, manager: BlockchainManager) -> tuple:
+    """Return ({name: (run, networks)}, {name: skip reason})"""
+    chain = get_dev_chain(NETWORK)
+    contract_manager = InheritanceSmartContract(manager)
+    transfer_manager = CryptoTransferManager(manager)
+    encryption_key = Fernet.generate_key().decode()
+
+    # Contract owners first, beneficiaries last, spenders from the middle
+    wallets = chain.wallets
+    addresses = [wallet.address for wallet in wallets]
+    beneficiaries = [
+        {'beneficiary_name': f'Beneficiary {index}', 'crypto_wallet_address': wallet.address,
+         'wallet_address': wallet.address, 'allocation_percentage': 100 / args.beneficiaries}
+        for index, wallet in enumerate(wallets[-args.beneficiaries:])
+    ]
+    # Percentages must total exactly 100; put the rounding on the first beneficiary
+    for beneficiary in beneficiaries:
+        beneficiary['allocation_percentage'] = round(beneficiary['allocation_percentage'], 2)
+    beneficiaries[0]['allocation_percentage'] = round(
+        100 - sum(b['allocation_percentage'] for b in beneficiaries[1:]), 2
+    )
+    spenders = WalletCursor(wallets[args.contracts:-args.beneficiaries])
+
+    scenarios = {}
+    skipped = {}
+
+    def balance_fanout(_):
+        manager.balance_cache.clear()
+        results = manager.get_wallet_balances(addresses, NETWORK)
+        assert all(r['balance'] is not None for r in results), 'balance fan-out returned errors'
+    scenarios['balance_fanout'] = (balance_fanout, [NETWORK])
+
+    def multichain_balances(_):
+        manager.balance_cache.clear()
+        results = manager.get_multichain_balances({network: addresses for network in manager.networks})
+        assert all(r['balance'] is not None for rows in results.values() for r in rows), 'multi-chain balances returned errors'
+    if args.record or args.replay:
+        skipped['multichain_balances'] = 'the async engine uses aiohttp, which the cassette does not see'
+    else:
+        scenarios['multichain_balances'] = (multichain_balances, list(manager.networks))
+
+    if not chain.has_code(MULTICALL3_ADDRESS):
+        skipped['contract_reads'] = skipped['token_balances'] = 'Multicall3 could not be compiled for the dev chain'
+    else:
+        try:
+            tokens = chain.seed_tokens(count=3)
+            def token_balances(_):
+                balances = manager.get_token_balances(addresses, tokens, NETWORK)
+                assert all(v is not None for holders in balances.values() for v in holders.values()), 'token balances missing'
+            scenarios['token_balances'] = (token_balances, [NETWORK])
+        except Exception as e:
+            skipped['token_balances'] = f'Could not seed tokens: {str(e)}'
+
+    try:
+        artifact = contract_manager.get_contract_artifact()
+    except Exception as e:
+        artifact = None
+        skipped['contract_reads'] = skipped['deployment'] = f'CryptoInheritance could not be compiled: {str(e)}'
+
+    if artifact:
+        if 'contract_reads' not in skipped:
+            contracts = chain.seed_inheritance_contracts(artifact, args.contracts, args.beneficiaries)
+            def contract_reads(_):
+                statuses = contract_manager.check_contract_statuses(contracts)
+                assert all(s['status'] != 'error' for s in statuses), 'contract reads returned errors'
+            scenarios['contract_reads'] = (contract_reads, [NETWORK])
+
+        def deployment(_):
+            owner = spenders.take()
+            info = contract_manager.deploy_inheritance_contract(NETWORK, owner.key.hex(), beneficiaries, 365, 30)
+            assert info is not None, 'deployment failed'
+        scenarios['deployment'] = (deployment, [NETWORK])
+
+    def execution(mode):
+        def run(_):
+            sender = spenders.take()
+            prepared = transfer_manager.prepare_inheritance_transfer(
+                sender.address, '', beneficiaries, NETWORK, execution_mode=mode
+            )
+            assert prepared['success'], prepared.get('error')
+            encrypted_key = encrypt_sensitive_data(sender.key.hex(), encryption_key)
+            executed = transfer_manager.execute_inheritance_transfer(prepared['transfer_plan'], encrypted_key, encryption_key)
+            assert executed['success'], executed.get('error')
+            summary = executed['execution_summary']
+            assert summary['successful_transfers'] == len(beneficiaries), f'{summary["failed_transfers"]} transfers failed'
+        return run
+
+    scenarios['execute_per_transfer'] = (execution('per_transfer'), [NETWORK])
+    if chain.has_code(DISPERSE_ADDRESS):
+        scenarios['execute_batched'] = (execution('batched'), [NETWORK])
+    else:
+        skipped['execute_batched'] = 'Disperse could not be compiled for the dev chain'
+
+    return scenarios, skipped
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Regressions against a saved run: any extra round trip or RPC call, or latency beyond the tolerance"""
+    regressions = []
+    for name, result in results.items():
+        previous = baseline.get(name)
+        if not previous:
+            continue
+        for key in ('http_requests', 'rpc_calls'):
+            if result[key] > previous[key]:
+                regressions.append(f'{name}: {key} {previous[key]} -> {result[key]}')
+        if result['median_ms'] > previous['median_ms'] * (1 + tolerance):
+            regressions.append(f'{name}: median {previous["median_ms"]}ms -> {result["median_ms"]}ms')
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=5)
+    parser.add_argument('--contracts', type=int, default=50)
+    parser.add_argument('--beneficiaries', type=int, default=10)
+    parser.add_argument('--save', help='write results to this JSON file')
+    parser.add_argument('--baseline', help='compare against a JSON file written by --save')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed median latency increase')
+    cassette_group = parser.add_mutually_exclusive_group()
+    cassette_group.add_argument('--record', help='record JSON-RPC traffic to this cassette file')
+    cassette_group.add_argument('--replay', help='replay JSON-RPC traffic from this cassette file')
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='injected latency per replayed request')
+    parser.add_argument('--jitter-ms', type=float, default=0.0, help='uniform jitter either side of the latency')
+    args = parser.parse_args()
+
+    # The cassette has to be in place before the manager builds its connections
+    traffic = DevChainTraffic()
+    if args.record or args.replay:
+        cassette = configure_rpc_cassette(
+            args.record or args.replay,
+            RpcCassette.RECORD if args.record else RpcCassette.REPLAY,
+            latency=args.latency_ms / 1000,
+            jitter=args.jitter_ms / 1000
+        )
+        traffic = CassetteTraffic(cassette)
+
+    start = time.perf_counter()
+    manager = BlockchainManager()
+    scenarios, skipped = build_scenarios(args, manager)
+    print(f"dev chains ready in {time.perf_counter() - start:.1f}s "
+          f"({len(get_dev_chain(NETWORK).wallets)} wallets, {args.contracts} contracts, {args.beneficiaries} beneficiaries)")
+
+    results = {}
+    print(f"{'scenario':24} {'median ms':>10} {'max ms':>10} {'http':>6} {'rpc':>6} {'polls':>6}  methods")
+    for name, (run, networks) in scenarios.items():
+        result = run_scenario(run, networks, traffic, args.iterations)
+        results[name] = result
+        methods = ', '.join(f'{m}={c}' for m, c in sorted(result['methods'].items()))
+        print(f"{name:24} {result['median_ms']:10.2f} {result['max_ms']:10.2f} "
+              f"{result['http_requests']:6} {result['rpc_calls']:6} {result['background_calls']:6}  {methods}")
+        if result['misses']:
+            print(f"{'':24} {result['misses']} calls had no recorded response")
+    for name, reason in skipped.items():
+        print(f"{name:24} skipped: {reason}")
+
+    manager.async_engine.shutdown()
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -3,17 +3,37 @@ Blockchain Integration Utilities for LastWish Crypto Inheritance
 Handles smart contract deployment, wallet interactions, and automated transfers
 """
 
+import calendar
 import json
+import threading
 import time
 from datetime import datetime, timedelta
 from decimal import Decimal
 from typing import Dict, List, Optional, Tuple
 from web3 import Web3
+from web3.exceptions import TransactionNotFound
 from eth_account import Account
 from cryptography.fernet import Fernet
 import requests
 import logging
 
+from utils.rpc_connections import get_connection_registry
+from utils.multicall import MULTICALL3_ADDRESS, ContractCall, Multicall3Aggregator
+from utils.token_metadata import get_token_metadata_cache
+from utils.gas_oracle import get_gas_oracle
+from utils.async_blockchain import get_async_engine
+from utils.balance_cache import get_balance_cache
+from utils.transaction_pipeline import get_transaction_pipeline
+from utils.disperse import get_disperse_client
+from utils.contract_artifacts import encode_deployment_data, get_artifact_store
+from utils.event_indexer import MAX_INDEX_LAG_BLOCKS, get_indexed_block, get_indexed_event_summaries
+from utils.cost_simulator import ExecutionCostSimulator
+from utils.dev_chain import BLOCKCHAIN_PROVIDER, attach_dev_chains
+from utils.allocation import (
+    allocate_basis_points, apportion, from_base_units, shares_to_list, split_by_basis_points,
+    to_base_units, validate_allocations
+)
+
 logger = logging.getLogger(__name__)
 
 class BlockchainManager:
@@ -23,26 +43,56 @@ class BlockchainManager:
         self.networks = {
             'ethereum': {
                 'rpc_url': 'https://mainnet.infura.io/v3/YOUR_PROJECT_ID',
+                'fallback_rpc_urls': ['https://eth.llamarpc.com', 'https://rpc.ankr.com/eth'],
                 'chain_id': 1,
-                'explorer': 'https://etherscan.io'
+                'explorer': 'https://etherscan.io',
+                'native_currency': 'ETH',
+                'batch_limit': 100  # Max JSON-RPC calls per batch payload
             },
             'polygon': {
                 'rpc_url': 'https://polygon-rpc.com',
+                'fallback_rpc_urls': ['https://polygon.llamarpc.com', 'https://rpc.ankr.com/polygon'],
                 'chain_id': 137,
-                'explorer': 'https://polygonscan.com'
+                'explorer': 'https://polygonscan.com',
+                'native_currency': 'MATIC',
+                'batch_limit': 50
             },
             'binance_smart_chain': {
                 'rpc_url': 'https://bsc-dataseed.binance.org',
+                'fallback_rpc_urls': ['https://bsc-dataseed1.defibit.io', 'https://rpc.ankr.com/bsc'],
                 'chain_id': 56,
-                'explorer': 'https://bscscan.com'
+                'explorer': 'https://bscscan.com',
+                'native_currency': 'BNB',
+                'batch_limit': 50
             },
             'avalanche': {
                 'rpc_url': 'https://api.avax.network/ext/bc/C/rpc',
+                'fallback_rpc_urls': ['https://rpc.ankr.com/avalanche', 'https://avalanche.public-rpc.com'],
                 'chain_id': 43114,
-                'explorer': 'https://snowtrace.io'
+                'explorer': 'https://snowtrace.io',
+                'native_currency': 'AVAX',
+                'batch_limit': 40
             }
         }
         
+        # BLOCKCHAIN_PROVIDER=dev runs every network on a local in-process EVM instead of public RPC
+        if BLOCKCHAIN_PROVIDER == 'dev':
+            attach_dev_chains(self.networks)
+        
+        # Share one long-lived provider per network across the whole process, routed across
+        # the primary and fallback RPC endpoints by observed latency
+        self.connections = get_connection_registry()
+        for network, config in self.networks.items():
+            self.connections.register_network(
+                network,
+                [config['rpc_url']] + config.get('fallback_rpc_urls', []),
+                config['batch_limit']
+            )
+        
+        self.token_metadata = get_token_metadata_cache()
+        self.async_engine = get_async_engine(self.networks)
+        self.balance_cache = get_balance_cache()
+        
         # Smart contract templates
         self.inheritance_contract_abi = [
             {
@@ -74,26 +124,21 @@ class BlockchainManager:
         ]
     
     def get_web3_connection(self, network: str) -> Optional[Web3]:
-        """Get Web3 connection for specified network"""
+        """Get the pooled Web3 connection for specified network"""
         try:
-            if network not in self.networks:
-                logger.error(f"Unsupported network: {network}")
-                return None
-            
-            rpc_url = self.networks[network]['rpc_url']
-            w3 = Web3(Web3.HTTPProvider(rpc_url))
-            
-            if w3.is_connected():
-                logger.info(f"Connected to {network} network")
-                return w3
-            else:
-                logger.error(f"Failed to connect to {network} network")
-                return None
-                
+            return self.connections.get_connection(network)
         except Exception as e:
             logger.error(f"Error connecting to {network}: {str(e)}")
             return None
     
+    def get_connection_status(self) -> Dict:
+        """Get health status of the pooled network connections"""
+        return self.connections.get_status()
+    
+    def get_endpoint_stats(self) -> Dict:
+        """Get per-endpoint latency and error stats for every network"""
+        return self.connections.get_endpoint_stats()
+    
     def validate_wallet_address(self, address: str, network: str) -> bool:
         """Validate wallet address format for specific network"""
         try:
@@ -116,10 +161,18 @@ class BlockchainManager:
     def get_wallet_balance(self, address: str, network: str, token_contract: Optional[str] = None) -> Decimal:
         """Get wallet balance for native token or specific ERC-20 token"""
         try:
+            cached = self.balance_cache.get(network, address, token_contract)
+            if cached:
+                return cached[0]
+            
             w3 = self.get_web3_connection(network)
             if not w3:
                 return Decimal('0')
             
+            # Read at the watched head so the cached value is tagged with the block it came from
+            head = self.balance_cache.get_head(network)
+            block_identifier = head if head is not None else 'latest'
+            
             if token_contract:
                 # ERC-20 token balance
                 contract = w3.eth.contract(
@@ -132,25 +185,211 @@ class BlockchainManager:
                         "type": "function"
                     }]
                 )
-                balance = contract.functions.balanceOf(Web3.to_checksum_address(address)).call()
-                return Decimal(str(balance)) / Decimal('10') ** 18  # Assuming 18 decimals
+                balance = contract.functions.balanceOf(Web3.to_checksum_address(address)).call(
+                    block_identifier=block_identifier
+                )
+                decimals = self.get_token_decimals([token_contract], network, w3)[token_contract]
+                balance = Decimal(str(balance)) / Decimal('10') ** decimals
             else:
                 # Native token balance
-                balance = w3.eth.get_balance(Web3.to_checksum_address(address))
-                return Decimal(str(balance)) / Decimal('10') ** 18  # Convert from wei to ETH
+                balance = w3.eth.get_balance(Web3.to_checksum_address(address), block_identifier=block_identifier)
+                balance = Decimal(str(balance)) / Decimal('10') ** 18  # Convert from wei to ETH
+            
+            if head is not None:
+                self.balance_cache.put(network, address, balance, head, token_contract)
+            return balance
                 
         except Exception as e:
             logger.error(f"Error getting balance for {address}: {str(e)}")
             return Decimal('0')
     
-    def estimate_gas_cost(self, network: str, transaction_type: str = 'transfer') -> Dict:
-        """Estimate gas costs for different transaction types"""
+    def _resolve_cached_balances(
+        self,
+        addresses: List[str],
+        network: str,
+        consistent_snapshot: bool
+    ) -> Tuple[List[Dict], List[int], Optional[int]]:
+        """Fill balances from the block-aware cache, returning the results, the positions still to fetch and the read block
+        
+        In snapshot mode every balance must come from the current head block, so only
+        entries read at exactly that block are reused.
+        """
+        results = [{'address': address, 'balance': None, 'block_number': None, 'error': None} for address in addresses]
+        head = self.balance_cache.get_head(network)
+        
+        missing = []
+        for index, address in enumerate(addresses):
+            if not self.validate_wallet_address(address, network):
+                results[index]['error'] = 'Invalid wallet address'
+                continue
+            
+            cached = self.balance_cache.get(
+                network, address, block_number=head if consistent_snapshot else None
+            ) if head is not None else None
+            if cached:
+                results[index]['balance'], results[index]['block_number'] = cached
+            else:
+                missing.append(index)
+        
+        return results, missing, head
+    
+    def _store_fetched_balance(self, result: Dict, response: Dict, network: str, head: Optional[int]):
+        """Decode one eth_getBalance response into a result entry and cache it"""
+        if response['error']:
+            result['error'] = response['error']
+            return
+        try:
+            balance = Decimal(int(response['result'], 16)) / Decimal('10') ** 18  # Convert from wei to ETH
+        except (TypeError, ValueError) as e:
+            result['error'] = f'Malformed balance response: {str(e)}'
+            return
+        
+        result['balance'] = balance
+        result['block_number'] = head
+        if head is not None:
+            self.balance_cache.put(network, result['address'], balance, head)
+    
+    def get_wallet_balances(self, addresses: List[str], network: str, consistent_snapshot: bool = False) -> List[Dict]:
+        """Get native balances for many wallets using batched eth_getBalance calls
+        
+        Results come back in input order with a per-address error instead of failing the whole lookup.
+        With consistent_snapshot every balance is read at the same block.
+        """
+        if network not in self.networks:
+            return [
+                {'address': address, 'balance': None, 'block_number': None, 'error': f'Unsupported network: {network}'}
+                for address in addresses
+            ]
+        
+        results, missing, head = self._resolve_cached_balances(addresses, network, consistent_snapshot)
+        block_identifier = hex(head) if head is not None else 'latest'
+        
+        calls = [('eth_getBalance', [Web3.to_checksum_address(addresses[i]), block_identifier]) for i in missing]
+        try:
+            responses = self.connections.batch_request(network, calls)
+        except Exception as e:
+            logger.error(f"Error getting batched balances on {network}: {str(e)}")
+            responses = [{'result': None, 'error': str(e)} for _ in calls]
+        
+        for index, response in zip(missing, responses):
+            self._store_fetched_balance(results[index], response, network, head)
+        
+        return results
+    
+    def get_multichain_balances(
+        self,
+        queries: Dict[str, List[str]],
+        consistent_snapshot: bool = False
+    ) -> Dict[str, List[Dict]]:
+        """Get native balances for {network: [addresses]} with all networks queried concurrently"""
+        results = {}
+        pending = {}
+        heads = {}
+        for network, addresses in queries.items():
+            if network not in self.networks:
+                results[network] = [
+                    {'address': a, 'balance': None, 'block_number': None, 'error': f'Unsupported network: {network}'}
+                    for a in addresses
+                ]
+                continue
+            results[network], missing, heads[network] = self._resolve_cached_balances(
+                addresses, network, consistent_snapshot
+            )
+            if missing:
+                pending[network] = missing
+        
+        if not pending:
+            return results
+        
+        try:
+            fetched = self.async_engine.get_balances(
+                {network: [queries[network][i] for i in positions] for network, positions in pending.items()},
+                block_identifiers={
+                    network: hex(heads[network]) for network in pending if heads[network] is not None
+                }
+            )
+        except Exception as e:
+            logger.error(f"Error getting multi-chain balances: {str(e)}")
+            fetched = {
+                network: [{'balance': None, 'error': str(e)} for _ in positions]
+                for network, positions in pending.items()
+            }
+        
+        for network, positions in pending.items():
+            for index, item in zip(positions, fetched[network]):
+                result = results[network][index]
+                if item['error']:
+                    result['error'] = item['error']
+                    continue
+                result['balance'] = item['balance']
+                result['block_number'] = heads[network]
+                if heads[network] is not None:
+                    self.balance_cache.put(network, result['address'], item['balance'], heads[network])
+        
+        return results
+    
+    def get_token_balances(
+        self,
+        holders: List[str],
+        token_contracts: List[str],
+        network: str
+    ) -> Dict[str, Dict[str, Optional[Decimal]]]:
+        """Get ERC-20 balances for every token and holder pair in a single Multicall3 request"""
+        balances = {token: {holder: None for holder in holders} for token in token_contracts}
         try:
             w3 = self.get_web3_connection(network)
-            if not w3:
-                return {'gas_price': 0, 'gas_limit': 0, 'estimated_cost': 0}
+            if not w3 or not holders or not token_contracts:
+                return balances
+            
+            decimals = self.get_token_decimals(token_contracts, network, w3)
+            
+            aggregator = Multicall3Aggregator(w3)
+            raw_balances = aggregator.get_token_balances(holders, token_contracts)
             
-            gas_price = w3.eth.gas_price
+            for (token, holder), raw_balance in raw_balances.items():
+                if raw_balance is not None:
+                    balances[token][holder] = Decimal(raw_balance) / Decimal('10') ** decimals[token]
+            
+            return balances
+            
+        except Exception as e:
+            logger.error(f"Error getting token balances on {network}: {str(e)}")
+            return balances
+    
+    def get_token_decimals(self, token_contracts: List[str], network: str, w3: Optional[Web3] = None) -> Dict[str, int]:
+        """Get decimals for ERC-20 tokens from the metadata cache, fetching misses in one batch"""
+        w3 = w3 or self.get_web3_connection(network)
+        if not w3:
+            metadata = {token: self.token_metadata.get(network, token) for token in token_contracts}
+        else:
+            metadata = self.token_metadata.get_many(network, token_contracts, w3)
+        
+        decimals = {}
+        for token in token_contracts:
+            if metadata.get(token) is None:
+                logger.warning(f"Unknown decimals for token {token} on {network}, assuming 18")
+                decimals[token] = 18
+            else:
+                decimals[token] = metadata[token]['decimals']
+        return decimals
+    
+    def _node_gas_price(self, network: str) -> Optional[int]:
+        """Current gas price straight from the node, None if it cannot be reached"""
+        w3 = self.get_web3_connection(network)
+        if not w3:
+            return None
+        try:
+            return w3.eth.gas_price
+        except Exception as e:
+            logger.error(f"Error reading gas price on {network}: {str(e)}")
+            return None
+
+    def estimate_gas_cost(self, network: str, transaction_type: str = 'transfer', speed: str = 'standard') -> Dict:
+        """Estimate gas costs for different transaction types from the cached gas oracle"""
+        try:
+            if network not in self.networks:
+                logger.error(f"Unsupported network: {network}")
+                return {'gas_price': 0, 'gas_limit': 0, 'estimated_cost': 0, 'estimated_cost_eth': 0.0}
             
             # Estimated gas limits for different operations
             gas_limits = {
@@ -161,18 +400,54 @@ class BlockchainManager:
             }
             
             gas_limit = gas_limits.get(transaction_type, 100000)
+            
+            # Served from memory; the oracle refreshes fee history on its own thread
+            fee_estimates = get_gas_oracle(network).get_estimates()
+            if not fee_estimates or fee_estimates['stale']:
+                # Before the oracle's first sample, or once it has stopped refreshing, ask the node directly
+                gas_price = self._node_gas_price(network)
+                if gas_price is not None:
+                    estimated_cost = gas_price * gas_limit
+                    return {
+                        'gas_price': gas_price,
+                        'gas_limit': gas_limit,
+                        'estimated_cost': estimated_cost,
+                        'estimated_cost_eth': float(Decimal(str(estimated_cost)) / Decimal('10') ** 18),
+                        'max_fee_per_gas': None,
+                        'max_priority_fee_per_gas': None,
+                        'speed': speed,
+                        'stale': False,
+                        'available': True
+                    }
+            if not fee_estimates:
+                return {
+                    'gas_price': 0,
+                    'gas_limit': gas_limit,
+                    'estimated_cost': 0,
+                    'estimated_cost_eth': 0.0,
+                    'available': False
+                }
+            
+            fees = fee_estimates.get(speed, fee_estimates['standard'])
+            gas_price = fees['gas_price']
             estimated_cost = gas_price * gas_limit
             
             return {
                 'gas_price': gas_price,
                 'gas_limit': gas_limit,
                 'estimated_cost': estimated_cost,
-                'estimated_cost_eth': float(Decimal(str(estimated_cost)) / Decimal('10') ** 18)
+                'estimated_cost_eth': float(Decimal(str(estimated_cost)) / Decimal('10') ** 18),
+                'max_fee_per_gas': fees['max_fee_per_gas'],
+                'max_priority_fee_per_gas': fees['max_priority_fee_per_gas'],
+                'speed': speed,
+                'fee_estimates': fee_estimates,
+                'stale': fee_estimates['stale'],
+                'available': True
             }
             
         except Exception as e:
             logger.error(f"Error estimating gas cost: {str(e)}")
-            return {'gas_price': 0, 'gas_limit': 0, 'estimated_cost': 0}
+            return {'gas_price': 0, 'gas_limit': 0, 'estimated_cost': 0, 'estimated_cost_eth': 0.0}
 
 class InheritanceSmartContract:
     """Manages smart contract operations for crypto inheritance"""
@@ -246,7 +521,7 @@ class InheritanceSmartContract:
                 emit ActivityRecorded(block.timestamp);
             }
             
-            function checkInactivity() external view returns (bool) {
+            function checkInactivity() public view returns (bool) {
                 return (block.timestamp - lastActivity) >= inactivityPeriod;
             }
             
@@ -290,6 +565,13 @@ class InheritanceSmartContract:
             receive() external payable {}
         }
         """
+        
+        # Compiled on first deployment (or loaded from disk), never at startup
+        self.artifacts = get_artifact_store()
+    
+    def get_contract_artifact(self) -> Dict:
+        """Return the compiled CryptoInheritance ABI and bytecode"""
+        return self.artifacts.get_artifact(self.contract_source, 'CryptoInheritance')
     
     def deploy_inheritance_contract(
         self,
@@ -299,7 +581,7 @@ class InheritanceSmartContract:
         inactivity_period_days: int,
         time_delay_days: int
     ) -> Optional[Dict]:
-        """Deploy inheritance smart contract"""
+        """Deploy inheritance smart contract from the cached compiled artifact"""
         try:
             w3 = self.blockchain_manager.get_web3_connection(network)
             if not w3:
@@ -307,27 +589,54 @@ class InheritanceSmartContract:
             
             # Prepare contract parameters
             beneficiary_addresses = [Web3.to_checksum_address(b['wallet_address']) for b in beneficiaries]
-            allocations = [int(b['allocation_percentage'] * 100) for b in beneficiaries]  # Convert to basis points
+            allocations = shares_to_list(allocate_basis_points(
+                [b['allocation_percentage'] for b in beneficiaries]
+            ))  # Basis points summing to exactly 10000
             
             inactivity_period = inactivity_period_days * 24 * 60 * 60  # Convert to seconds
             time_delay = time_delay_days * 24 * 60 * 60  # Convert to seconds
             
-            # In a real implementation, you would compile the contract here
-            # For this example, we'll simulate the deployment
+            # Only the constructor arguments are encoded per deployment; the bytecode is compiled once
+            artifact = self.get_contract_artifact()
+            deploy_data = encode_deployment_data(
+                artifact, [inactivity_period, time_delay, beneficiary_addresses, allocations]
+            )
+            
+            owner = Account.from_key(owner_private_key)
+            try:
+                gas_limit = int(w3.eth.estimate_gas({'from': owner.address, 'data': deploy_data}) * 1.2)
+            except Exception as e:
+                logger.warning(f"Could not estimate deployment gas on {network}: {str(e)}")
+                gas_limit = self.blockchain_manager.estimate_gas_cost(network, 'contract_deployment')['gas_limit']
             
-            contract_address = "0x" + "1234567890abcdef" * 5  # Simulated address
-            transaction_hash = "0x" + "abcdef1234567890" * 8  # Simulated hash
+            pipeline = get_transaction_pipeline(self.blockchain_manager.networks)
+            tx_result = pipeline.execute(
+                network,
+                owner_private_key,
+                [{'value': 0, 'data': deploy_data, 'gas': gas_limit}],
+                gas_limit=gas_limit
+            )[0]
+            
+            if tx_result['status'] != 'completed' or not tx_result.get('contract_address'):
+                logger.error(f"Inheritance contract deployment on {network} did not complete: {tx_result['error']}")
+                return None
+            
+            contract_address = Web3.to_checksum_address(tx_result['contract_address'])
+            deployment_cost_wei = tx_result['gas_used'] * tx_result['effective_gas_price']
             
             deployment_info = {
                 'contract_address': contract_address,
-                'transaction_hash': transaction_hash,
+                'transaction_hash': tx_result['transaction_hash'],
+                'block_number': tx_result['block_number'],
                 'network': network,
                 'beneficiaries': beneficiaries,
                 'inactivity_period_days': inactivity_period_days,
                 'time_delay_days': time_delay_days,
                 'deployment_timestamp': datetime.utcnow().isoformat(),
-                'gas_used': 500000,
-                'deployment_cost': 0.05  # ETH
+                'gas_used': tx_result['gas_used'],
+                'deployment_cost': float(Decimal(deployment_cost_wei) / Decimal('10') ** 18),  # ETH
+                'compiler_version': artifact['compiler_version'],
+                'source_hash': artifact['source_hash']
             }
             
             logger.info(f"Inheritance contract deployed: {contract_address}")
@@ -337,86 +646,289 @@ class InheritanceSmartContract:
             logger.error(f"Error deploying inheritance contract: {str(e)}")
             return None
     
-    def check_contract_status(self, contract_address: str, network: str) -> Dict:
-        """Check the status of an inheritance contract"""
+    def _build_status_calls(self, contract_address: str, beneficiary_count: int) -> Dict[str, ContractCall]:
+        """Build the named view calls that make up a contract status read"""
+        calls = {
+            'owner': ContractCall(contract_address, 'owner()', [], ['address']),
+            'last_activity': ContractCall(contract_address, 'lastActivity()'),
+            'inactivity_period': ContractCall(contract_address, 'inactivityPeriod()'),
+            'time_delay': ContractCall(contract_address, 'timeDelay()'),
+            'inheritance_triggered': ContractCall(contract_address, 'inheritanceTriggered()', [], ['bool']),
+            'inheritance_executed': ContractCall(contract_address, 'inheritanceExecuted()', [], ['bool']),
+            'contract_balance': ContractCall(MULTICALL3_ADDRESS, 'getEthBalance(address)', [contract_address]),
+            'block_timestamp': ContractCall(MULTICALL3_ADDRESS, 'getCurrentBlockTimestamp()')
+        }
+        for index in range(beneficiary_count):
+            calls[f'beneficiary_{index}'] = ContractCall(
+                contract_address, 'beneficiaries(uint256)', [index], ['address', 'uint256', 'bool']
+            )
+        return calls
+    
+    @staticmethod
+    def _contract_state(executed: bool, triggered: bool, owner_active: bool) -> str:
+        if executed:
+            return 'executed'
+        if triggered:
+            return 'triggered'
+        return 'active' if owner_active else 'inactive'
+    
+    def _build_status(self, contract_address: str, network: str, reads: Dict[str, Dict], beneficiary_count: int) -> Dict:
+        """Turn aggregated view reads into a contract status report"""
+        required = ['last_activity', 'inactivity_period', 'time_delay', 'inheritance_triggered',
+                    'inheritance_executed', 'block_timestamp']
+        failed = [key for key in required if not reads[key]['success']]
+        if failed:
+            return {'status': 'error', 'message': f'Failed to read contract state: {", ".join(failed)}'}
+        
+        values = {key: read['result'] for key, read in reads.items()}
+        beneficiaries = [
+            {'wallet': wallet, 'allocation': allocation, 'verified': verified}
+            for wallet, allocation, verified in (
+                values[f'beneficiary_{index}'] for index in range(beneficiary_count)
+                if reads[f'beneficiary_{index}']['success']
+            )
+        ]
+        
+        trigger_timestamp = values['last_activity'] + values['inactivity_period']
+        seconds_until_trigger = max(0, trigger_timestamp - values['block_timestamp'])
+        owner_active = seconds_until_trigger > 0
+        contract_state = self._contract_state(
+            values['inheritance_executed'], values['inheritance_triggered'], owner_active
+        )
+        
+        status = {
+            'contract_address': contract_address,
+            'network': network,
+            'owner': values['owner'],
+            'owner_active': owner_active,
+            'inheritance_triggered': values['inheritance_triggered'],
+            'inheritance_executed': values['inheritance_executed'],
+            'last_activity': datetime.utcfromtimestamp(values['last_activity']),
+            'inactivity_threshold': datetime.utcfromtimestamp(trigger_timestamp),
+            'time_until_trigger': seconds_until_trigger // (24 * 60 * 60),  # days
+            'time_delay_days': values['time_delay'] // (24 * 60 * 60),
+            'contract_balance': str(Decimal(values['contract_balance'] or 0) / Decimal('10') ** 18),  # ETH
+            'beneficiary_count': len(beneficiaries) if beneficiary_count else None,
+            'beneficiaries': beneficiaries,
+            'status': contract_state
+        }
+        
+        return status
+    
+    def check_contract_status(self, contract_address: str, network: str, beneficiary_count: int = 0) -> Dict:
+        """Check the status of an inheritance contract with one aggregated read"""
         try:
             w3 = self.blockchain_manager.get_web3_connection(network)
             if not w3:
                 return {'status': 'error', 'message': 'Network connection failed'}
             
-            # In a real implementation, you would interact with the actual contract
-            # For this example, we'll simulate the status check
+            contract_address = Web3.to_checksum_address(contract_address)
+            calls = self._build_status_calls(contract_address, beneficiary_count)
+            reads = Multicall3Aggregator(w3).aggregate_named(calls)
+            
+            return self._build_status(contract_address, network, reads, beneficiary_count)
+            
+        except Exception as e:
+            logger.error(f"Error checking contract status: {str(e)}")
+            return {'status': 'error', 'message': str(e)}
+    
+    def get_indexed_status(
+        self,
+        contract_address: str,
+        network: str,
+        inactivity_period_days: int,
+        time_delay_days: int,
+        deployed_at: datetime
+    ) -> Optional[Dict]:
+        """Build a contract status from indexed events; None when the index cannot be trusted yet
+        
+        That is when the contract has not been backfilled or the checkpoint trails the head by
+        more than MAX_INDEX_LAG_BLOCKS, so callers fall back to a live read.
+        Period settings come from the plan since they are constructor arguments, not events,
+        and deployed_at stands in for lastActivity until the first ActivityRecorded event.
+        """
+        try:
+            contract_address = Web3.to_checksum_address(contract_address)
+            indexed_block = get_indexed_block(network, contract_address)
+            if indexed_block is None:
+                return None
+            
+            head = self.blockchain_manager.balance_cache.get_head(network)
+            if head is None or head - indexed_block > MAX_INDEX_LAG_BLOCKS:
+                logger.info(f"Event index on {network} is at {indexed_block}, head {head}; reading {contract_address} live")
+                return None
+            
+            events = get_indexed_event_summaries(network, [contract_address])[contract_address]
+            
+            activity = events.get('ActivityRecorded')
+            last_activity = activity['last_timestamp'] if activity else calendar.timegm(deployed_at.utctimetuple())
+            inactivity_period = inactivity_period_days * 24 * 60 * 60
+            trigger_timestamp = last_activity + inactivity_period
+            seconds_until_trigger = max(0, trigger_timestamp - int(time.time()))
+            owner_active = seconds_until_trigger > 0
+            
+            triggered = 'InheritanceTriggered' in events
+            executed = 'InheritanceExecuted' in events
             
-            status = {
+            return {
                 'contract_address': contract_address,
                 'network': network,
-                'owner_active': True,
-                'inheritance_triggered': False,
-                'inheritance_executed': False,
-                'last_activity': datetime.utcnow() - timedelta(days=30),
-                'inactivity_threshold': datetime.utcnow() - timedelta(days=365),
-                'time_until_trigger': 335,  # days
-                'contract_balance': '1.5',  # ETH
-                'beneficiary_count': 3,
-                'status': 'active'
+                'owner_active': owner_active,
+                'inheritance_triggered': triggered,
+                'inheritance_executed': executed,
+                'last_activity': datetime.utcfromtimestamp(last_activity),
+                'inactivity_threshold': datetime.utcfromtimestamp(trigger_timestamp),
+                'time_until_trigger': seconds_until_trigger // (24 * 60 * 60),  # days
+                'time_delay_days': time_delay_days,
+                'activity_count': activity['count'] if activity else 0,
+                'indexed_through_block': indexed_block,
+                'source': 'event_index',
+                'status': self._contract_state(executed, triggered, owner_active)
             }
             
-            return status
+        except Exception as e:
+            logger.error(f"Error reading indexed contract status: {str(e)}")
+            return None
+    
+    def check_contract_statuses(self, contracts: List[Dict]) -> List[Dict]:
+        """Check many contracts across networks concurrently
+        
+        Each entry needs contract_address and network, and may give beneficiary_count.
+        """
+        try:
+            requests_by_contract = []
+            for contract in contracts:
+                contract_address = Web3.to_checksum_address(contract['contract_address'])
+                calls = self._build_status_calls(contract_address, contract.get('beneficiary_count', 0))
+                requests_by_contract.append((contract['network'], calls))
+            
+            outcomes = self.blockchain_manager.async_engine.get_contract_views(requests_by_contract)
+            
+            statuses = []
+            for contract, outcome in zip(contracts, outcomes):
+                if outcome['error']:
+                    statuses.append({
+                        'contract_address': contract['contract_address'],
+                        'network': contract['network'],
+                        'status': 'error',
+                        'message': outcome['error']
+                    })
+                    continue
+                statuses.append(self._build_status(
+                    Web3.to_checksum_address(contract['contract_address']),
+                    contract['network'],
+                    outcome['result'],
+                    contract.get('beneficiary_count', 0)
+                ))
+            return statuses
             
         except Exception as e:
-            logger.error(f"Error checking contract status: {str(e)}")
-            return {'status': 'error', 'message': str(e)}
+            logger.error(f"Error checking contract statuses: {str(e)}")
+            return [{'status': 'error', 'message': str(e)} for _ in contracts]
 
 class CryptoTransferManager:
     """Manages automated crypto transfers for inheritance"""
     
     def __init__(self, blockchain_manager: BlockchainManager):
         self.blockchain_manager = blockchain_manager
+        self.pipeline = get_transaction_pipeline(blockchain_manager.networks)
+        self.disperse = get_disperse_client()
+    
+    def plan_execution(
+        self,
+        wallet_address: str,
+        recipients: List[str],
+        values: List[int],
+        network: str,
+        execution_mode: str = 'auto'
+    ) -> Dict:
+        """Compare per-transfer and single-transaction multi-send gas and pick the cheaper mode"""
+        gas_price = self.blockchain_manager.estimate_gas_cost(network, 'transfer')['gas_price']
+        
+        options = {
+            'per_transfer': {
+                'gas_limit': 21000,
+                'total_gas': 21000 * len(recipients),
+                'transactions': len(recipients)
+            }
+        }
+        
+        if len(recipients) > 1 and execution_mode != 'per_transfer':
+            w3 = self.blockchain_manager.get_web3_connection(network)
+            if w3 and self.disperse.is_available(network, w3):
+                batched_gas = self.disperse.estimate_gas(w3, wallet_address, recipients, values)
+                options['batched'] = {'gas_limit': batched_gas, 'total_gas': batched_gas, 'transactions': 1}
+        
+        if execution_mode == 'batched' and 'batched' not in options:
+            raise ValueError(f'Multi-send contract is not available on {network}')
+        
+        for option in options.values():
+            option['total_gas_cost'] = float(Decimal(gas_price * option['total_gas']) / Decimal('10') ** 18)
+        
+        if execution_mode in options:
+            mode = execution_mode
+        else:
+            mode = min(options, key=lambda m: options[m]['total_gas'])
+        
+        return {'execution_mode': mode, 'gas_price': gas_price, 'options': options}
     
     def prepare_inheritance_transfer(
         self,
         wallet_address: str,
         private_key_encrypted: str,
         beneficiaries: List[Dict],
-        network: str
+        network: str,
+        execution_mode: str = 'auto'
     ) -> Dict:
-        """Prepare inheritance transfer instructions"""
+        """Prepare inheritance transfer instructions; execution_mode is 'auto', 'per_transfer' or 'batched'"""
         try:
             # Validate inputs
             if not self.blockchain_manager.validate_wallet_address(wallet_address, network):
                 return {'success': False, 'error': 'Invalid wallet address'}
             
-            total_allocation = sum(b.get('allocation_percentage', 0) for b in beneficiaries)
-            if total_allocation != 100:
+            if not validate_allocations(b.get('allocation_percentage', 0) for b in beneficiaries):
                 return {'success': False, 'error': 'Beneficiary allocations must total 100%'}
             
             # Get current wallet balance
             balance = self.blockchain_manager.get_wallet_balance(wallet_address, network)
             
-            # Calculate transfer amounts
+            # Split the balance in wei so the shares add up to exactly the balance
+            basis_points = allocate_basis_points([b['allocation_percentage'] for b in beneficiaries])
+            shares = shares_to_list(split_by_basis_points(to_base_units(balance), basis_points))
+            
             transfers = []
-            for beneficiary in beneficiaries:
-                amount = balance * Decimal(str(beneficiary['allocation_percentage'])) / Decimal('100')
+            for beneficiary, share in zip(beneficiaries, shares):
                 transfers.append({
                     'beneficiary_name': beneficiary['beneficiary_name'],
                     'wallet_address': beneficiary['crypto_wallet_address'],
                     'allocation_percentage': beneficiary['allocation_percentage'],
-                    'transfer_amount': float(amount),
+                    'transfer_amount': float(from_base_units(share)),
+                    'transfer_amount_wei': str(share),
                     'status': 'pending'
                 })
             
-            # Estimate gas costs
-            gas_estimate = self.blockchain_manager.estimate_gas_cost(network, 'transfer')
-            total_gas_cost = gas_estimate['estimated_cost_eth'] * len(transfers)
+            # Estimate gas for one transfer per beneficiary versus a single multi-send
+            execution_plan = self.plan_execution(
+                wallet_address,
+                [t['wallet_address'] for t in transfers],
+                shares,
+                network,
+                execution_mode
+            )
+            selected = execution_plan['options'][execution_plan['execution_mode']]
+            total_gas_cost = selected['total_gas_cost']
             
             transfer_plan = {
                 'wallet_address': wallet_address,
                 'network': network,
                 'total_balance': float(balance),
+                'execution_mode': execution_plan['execution_mode'],
+                'gas_limit': selected['gas_limit'],
+                'gas_options': execution_plan['options'],
                 'total_gas_cost': total_gas_cost,
                 'net_transfer_amount': float(balance) - total_gas_cost,
                 'transfers': transfers,
-                'estimated_completion_time': '5-10 minutes',
+                'estimated_completion_time': '1-5 minutes' if selected['transactions'] == 1 else '5-10 minutes',
                 'created_at': datetime.utcnow().isoformat()
             }
             
@@ -426,57 +938,205 @@ class CryptoTransferManager:
             logger.error(f"Error preparing inheritance transfer: {str(e)}")
             return {'success': False, 'error': str(e)}
     
+    def simulate_execution_costs(
+        self,
+        transfer_plan: Dict,
+        inactivity_period_days: float,
+        time_delay_days: float,
+        price_usd: Optional[float] = None,
+        scenarios: int = 20000
+    ) -> Dict:
+        """Monte Carlo percentiles of each beneficiary's net transfer, from the gas oracle's fee history"""
+        try:
+            network = transfer_plan['network']
+            fee_history = get_gas_oracle(network).get_fee_history()
+            if fee_history.size == 0:
+                # Oracle has not sampled this network yet; fall back to the current point estimate
+                gas_price = self.blockchain_manager.estimate_gas_cost(network, 'transfer')['gas_price']
+                if not gas_price:
+                    return {'success': False, 'error': f'No fee data available for {network}'}
+                fee_history = [gas_price]
+            
+            simulation = ExecutionCostSimulator(scenarios=scenarios).simulate(
+                transfer_plan,
+                fee_history,
+                inactivity_period_days=inactivity_period_days,
+                time_delay_days=time_delay_days,
+                price_usd=price_usd
+            )
+            return {'success': True, 'simulation': simulation}
+            
+        except Exception as e:
+            logger.error(f"Error simulating inheritance transfer costs: {str(e)}")
+            return {'success': False, 'error': str(e)}
+    
+    def _fit_to_balance(self, network: str, sender: str, values: List[int], total_gas: int) -> List[int]:
+        """Scale transfer values down pro rata when the balance cannot also cover the gas of the whole payout"""
+        w3 = self.blockchain_manager.get_web3_connection(network)
+        if not w3:
+            raise ConnectionError(f'No connection to {network}')
+        
+        balance = w3.eth.get_balance(Web3.to_checksum_address(sender))
+        fee_fields = self.pipeline.get_fee_fields(network)
+        max_gas_price = fee_fields.get('maxFeePerGas', fee_fields.get('gasPrice', 0))
+        available = balance - max_gas_price * total_gas
+        
+        total = sum(values)
+        if total <= available:
+            return values
+        if available <= 0:
+            raise ValueError('Wallet balance does not cover transaction fees')
+        return shares_to_list(apportion(available, values))
+    
+    def reconcile_transfer_results(self, network: str, sender: str, results: List[Dict]) -> List[Dict]:
+        """Settle pending transfer results from their receipts; a nonce used without a receipt means the transaction was dropped"""
+        w3 = self.blockchain_manager.get_web3_connection(network)
+        if not w3:
+            raise ConnectionError(f'No connection to {network}')
+        
+        confirmed_nonce = None
+        for result in results:
+            if result['status'] != 'pending' or not result.get('transaction_hash'):
+                continue
+            try:
+                receipt = w3.eth.get_transaction_receipt(result['transaction_hash'])
+            except TransactionNotFound:
+                receipt = None
+            if receipt is not None:
+                result['status'] = 'completed' if receipt['status'] == 1 else 'failed'
+                result['block_number'] = receipt['blockNumber']
+                result['error'] = None if receipt['status'] == 1 else 'Transaction reverted'
+                continue
+            if confirmed_nonce is None:
+                confirmed_nonce = w3.eth.get_transaction_count(Web3.to_checksum_address(sender), 'latest')
+            if result.get('nonce') is not None and result['nonce'] < confirmed_nonce:
+                result['status'] = 'failed'
+                result['error'] = 'Transaction dropped'
+        return results
+    
     def execute_inheritance_transfer(
         self,
         transfer_plan: Dict,
         private_key_encrypted: str,
-        encryption_key: str
+        encryption_key: str,
+        previous_summary: Optional[Dict] = None
     ) -> Dict:
-        """Execute the inheritance transfer (simulation)"""
+        """Execute the inheritance transfer: sign every payout up front, broadcast together, confirm per block
+        
+        Succeeds only when every transfer completed. Pass the summary of an incomplete earlier run
+        to retry it: its pending transfers are settled first and completed ones are not sent again.
+        """
         try:
-            # In a real implementation, this would:
-            # 1. Decrypt the private key
-            # 2. Create and sign transactions
-            # 3. Broadcast to the network
-            # 4. Monitor transaction confirmations
-            
-            # For this example, we'll simulate the execution
-            results = []
-            
-            for transfer in transfer_plan['transfers']:
-                # Simulate transaction
-                transaction_hash = "0x" + "abcdef1234567890" * 8  # Simulated hash
-                
-                result = {
+            private_key = decrypt_sensitive_data(private_key_encrypted, encryption_key)
+            if not private_key:
+                return {'success': False, 'error': 'Unable to decrypt wallet key'}
+            
+            network = transfer_plan['network']
+            batched = transfer_plan.get('execution_mode') == 'batched'
+            gas_limit = transfer_plan.get('gas_limit', 21000)
+            
+            previous = {}
+            if previous_summary:
+                previous_results = self.reconcile_transfer_results(
+                    network, transfer_plan['wallet_address'], previous_summary['transfer_results']
+                )
+                if any(r['status'] == 'pending' for r in previous_results):
+                    return {
+                        'success': False,
+                        'error': 'Earlier transfers are still pending',
+                        'execution_summary': self._execution_summary(transfer_plan, batched, previous_results)
+                    }
+                previous = {
+                    index: result for index, result in enumerate(previous_results) if result['status'] == 'completed'
+                }
+            
+            # Plans prepared before wei amounts were stored only carry the float ETH amount
+            remaining = [
+                (index, transfer) for index, transfer in enumerate(transfer_plan['transfers']) if index not in previous
+            ]
+            recipients = [transfer['wallet_address'] for _, transfer in remaining]
+            values = [
+                int(transfer['transfer_amount_wei']) if 'transfer_amount_wei' in transfer
+                else to_base_units(transfer['transfer_amount'])
+                for _, transfer in remaining
+            ]
+            
+            tx_results = []
+            if values:
+                total_gas = gas_limit if batched else gas_limit * len(values)
+                values = self._fit_to_balance(network, transfer_plan['wallet_address'], values, total_gas)
+            
+            if values and batched:
+                # One disperse transaction pays everyone; each beneficiary shares its receipt
+                tx_result = self.pipeline.execute(
+                    network,
+                    private_key,
+                    [self.disperse.build_transfer(recipients, values, gas_limit)],
+                    gas_limit=gas_limit
+                )[0]
+                tx_results = [tx_result] * len(values)
+            elif values:
+                tx_results = self.pipeline.execute(
+                    network,
+                    private_key,
+                    [{'to': recipient, 'value': value} for recipient, value in zip(recipients, values)],
+                    gas_limit=gas_limit
+                )
+            
+            results = dict(previous)
+            for (index, transfer), value, tx_result in zip(remaining, values, tx_results):
+                gas_used = tx_result.get('gas_used', 0)
+                if batched:
+                    gas_used //= len(values)
+                gas_cost_wei = gas_used * tx_result.get('effective_gas_price', 0)
+                results[index] = {
                     'beneficiary_name': transfer['beneficiary_name'],
                     'wallet_address': transfer['wallet_address'],
-                    'transfer_amount': transfer['transfer_amount'],
-                    'transaction_hash': transaction_hash,
-                    'status': 'completed',
+                    'transfer_amount': float(Decimal(value) / Decimal('10') ** 18),
+                    'transaction_hash': tx_result['transaction_hash'],
+                    'nonce': tx_result['nonce'],
+                    'block_number': tx_result.get('block_number'),
+                    'status': tx_result['status'],
+                    'error': tx_result['error'],
                     'confirmation_time': datetime.utcnow().isoformat(),
-                    'gas_used': 21000,
-                    'gas_cost': 0.001  # ETH
+                    'gas_used': gas_used,
+                    'gas_cost': float(Decimal(gas_cost_wei) / Decimal('10') ** 18),  # ETH
+                    'replacements': tx_result.get('replacements', 0)
+                }
+            
+            execution_summary = self._execution_summary(
+                transfer_plan, batched, [results[index] for index in sorted(results)]
+            )
+            if execution_summary['failed_transfers'] or execution_summary['pending_transfers']:
+                return {
+                    'success': False,
+                    'error': f"{execution_summary['failed_transfers']} transfers failed and "
+                             f"{execution_summary['pending_transfers']} are still pending",
+                    'execution_summary': execution_summary
                 }
-                results.append(result)
-            
-            execution_summary = {
-                'execution_id': f"exec_{int(time.time())}",
-                'wallet_address': transfer_plan['wallet_address'],
-                'network': transfer_plan['network'],
-                'total_transfers': len(results),
-                'successful_transfers': len([r for r in results if r['status'] == 'completed']),
-                'failed_transfers': len([r for r in results if r['status'] == 'failed']),
-                'total_amount_transferred': sum(r['transfer_amount'] for r in results),
-                'total_gas_cost': sum(r['gas_cost'] for r in results),
-                'execution_time': datetime.utcnow().isoformat(),
-                'transfer_results': results
-            }
             
             return {'success': True, 'execution_summary': execution_summary}
             
         except Exception as e:
             logger.error(f"Error executing inheritance transfer: {str(e)}")
             return {'success': False, 'error': str(e)}
+    
+    @staticmethod
+    def _execution_summary(transfer_plan: Dict, batched: bool, results: List[Dict]) -> Dict:
+        return {
+            'execution_id': f"exec_{int(time.time())}",
+            'wallet_address': transfer_plan['wallet_address'],
+            'network': transfer_plan['network'],
+            'execution_mode': 'batched' if batched else 'per_transfer',
+            'total_transfers': len(results),
+            'successful_transfers': len([r for r in results if r['status'] == 'completed']),
+            'failed_transfers': len([r for r in results if r['status'] == 'failed']),
+            'pending_transfers': len([r for r in results if r['status'] == 'pending']),
+            'total_amount_transferred': sum(r['transfer_amount'] for r in results if r['status'] == 'completed'),
+            'total_gas_cost': sum(r['gas_cost'] for r in results),
+            'execution_time': datetime.utcnow().isoformat(),
+            'transfer_results': results
+        }
 
 class CryptoComplianceChecker:
     """Handles regulatory compliance for crypto inheritance"""
@@ -624,3 +1284,15 @@ def decrypt_sensitive_data(encrypted_data: str, key: str) -> str:
         logger.error(f"Error decrypting data: {str(e)}")
         return ""
 
+
+_manager = None
+_manager_lock = threading.Lock()
+
+def get_blockchain_manager() -> BlockchainManager:
+    """Return the process-wide blockchain manager, so network registration and dev chains happen once"""
+    global _manager
+    if _manager is None:
+        with _manager_lock:
+            if _manager is None:
+                _manager = BlockchainManager()
+    return _manager
@@ -0,0 +1,286 @@
+"""
+Confirmation Tracker for LastWish Crypto Inheritance
+Follows chain heads once for every chain-derived table, rolling back reorged rows and finalizing deep ones
+"""
+
+import threading
+import logging
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import select
+
+from models.user import db
+from models.crypto_assets import (
+    BlockchainNetwork, ContractEvent, CryptoAsset, CryptoTransaction, CryptoWallet, EventIndexCheckpoint
+)
+from models.subscription_models import Payment
+from models import estate_models
+from utils.rpc_connections import get_connection_registry
+from utils.balance_cache import get_block_watcher
+
+logger = logging.getLogger(__name__)
+
+# Blocks after which a record is treated as final on each network
+FINALITY_DEPTHS = {
+    'ethereum': 12,
+    'polygon': 128,
+    'binance_smart_chain': 15,
+    'avalanche': 1
+}
+
+class TrackedSource:
+    """Describes how one table scopes rows to a network and where it keeps block hash and confirmation status"""
+
+    def __init__(
+        self,
+        name: str,
+        model,
+        database,
+        network_filter: Callable[[str], object],
+        block_number_column,
+        block_hash_column,
+        status_column,
+        rollback: Callable
+    ):
+        self.name = name
+        self.model = model
+        self.database = database  # Flask-SQLAlchemy instance that owns the model; committed separately
+        self.network_filter = network_filter  # callable(network) -> filter clause
+        self.block_number_column = block_number_column
+        self.block_hash_column = block_hash_column
+        self.status_column = status_column
+        self.rollback = rollback  # callable(query, network, fork_block) -> rows affected
+
+    def unconfirmed(self, network: str):
+        """Query rows on a network that carry a block hash and are not yet final"""
+        return self.model.query.filter(
+            self.network_filter(network),
+            self.block_hash_column.isnot(None),
+            self.status_column == 'unconfirmed'
+        )
+
+def _rollback_contract_events(query, network: str, fork_block: int) -> int:
+    """Delete orphaned events and rewind the indexer so the canonical logs are ingested again"""
+    removed = query.delete(synchronize_session=False)
+    EventIndexCheckpoint.query.filter(
+        EventIndexCheckpoint.blockchain_network == BlockchainNetwork(network),
+        EventIndexCheckpoint.last_indexed_block >= fork_block
+    ).update({EventIndexCheckpoint.last_indexed_block: fork_block - 1}, synchronize_session=False)
+    return removed
+
+def _rollback_payments(query, network: str, fork_block: int) -> int:
+    """Return orphaned crypto payments to pending so verification looks for their inclusion again"""
+    return query.update({
+        Payment.status: 'pending',
+        Payment.crypto_block_number: None,
+        Payment.crypto_block_hash: None,
+        Payment.crypto_confirmation_status: None
+    }, synchronize_session=False)
+
+def _rollback_crypto_transactions(query, network: str, fork_block: int) -> int:
+    return query.update({
+        CryptoTransaction.block_number: None,
+        CryptoTransaction.block_hash: None,
+        CryptoTransaction.confirmation_status: 'reorged'
+    }, synchronize_session=False)
+
+def default_sources() -> List[TrackedSource]:
+    """Every table that stores data ingested from chain"""
+    return [
+        TrackedSource(
+            'contract_events', ContractEvent, db,
+            lambda network: ContractEvent.blockchain_network == BlockchainNetwork(network),
+            ContractEvent.block_number, ContractEvent.block_hash, ContractEvent.confirmation_status,
+            rollback=_rollback_contract_events
+        ),
+        TrackedSource(
+            'payments', Payment, estate_models.db,
+            lambda network: (Payment.payment_method == 'crypto') & (Payment.crypto_network == network),
+            Payment.crypto_block_number, Payment.crypto_block_hash, Payment.crypto_confirmation_status,
+            rollback=_rollback_payments
+        ),
+        # Transactions take their network from the wallet that holds the asset
+        TrackedSource(
+            'crypto_transactions', CryptoTransaction, db,
+            lambda network: CryptoTransaction.asset_id.in_(
+                select(CryptoAsset.id).join(CryptoWallet, CryptoAsset.wallet_id == CryptoWallet.id).where(
+                    CryptoWallet.blockchain_network == BlockchainNetwork(network)
+                )
+            ),
+            CryptoTransaction.block_number, CryptoTransaction.block_hash, CryptoTransaction.confirmation_status,
+            rollback=_rollback_crypto_transactions
+        )
+    ]
+
+class ConfirmationTracker:
+    """Keeps a rolling window of recent headers per network and reconciles tracked rows against it"""
+
+    def __init__(self, networks: Dict[str, Dict], finality_depths: Dict[str, int] = None, sources: List[TrackedSource] = None):
+        self.networks = networks
+        self.finality_depths = dict(FINALITY_DEPTHS, **(finality_depths or {}))
+        self.sources = sources if sources is not None else default_sources()
+
+        self.connections = get_connection_registry()
+        self.block_watcher = get_block_watcher()
+
+        # network -> OrderedDict(block_number -> (block_hash, parent_hash)), oldest first
+        self._headers: Dict[str, OrderedDict] = {}
+        self._app = None
+        self._lock = threading.Lock()
+
+    def get_depth(self, network: str) -> int:
+        return self.finality_depths.get(network, 12)
+
+    def get_window_size(self, network: str) -> int:
+        # Deep enough to cover every reorg that could still touch a non-final row
+        return max(2 * self.get_depth(network), 64)
+
+    def start(self, app):
+        """Follow every network's head through the shared block watcher"""
+        with self._lock:
+            if self._app is not None:
+                return
+            self._app = app
+        self.block_watcher.add_listener(self._on_new_head)
+        for network in self.networks:
+            self.block_watcher.watch(network)
+
+    def _on_new_head(self, network: str, head: int):
+        if self._app is None or network not in self.networks:
+            return
+        with self._app.app_context():
+            try:
+                self.process_head(network, head)
+            except Exception as e:
+                logger.error(f"Error tracking confirmations on {network}: {str(e)}")
+            finally:
+                for database in {id(s.database): s.database for s in self.sources}.values():
+                    database.session.remove()
+
+    def process_head(self, network: str, head: int) -> Dict:
+        """Extend the header window to head, then roll back reorged rows and promote deep rows to final, one commit per source"""
+        fork_block = self._update_window(network, head)
+        canonical = {h for n, (h, _) in self._headers[network].items() if n >= fork_block} if fork_block is not None else set()
+
+        rolled_back = 0
+        finalized = 0
+        orphaned = 0
+        for source in self.sources:
+            # Sources live in different databases; one failing must not undo the others
+            session = source.database.session
+            try:
+                source_rolled_back = self._rollback(source, network, fork_block, canonical) if fork_block is not None else 0
+                source_finalized, source_orphaned = self._finalize(source, network, head)
+                session.commit()
+            except Exception as e:
+                session.rollback()
+                logger.error(f"Error tracking {source.name} confirmations on {network}: {str(e)}")
+                continue
+            rolled_back += source_rolled_back
+            finalized += source_finalized
+            orphaned += source_orphaned
+
+        if fork_block is not None or orphaned:
+            logger.warning(
+                f"Reorg on {network} from block {fork_block}: rolled back {rolled_back + orphaned} rows"
+            )
+        return {'fork_block': fork_block, 'rolled_back': rolled_back + orphaned, 'finalized': finalized}
+
+    def _fetch_headers(self, network: str, block_numbers: Iterable[int]) -> Dict[int, tuple]:
+        """Fetch (hash, parentHash) for many blocks in one batch"""
+        block_numbers = list(block_numbers)
+        responses = self.connections.batch_request(
+            network, [('eth_getBlockByNumber', [hex(n), False]) for n in block_numbers]
+        )
+        headers = {}
+        for number, response in zip(block_numbers, responses):
+            if response['result']:
+                headers[number] = (response['result']['hash'], response['result']['parentHash'])
+        return headers
+
+    def _update_window(self, network: str, head: int) -> Optional[int]:
+        """Append new headers; on a broken parent link re-read the window and return the fork block"""
+        window = self._headers.setdefault(network, OrderedDict())
+        size = self.get_window_size(network)
+
+        first = max(next(reversed(window)) + 1, head - size + 1) if window else head - size + 1
+        new_headers = self._fetch_headers(network, range(max(first, 0), head + 1))
+
+        fork_block = None
+        for number in sorted(new_headers):
+            previous = window.get(number - 1)
+            if previous is not None and new_headers[number][1] != previous[0]:
+                fork_block = self._find_fork(network, window, head)
+                break
+            window[number] = new_headers[number]
+
+        while len(window) > size:
+            window.popitem(last=False)
+        return fork_block
+
+    def _find_fork(self, network: str, window: OrderedDict, head: int) -> Optional[int]:
+        """Re-read every block from the window start to head and return the lowest one whose hash changed"""
+        canonical = self._fetch_headers(network, range(next(iter(window)), head + 1))
+        fork_block = next((n for n, (h, _) in window.items() if canonical.get(n, (h,))[0] != h), None)
+
+        window.clear()
+        window.update(sorted(canonical.items()))
+        return fork_block
+
+    def _rollback(self, source: TrackedSource, network: str, fork_block: int, canonical_hashes: Set[str]) -> int:
+        """Roll back a source's non-final rows at or above the fork whose block is no longer canonical"""
+        query = source.unconfirmed(network).filter(source.block_number_column >= fork_block)
+        if canonical_hashes:
+            query = query.filter(source.block_hash_column.notin_(canonical_hashes))
+        return source.rollback(query, network, fork_block)
+
+    def _finalize(self, source: TrackedSource, network: str, head: int):
+        """Promote a source's rows deeper than the finality depth, checking their block hash is still canonical"""
+        final_block = head - self.get_depth(network)
+        window = self._headers.get(network, {})
+
+        candidates = source.unconfirmed(network).filter(
+            source.block_number_column <= final_block
+        ).with_entities(source.block_number_column, source.block_hash_column).distinct().all()
+        if not candidates:
+            return 0, 0
+
+        # Blocks older than the window (e.g. after a restart) are checked with one extra batch
+        missing = {number for number, _ in candidates if number not in window}
+        canonical = {number: header[0] for number, header in window.items()}
+        canonical.update({n: h[0] for n, h in self._fetch_headers(network, sorted(missing)).items()})
+
+        good = {block_hash for number, block_hash in candidates if canonical.get(number) == block_hash}
+        bad = {
+            block_hash for number, block_hash in candidates
+            if number in canonical and canonical[number] != block_hash
+        }
+
+        finalized = 0
+        orphaned = 0
+        if good:
+            finalized = source.unconfirmed(network).filter(
+                source.block_number_column <= final_block,
+                source.block_hash_column.in_(good)
+            ).update({source.status_column: 'final'}, synchronize_session=False)
+        if bad:
+            fork_block = min(number for number, block_hash in candidates if block_hash in bad)
+            orphaned = source.rollback(
+                source.unconfirmed(network).filter(source.block_hash_column.in_(bad)),
+                network,
+                fork_block
+            )
+        return finalized, orphaned
+
+_tracker = None
+_tracker_lock = threading.Lock()
+
+def get_confirmation_tracker(networks: Dict[str, Dict]) -> ConfirmationTracker:
+    """Return the process-wide confirmation tracker"""
+    global _tracker
+    if _tracker is None:
+        with _tracker_lock:
+            if _tracker is None:
+                _tracker = ConfirmationTracker(networks)
+    return _tracker
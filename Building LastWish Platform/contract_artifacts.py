@@ -0,0 +1,147 @@
+"""
+Contract Artifact Store for LastWish Crypto Inheritance
+Compiles Solidity templates once with a vendored solc and keeps ABI plus bytecode on disk
+"""
+
+import hashlib
+import json
+import os
+import threading
+import logging
+from typing import Dict, Optional, Sequence
+
+from eth_abi import encode
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SOLC_VERSION = os.environ.get('SOLC_VERSION', '0.8.19')
+# Directory holding solc binaries installed at build time (solcx.install_solc(..., solcx_binary_path=...))
+DEFAULT_SOLC_BINARY_PATH = os.environ.get('SOLCX_BINARY_PATH')
+DEFAULT_ARTIFACT_DIR = os.environ.get(
+    'CONTRACT_ARTIFACT_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'contract_artifacts')
+)
+
+class ContractArtifactStore:
+    """Build-once store of compiled contracts keyed by source hash and compiler version"""
+
+    def __init__(
+        self,
+        artifact_dir: str = DEFAULT_ARTIFACT_DIR,
+        solc_version: str = DEFAULT_SOLC_VERSION,
+        solc_binary_path: Optional[str] = DEFAULT_SOLC_BINARY_PATH
+    ):
+        self.artifact_dir = artifact_dir
+        self.solc_version = solc_version
+        self.solc_binary_path = solc_binary_path
+
+        self._artifacts: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def source_hash(source: str) -> str:
+        return hashlib.sha256(source.encode('utf-8')).hexdigest()
+
+    def _artifact_path(self, contract_name: str, source_hash: str) -> str:
+        return os.path.join(self.artifact_dir, f'{contract_name}-{self.solc_version}-{source_hash[:16]}.json')
+
+    def get_artifact(self, source: str, contract_name: str) -> Dict:
+        """Return {'abi', 'bytecode', 'runtime_bytecode', ...} from memory, then disk, compiling only on a miss"""
+        source_hash = self.source_hash(source)
+        key = f'{contract_name}:{source_hash}:{self.solc_version}'
+
+        artifact = self._artifacts.get(key)
+        if artifact is not None:
+            return artifact
+
+        with self._lock:
+            artifact = self._artifacts.get(key)
+            if artifact is not None:
+                return artifact
+
+            path = self._artifact_path(contract_name, source_hash)
+            artifact = self._load(path, source_hash)
+            if artifact is None:
+                artifact = self._compile(source, contract_name, source_hash)
+                self._save(path, artifact)
+
+            self._artifacts[key] = artifact
+            return artifact
+
+    def _load(self, path: str, source_hash: str) -> Optional[Dict]:
+        if not os.path.exists(path):
+            return None
+
+        try:
+            with open(path, 'r') as f:
+                artifact = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable contract artifact {path}: {str(e)}")
+            return None
+
+        if artifact.get('source_hash') != source_hash or artifact.get('compiler_version') != self.solc_version:
+            return None
+        # Artifacts written before runtime code was kept are rebuilt once
+        if 'runtime_bytecode' not in artifact:
+            return None
+        return artifact
+
+    def _compile(self, source: str, contract_name: str, source_hash: str) -> Dict:
+        # Imported lazily so processes that never deploy do not need py-solc-x
+        import solcx
+
+        # Only use a compiler that is already installed; never download at request time
+        solc_binary = solcx.install.get_executable(self.solc_version, solcx_binary_path=self.solc_binary_path)
+
+        logger.info(f"Compiling {contract_name} with solc {self.solc_version}")
+        output = solcx.compile_source(
+            source,
+            output_values=['abi', 'bin', 'bin-runtime'],
+            solc_binary=solc_binary,
+            optimize=True
+        )
+
+        compiled = next((v for k, v in output.items() if k.split(':')[-1] == contract_name), None)
+        if compiled is None:
+            raise ValueError(f'Contract {contract_name} not found in compiler output')
+
+        return {
+            'contract_name': contract_name,
+            'source_hash': source_hash,
+            'compiler_version': self.solc_version,
+            'abi': compiled['abi'],
+            'bytecode': '0x' + compiled['bin'],
+            'runtime_bytecode': '0x' + compiled['bin-runtime']
+        }
+
+    def _save(self, path: str, artifact: Dict):
+        try:
+            os.makedirs(self.artifact_dir, exist_ok=True)
+            # Write then rename so concurrent processes never read a partial artifact
+            temp_path = f'{path}.{os.getpid()}.tmp'
+            with open(temp_path, 'w') as f:
+                json.dump(artifact, f)
+            os.replace(temp_path, path)
+        except OSError as e:
+            logger.warning(f"Could not persist contract artifact {path}: {str(e)}")
+
+def encode_deployment_data(artifact: Dict, constructor_args: Sequence) -> str:
+    """Append ABI-encoded constructor arguments to the artifact bytecode"""
+    constructor = next((item for item in artifact['abi'] if item.get('type') == 'constructor'), None)
+    arg_types = [arg['type'] for arg in constructor['inputs']] if constructor else []
+    if len(arg_types) != len(constructor_args):
+        raise ValueError(f'Constructor expects {len(arg_types)} arguments, got {len(constructor_args)}')
+
+    return artifact['bytecode'] + encode(arg_types, list(constructor_args)).hex()
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_artifact_store() -> ContractArtifactStore:
+    """Return the process-wide contract artifact store"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = ContractArtifactStore()
+    return _store
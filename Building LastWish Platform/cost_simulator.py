@@ -0,0 +1,123 @@
+"""
+Execution Cost Simulator for LastWish Crypto Inheritance
+Monte Carlo estimate of what each beneficiary receives once fees, prices and execution delay are uncertain
+"""
+
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+
+DEFAULT_PERCENTILES = (5, 25, 50, 75, 95)
+
+WEI_PER_ETH = 10 ** 18
+
+class ExecutionCostSimulator:
+    """Runs vectorized scenarios of a prepared transfer plan executed after the inheritance delay"""
+
+    def __init__(
+        self,
+        scenarios: int = 20000,
+        percentiles: Sequence[float] = DEFAULT_PERCENTILES,
+        seed: Optional[int] = None
+    ):
+        self.scenarios = scenarios
+        self.percentiles = tuple(percentiles)
+        self.seed = seed
+
+    def _points(self, points: np.ndarray, scale: float = 1.0) -> Dict[str, float]:
+        return {f'p{p:g}': float(v * scale) for p, v in zip(self.percentiles, points)}
+
+    def _summarize(self, values: np.ndarray, scale: float = 1.0) -> Dict[str, float]:
+        return self._points(np.percentile(values, self.percentiles), scale)
+
+    def simulate(
+        self,
+        transfer_plan: Dict,
+        fee_history: Sequence[int],
+        inactivity_period_days: float,
+        time_delay_days: float,
+        price_usd: Optional[float] = None,
+        price_volatility: float = 0.8,
+        fee_volatility: float = 1.0,
+        detection_lag_days: float = 1.0
+    ) -> Dict:
+        """Simulate executing transfer_plan after the inactivity period and time delay
+
+        Each scenario draws an execution delay, a gas price resampled from fee_history and drifted
+        lognormally over that delay, and (with price_usd) a geometric Brownian motion price.
+        Volatilities are annualized.
+        """
+        fees = np.asarray(fee_history, dtype=np.float64)
+        if fees.size == 0:
+            raise ValueError('Fee history is empty')
+
+        transfers = transfer_plan['transfers']
+        shares = np.array([
+            float(t['transfer_amount_wei']) if 'transfer_amount_wei' in t else t['transfer_amount'] * WEI_PER_ETH
+            for t in transfers
+        ])
+        balance = shares.sum()
+        if balance <= 0:
+            raise ValueError('Transfer plan has no balance to distribute')
+
+        rng = np.random.default_rng(self.seed)
+        n = self.scenarios
+
+        # The payout runs after inactivity is detected (within one check interval) plus the time delay
+        delay_days = inactivity_period_days + time_delay_days + rng.uniform(0, detection_lag_days, n)
+        years = delay_days / 365.0
+
+        # Resample observed fees, then let the fee level drift over the delay
+        fee_sigma = fee_volatility * np.sqrt(years)
+        gas_prices = fees[rng.integers(0, fees.size, n)] * np.exp(
+            fee_sigma * rng.standard_normal(n) - 0.5 * fee_sigma ** 2
+        )
+
+        gas_costs = {
+            mode: gas_prices * option['total_gas']
+            for mode, option in transfer_plan.get('gas_options', {}).items()
+        }
+        mode = transfer_plan.get('execution_mode', 'per_transfer')
+        if mode not in gas_costs:
+            gas_costs[mode] = gas_prices * transfer_plan.get('gas_limit', 21000) * len(transfers)
+
+        # Fees are taken pro rata from every share (see CryptoTransferManager._fit_to_balance), so each
+        # beneficiary receives share * ratio and its percentiles are share * percentiles(ratio)
+        ratio = np.clip((balance - gas_costs[mode]) / balance, 0.0, 1.0)
+        ratio_points = np.percentile(ratio, self.percentiles)
+
+        value_points = None
+        if price_usd:
+            price_sigma = price_volatility * np.sqrt(years)
+            prices = price_usd * np.exp(price_sigma * rng.standard_normal(n) - 0.5 * price_sigma ** 2)
+            value_points = np.percentile(ratio * prices, self.percentiles)
+
+        beneficiaries = []
+        for transfer, share in zip(transfers, shares):
+            amount = share / WEI_PER_ETH
+            result = {
+                'beneficiary_name': transfer['beneficiary_name'],
+                'wallet_address': transfer['wallet_address'],
+                'allocation_percentage': transfer['allocation_percentage'],
+                'net_transfer_amount': self._points(ratio_points, amount)
+            }
+            if value_points is not None:
+                result['net_transfer_value_usd'] = self._points(value_points, amount)
+            beneficiaries.append(result)
+
+        report = {
+            'scenarios': n,
+            'execution_mode': mode,
+            'fee_history_samples': int(fees.size),
+            'total_balance': float(balance / WEI_PER_ETH),
+            'execution_delay_days': self._summarize(delay_days),
+            'gas_price_gwei': self._summarize(gas_prices, 1e-9),
+            'gas_cost': {m: self._summarize(costs, 1.0 / WEI_PER_ETH) for m, costs in gas_costs.items()},
+            'net_transfer_total': self._points(ratio_points, balance / WEI_PER_ETH),
+            'fees_exceed_balance_probability': float(np.mean(gas_costs[mode] >= balance)),
+            'beneficiaries': beneficiaries
+        }
+        if value_points is not None:
+            report['price_usd'] = price_usd
+            report['net_transfer_value_usd'] = self._points(value_points, balance / WEI_PER_ETH)
+        return report
@@ -5,7 +5,7 @@ Comprehensive data models for managing digital assets, wallets, and blockchain-b
 
 from datetime import datetime
 from decimal import Decimal
-from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, ForeignKey, Numeric, JSON, Enum
+from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, ForeignKey, Numeric, JSON, Enum, UniqueConstraint, Index, func, literal_column
 from sqlalchemy.orm import relationship
 from models.user import db
 import enum
@@ -48,6 +48,7 @@ class InheritanceStatus(enum.Enum):
     IN_PROGRESS = "in_progress"
     CONFIGURED = "configured"
     ACTIVE = "active"
+    READY_FOR_EXECUTION = "ready_for_execution"
     EXECUTED = "executed"
     FAILED = "failed"
 
@@ -105,6 +106,9 @@ class CryptoWallet(db.Model):
 class CryptoAsset(db.Model):
     """Model for individual cryptocurrency assets and tokens"""
     __tablename__ = 'crypto_assets'
+    __table_args__ = (
+        Index('ix_crypto_assets_user_type', 'user_id', 'asset_type'),
+    )
     
     id = Column(Integer, primary_key=True)
     wallet_id = Column(Integer, ForeignKey('crypto_wallets.id'), nullable=False)
@@ -169,7 +173,9 @@ class CryptoTransaction(db.Model):
     # Transaction identification
     transaction_hash = Column(String(255), unique=True)
     block_number = Column(Integer)
+    block_hash = Column(String(66))
     transaction_index = Column(Integer)
+    confirmation_status = Column(String(20), default='unconfirmed', index=True)  # unconfirmed, final, reorged
     
     # Transaction details
     transaction_type = Column(String(50), nullable=False)  # buy, sell, transfer, stake, etc.
@@ -226,6 +232,8 @@ class CryptoInheritancePlan(db.Model):
     smart_contract_address = Column(String(255))
     smart_contract_network = Column(Enum(BlockchainNetwork))
     contract_deployment_hash = Column(String(255))
+    contract_deployment_block = Column(Integer)  # First block the event indexer needs to scan
+    contract_events_indexed = Column(Boolean, default=False)  # Set once the indexer has covered the contract's history
     
     # Automation settings
     automated_execution = Column(Boolean, default=False)
@@ -243,6 +251,9 @@ class CryptoInheritancePlan(db.Model):
     execution_status = Column(String(100))
     execution_transaction_hash = Column(String(255))
     execution_notes = Column(Text)
+    transfer_plan_data = Column(JSON)  # Prepared transfer plan awaiting execution
+    execution_data = Column(JSON)  # Summary of the latest transfer execution, per-transfer results included
+    next_due_at = Column(DateTime, index=True)  # Next trigger deadline, scanned by the trigger engine
     
     # Timestamps
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -331,7 +342,7 @@ class CryptoMarketData(db.Model):
     circulating_supply = Column(Numeric(30, 8))
     total_supply = Column(Numeric(30, 8))
     
-    # Price changes
+    # Price changes; derived on read from the price rollups (utils.price_rollups), not populated by the price refresh
     price_change_24h = Column(Numeric(10, 6))
     price_change_7d = Column(Numeric(10, 6))
     price_change_30d = Column(Numeric(10, 6))
@@ -349,9 +360,197 @@ class CryptoMarketData(db.Model):
     # Timestamps
     created_at = Column(DateTime, default=datetime.utcnow)
     
+    @classmethod
+    def key_columns(cls):
+        """Columns identifying one asset's row; native coins have no contract, and NULLs never conflict in a unique index"""
+        return [cls.asset_symbol, cls.blockchain_network, func.coalesce(cls.contract_address, literal_column("''"))]
+    
     def __repr__(self):
         return f'<CryptoMarketData {self.asset_symbol}: ${self.price_usd}>'
 
+Index('uq_crypto_market_data_asset', *CryptoMarketData.key_columns(), unique=True)
+
+class PriceBar(db.Model):
+    """Model for finished OHLC/VWAP price bars per symbol and resolution, written in bulk by the price rollups"""
+    __tablename__ = 'price_bars'
+    __table_args__ = (
+        UniqueConstraint('asset_symbol', 'resolution', 'bucket_start', name='uq_price_bars_bucket'),
+        Index('ix_price_bars_resolution_start', 'resolution', 'bucket_start'),
+    )
+
+    id = Column(Integer, primary_key=True)
+
+    # Bar identification
+    asset_symbol = Column(String(20), nullable=False)
+    resolution = Column(String(4), nullable=False)  # 1m, 1h, 1d
+    bucket_start = Column(Integer, nullable=False)  # Unix timestamp of the bar's first second
+
+    # Prices in USD
+    open_usd = Column(Numeric(20, 8), nullable=False)
+    high_usd = Column(Numeric(20, 8), nullable=False)
+    low_usd = Column(Numeric(20, 8), nullable=False)
+    close_usd = Column(Numeric(20, 8), nullable=False)
+    vwap_usd = Column(Numeric(20, 8), nullable=False)
+
+    # 24h volume reported with the bar's last quote, when the provider has it, and the number of quotes in the bar
+    volume_usd = Column(Numeric(30, 2))
+    sample_count = Column(Integer, nullable=False)
+
+    # Timestamps
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'time': self.bucket_start,
+            'open': float(self.open_usd),
+            'high': float(self.high_usd),
+            'low': float(self.low_usd),
+            'close': float(self.close_usd),
+            'vwap': float(self.vwap_usd),
+            'volume': float(self.volume_usd) if self.volume_usd is not None else None,
+            'samples': self.sample_count
+        }
+
+    def __repr__(self):
+        return f'<PriceBar {self.asset_symbol} {self.resolution} @ {self.bucket_start}: ${self.close_usd}>'
+
+class TokenMetadata(db.Model):
+    """Model for cached ERC-20 token metadata (decimals, symbol, name)"""
+    __tablename__ = 'token_metadata'
+    __table_args__ = (
+        UniqueConstraint('blockchain_network', 'contract_address', name='uq_token_metadata_network_contract'),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    
+    # Token identification
+    blockchain_network = Column(Enum(BlockchainNetwork), nullable=False)
+    contract_address = Column(String(255), nullable=False)  # Checksummed address
+    
+    # Token metadata
+    decimals = Column(Integer, nullable=False)
+    symbol = Column(String(50))
+    name = Column(String(255))
+    
+    # Timestamps
+    created_at = Column(DateTime, default=datetime.utcnow)
+    last_updated = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'network': self.blockchain_network.value,
+            'contract_address': self.contract_address,
+            'decimals': self.decimals,
+            'symbol': self.symbol,
+            'name': self.name
+        }
+    
+    def __repr__(self):
+        return f'<TokenMetadata {self.symbol} ({self.blockchain_network.value}): {self.decimals} decimals>'
+
+class ContractEvent(db.Model):
+    """Model for indexed inheritance contract events (ActivityRecorded, InheritanceTriggered, InheritanceExecuted)"""
+    __tablename__ = 'contract_events'
+    __table_args__ = (
+        UniqueConstraint('blockchain_network', 'transaction_hash', 'log_index', name='uq_contract_events_log'),
+        Index('ix_contract_events_contract_event', 'blockchain_network', 'contract_address', 'event_name'),
+        Index('ix_contract_events_confirmation', 'blockchain_network', 'confirmation_status', 'block_number'),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    
+    # Log identification
+    blockchain_network = Column(Enum(BlockchainNetwork), nullable=False)
+    contract_address = Column(String(255), nullable=False)  # Checksummed address
+    event_name = Column(String(100), nullable=False)
+    block_number = Column(Integer, nullable=False)
+    block_hash = Column(String(66), nullable=False)
+    transaction_hash = Column(String(255), nullable=False)
+    log_index = Column(Integer, nullable=False)
+    confirmation_status = Column(String(20), nullable=False, default='unconfirmed')  # unconfirmed, final
+    
+    # Decoded event data
+    event_timestamp = Column(Integer)  # Unix timestamp emitted by the contract
+    
+    # Timestamps
+    indexed_at = Column(DateTime, default=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'network': self.blockchain_network.value,
+            'contract_address': self.contract_address,
+            'event_name': self.event_name,
+            'block_number': self.block_number,
+            'block_hash': self.block_hash,
+            'transaction_hash': self.transaction_hash,
+            'log_index': self.log_index,
+            'confirmation_status': self.confirmation_status,
+            'event_timestamp': self.event_timestamp,
+            'indexed_at': self.indexed_at.isoformat() if self.indexed_at else None
+        }
+    
+    def __repr__(self):
+        return f'<ContractEvent {self.event_name} {self.contract_address} @ {self.block_number}>'
+
+class EventIndexCheckpoint(db.Model):
+    """Model for the last block the contract event indexer has fully processed per network"""
+    __tablename__ = 'event_index_checkpoints'
+    
+    id = Column(Integer, primary_key=True)
+    blockchain_network = Column(Enum(BlockchainNetwork), nullable=False, unique=True)
+    last_indexed_block = Column(Integer, nullable=False)
+    
+    # Timestamps
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<EventIndexCheckpoint {self.blockchain_network.value}: {self.last_indexed_block}>'
+
+class PortfolioSnapshot(db.Model):
+    """Model for a user's materialized portfolio totals, kept current by deltas on asset changes"""
+    __tablename__ = 'portfolio_snapshots'
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey('users.id'), nullable=False, unique=True)
+
+    # Portfolio totals
+    total_value_usd = Column(Numeric(30, 8), nullable=False, default=0)
+    inheritance_coverage_usd = Column(Numeric(30, 8), nullable=False, default=0)
+    network_values = Column(JSON)  # {network: value in USD as a decimal string}, active wallets only
+    asset_type_values = Column(JSON)  # {asset_type: value in USD as a decimal string}
+
+    # Counts
+    asset_count = Column(Integer, nullable=False, default=0)
+    high_value_assets = Column(Integer, nullable=False, default=0)
+    unprotected_assets = Column(Integer, nullable=False, default=0)
+    wallet_count = Column(Integer, nullable=False, default=0)  # Active wallets
+    wallet_networks = Column(JSON)  # Networks with an active wallet
+
+    # Set when a change could not be applied as a delta; the next read recomputes the row
+    needs_reconcile = Column(Boolean, nullable=False, default=False)
+
+    # Timestamps
+    reconciled_at = Column(DateTime)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'total_value_usd': float(self.total_value_usd or 0),
+            'inheritance_coverage_usd': float(self.inheritance_coverage_usd or 0),
+            'network_values': {k: float(v) for k, v in (self.network_values or {}).items()},
+            'asset_type_values': {k: float(v) for k, v in (self.asset_type_values or {}).items()},
+            'asset_count': self.asset_count,
+            'high_value_assets': self.high_value_assets,
+            'unprotected_assets': self.unprotected_assets,
+            'wallet_count': self.wallet_count,
+            'wallet_networks': self.wallet_networks or [],
+            'reconciled_at': self.reconciled_at.isoformat() if self.reconciled_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+    def __repr__(self):
+        return f'<PortfolioSnapshot user {self.user_id}: ${self.total_value_usd}>'
+
 class CryptoComplianceRecord(db.Model):
     """Model for cryptocurrency compliance and regulatory tracking"""
     __tablename__ = 'crypto_compliance_records'
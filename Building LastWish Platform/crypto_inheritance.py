@@ -9,6 +9,8 @@ from sqlalchemy.exc import IntegrityError
 from sqlalchemy import and_, or_, desc
 from datetime import datetime, timedelta
 from decimal import Decimal
+from concurrent.futures import ThreadPoolExecutor
+import calendar
 import json
 import uuid
 from typing import Dict, List, Optional
@@ -19,17 +21,93 @@ from models.crypto_assets import (
     InheritanceStatus, BlockchainNetwork
 )
 from utils.blockchain_integration import (
-    BlockchainManager, InheritanceSmartContract, CryptoTransferManager,
-    CryptoComplianceChecker, generate_inheritance_report
+    get_blockchain_manager, InheritanceSmartContract, CryptoTransferManager,
+    CryptoComplianceChecker, generate_inheritance_report, decrypt_sensitive_data
 )
+from utils.event_indexer import get_event_indexer
+from utils.confirmation_tracker import get_confirmation_tracker
+from utils.allocation import validate_allocations
+from utils.heartbeat_scheduler import get_heartbeat_scheduler
+from utils.trigger_engine import TRIGGER_PENDING, TRIGGER_RETRY_EVENT, ContractTriggerHandler, N8nWebhookNotifier, get_trigger_engine, plan_next_due_at
+from utils.portfolio_analytics import get_plan_stats, to_decimal
+from utils.portfolio_snapshot import get_portfolio_reconciler, get_portfolio_snapshot
+from utils.price_refresh import get_price_refresh_pipeline
+from utils.price_rollups import get_price_rollups
 
 crypto_inheritance_bp = Blueprint('crypto_inheritance', __name__, url_prefix='/api/crypto/inheritance')
 
 # Initialize blockchain utilities
-blockchain_manager = BlockchainManager()
+blockchain_manager = get_blockchain_manager()
 smart_contract_manager = InheritanceSmartContract(blockchain_manager)
 transfer_manager = CryptoTransferManager(blockchain_manager)
 compliance_checker = CryptoComplianceChecker()
+event_indexer = get_event_indexer(blockchain_manager.networks)
+confirmation_tracker = get_confirmation_tracker(blockchain_manager.networks)
+portfolio_reconciler = get_portfolio_reconciler()
+price_refresh = get_price_refresh_pipeline(blockchain_manager.networks)
+price_rollups = get_price_rollups()
+price_refresh.add_handler(price_rollups.ingest)
+
+def get_owner_signing_key(plan_id: int) -> str:
+    """Owner key for a plan's recordActivity() heartbeats and triggerInheritance() calls"""
+    return decrypt_sensitive_data("encrypted_key_placeholder", "encryption_key_placeholder")  # In real implementation, use secure key management
+
+# Transfers run off the request thread: confirming receipts outlasts the gunicorn worker timeout
+transfer_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='inheritance-transfer')
+
+# execution_status of a transfer run; an incomplete run may be retried and skips transfers that completed
+EXECUTION_RUNNING = 'executing'
+EXECUTION_INCOMPLETE = 'execution_incomplete'
+EXECUTION_COMPLETED = 'executed'
+
+# Relays owner check-ins on chain; without a key from get_owner_signing_key a heartbeat backs off like a failed one
+heartbeat_scheduler = get_heartbeat_scheduler(blockchain_manager.networks, key_provider=get_owner_signing_key)
+
+# Dead-man switch: notify on every trigger event, trigger the contract and stop its heartbeats on inactivity
+trigger_engine = get_trigger_engine()
+trigger_engine.add_handler(N8nWebhookNotifier())
+contract_trigger_handler = ContractTriggerHandler(blockchain_manager.networks, get_owner_signing_key)
+trigger_engine.add_handler(contract_trigger_handler, 'inactivity_threshold_reached')
+trigger_engine.add_handler(contract_trigger_handler, TRIGGER_RETRY_EVENT)
+
+def stop_plan_heartbeats(event: Dict):
+    """A triggered plan's owner is presumed inactive; stop relaying activity for it"""
+    if event['source'] == 'crypto_inheritance_plans':
+        heartbeat_scheduler.unschedule(event['id'])
+
+trigger_engine.add_handler(stop_plan_heartbeats, 'inactivity_threshold_reached')
+
+@crypto_inheritance_bp.record_once
+def warm_blockchain_caches(state):
+    """Load persisted token metadata and price bars and start the chain, trigger, portfolio and price background workers on registration"""
+    with state.app.app_context():
+        blockchain_manager.token_metadata.warm()
+        price_rollups.warm()
+    event_indexer.start(state.app)
+    confirmation_tracker.start(state.app)
+    heartbeat_scheduler.start(state.app)
+    trigger_engine.start(state.app)
+    portfolio_reconciler.start(state.app)
+    price_refresh.start(state.app)
+    price_rollups.start(state.app)
+
+def get_plan_contract_status(plan: CryptoInheritancePlan) -> Dict:
+    """Contract status from the event index, falling back to a live read while the index is missing or stale"""
+    status = smart_contract_manager.get_indexed_status(
+        plan.smart_contract_address,
+        plan.smart_contract_network.value,
+        inactivity_period_days=(plan.trigger_conditions or {}).get('inactivity_period', 365),
+        time_delay_days=plan.time_delay or 0,
+        deployed_at=plan.created_at or datetime.utcnow()
+    )
+    if status is not None:
+        return status
+    
+    return smart_contract_manager.check_contract_status(
+        plan.smart_contract_address,
+        plan.smart_contract_network.value,
+        beneficiary_count=len(plan.beneficiaries or [])
+    )
 
 @crypto_inheritance_bp.route('/plans', methods=['POST'])
 @jwt_required()
@@ -52,8 +130,7 @@ def create_inheritance_plan():
         
         # Validate beneficiaries
         beneficiaries = data['beneficiaries']
-        total_allocation = sum(b.get('allocation_percentage', 0) for b in beneficiaries)
-        if total_allocation != 100:
+        if not validate_allocations(b.get('allocation_percentage', 0) for b in beneficiaries):
             return jsonify({'success': False, 'error': 'Total beneficiary allocation must equal 100%'}), 400
         
         # Create inheritance plan
@@ -93,6 +170,8 @@ def create_inheritance_plan():
                 
                 if deployment_result:
                     plan.smart_contract_address = deployment_result['contract_address']
+                    plan.contract_deployment_hash = deployment_result['transaction_hash']
+                    plan.contract_deployment_block = deployment_result['block_number']
                     plan.smart_contract_deployment_data = deployment_result
                     current_app.logger.info(f"Smart contract deployed: {deployment_result['contract_address']}")
                 else:
@@ -101,8 +180,14 @@ def create_inheritance_plan():
             except ValueError as e:
                 return jsonify({'success': False, 'error': f'Invalid smart contract network: {str(e)}'}), 400
         
+        plan.next_due_at = plan_next_due_at(plan)
         db.session.add(plan)
         db.session.commit()
+        trigger_engine.schedule('crypto_inheritance_plans', plan.id, plan.next_due_at)
+        
+        # A fresh contract has no events yet; its heartbeats wait for the owner's first check-in
+        if plan.smart_contract_address:
+            heartbeat_scheduler.schedule_plan(plan, {})
         
         # Update wallet inheritance status
         wallet.inheritance_status = InheritanceStatus.CONFIGURED
@@ -144,10 +229,7 @@ def get_smart_contract_status(plan_id):
             return jsonify({'success': False, 'error': 'No smart contract deployed for this plan'}), 400
         
         # Get contract status
-        contract_status = smart_contract_manager.check_contract_status(
-            plan.smart_contract_address,
-            plan.smart_contract_network.value
-        )
+        contract_status = get_plan_contract_status(plan)
         
         return jsonify({
             'success': True,
@@ -159,6 +241,45 @@ def get_smart_contract_status(plan_id):
         current_app.logger.error(f"Error getting smart contract status: {str(e)}")
         return jsonify({'success': False, 'error': 'Failed to get contract status'}), 500
 
+@crypto_inheritance_bp.route('/plans/<int:plan_id>/check-in', methods=['POST'])
+@jwt_required()
+def check_in_plan(plan_id):
+    """Owner proof-of-life: restart the plan's inactivity period from now"""
+    try:
+        user_id = get_jwt_identity()
+        
+        plan = CryptoInheritancePlan.query.filter_by(id=plan_id, user_id=user_id).first()
+        if not plan:
+            return jsonify({'success': False, 'error': 'Inheritance plan not found'}), 404
+        
+        if plan.plan_status == InheritanceStatus.EXECUTED or plan.execution_status not in (None, TRIGGER_PENDING):
+            return jsonify({'success': False, 'error': 'Inheritance plan has already been triggered'}), 409
+        
+        # A contract that has not been triggered on chain yet is still the owner's to keep alive
+        plan.execution_status = None
+        plan.last_verification = datetime.utcnow()
+        plan.next_due_at = plan_next_due_at(plan)
+        db.session.commit()
+        trigger_engine.schedule('crypto_inheritance_plans', plan.id, plan.next_due_at)
+        
+        # Relay the check-in on chain before the contract's own deadline
+        if plan.smart_contract_address:
+            checked_in_at = calendar.timegm(plan.last_verification.utctimetuple())
+            if not heartbeat_scheduler.record_proof_of_life(plan.id, checked_in_at):
+                heartbeat_scheduler.schedule_plan(plan)
+        
+        return jsonify({
+            'success': True,
+            'plan_id': plan.id,
+            'last_verification': plan.last_verification.isoformat(),
+            'next_due_at': plan.next_due_at.isoformat() if plan.next_due_at else None
+        }), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Error checking in plan: {str(e)}")
+        return jsonify({'success': False, 'error': 'Failed to check in'}), 500
+
 @crypto_inheritance_bp.route('/plans/<int:plan_id>/transfer/prepare', methods=['POST'])
 @jwt_required()
 def prepare_inheritance_transfer(plan_id):
@@ -175,19 +296,31 @@ def prepare_inheritance_transfer(plan_id):
         if not wallet:
             return jsonify({'success': False, 'error': 'Associated wallet not found'}), 404
         
+        # Optional execution mode: 'auto' (cheapest), 'per_transfer' or 'batched' (single multi-send)
+        data = request.get_json(silent=True) or {}
+        execution_mode = data.get('execution_mode', 'auto')
+        if execution_mode not in ('auto', 'per_transfer', 'batched'):
+            return jsonify({'success': False, 'error': 'Invalid execution mode'}), 400
+        
         # Prepare transfer plan
         transfer_result = transfer_manager.prepare_inheritance_transfer(
             wallet_address=wallet.wallet_address,
             private_key_encrypted="encrypted_key_placeholder",  # In real implementation, use secure storage
             beneficiaries=plan.beneficiaries,
-            network=wallet.blockchain_network.value
+            network=wallet.blockchain_network.value,
+            execution_mode=execution_mode
         )
         
         if not transfer_result['success']:
             return jsonify(transfer_result), 400
         
+        # A started run's results are indexed by the stored plan; it must finish before re-preparing
+        if plan.execution_status in (EXECUTION_RUNNING, EXECUTION_INCOMPLETE):
+            return jsonify({'success': False, 'error': 'A transfer execution for this plan is not finished'}), 409
+        
         # Store transfer plan for later execution
         plan.transfer_plan_data = transfer_result['transfer_plan']
+        plan.execution_data = None
         plan.plan_status = InheritanceStatus.READY_FOR_EXECUTION
         db.session.commit()
         
@@ -201,10 +334,63 @@ def prepare_inheritance_transfer(plan_id):
         current_app.logger.error(f"Error preparing inheritance transfer: {str(e)}")
         return jsonify({'success': False, 'error': 'Failed to prepare transfer'}), 500
 
+@crypto_inheritance_bp.route('/plans/<int:plan_id>/transfer/simulate', methods=['POST'])
+@jwt_required()
+def simulate_inheritance_transfer(plan_id):
+    """Simulate execution costs of the prepared transfer plan over fee, price and delay scenarios"""
+    try:
+        user_id = get_jwt_identity()
+        plan = CryptoInheritancePlan.query.filter_by(id=plan_id, user_id=user_id).first()
+        
+        if not plan:
+            return jsonify({'success': False, 'error': 'Inheritance plan not found'}), 404
+        
+        wallet = CryptoWallet.query.filter_by(id=plan.wallet_id).first()
+        if not wallet:
+            return jsonify({'success': False, 'error': 'Associated wallet not found'}), 404
+        
+        # Optional: execution mode, current native token price in USD and scenario count
+        data = request.get_json(silent=True) or {}
+        execution_mode = data.get('execution_mode', 'auto')
+        if execution_mode not in ('auto', 'per_transfer', 'batched'):
+            return jsonify({'success': False, 'error': 'Invalid execution mode'}), 400
+        price_usd = data.get('price_usd')
+        scenarios = int(data.get('scenarios', 20000))
+        if not 100 <= scenarios <= 200000:
+            return jsonify({'success': False, 'error': 'Scenarios must be between 100 and 200000'}), 400
+        
+        # Simulate the plan as it would be prepared from the current balance
+        transfer_result = transfer_manager.prepare_inheritance_transfer(
+            wallet_address=wallet.wallet_address,
+            private_key_encrypted="encrypted_key_placeholder",
+            beneficiaries=plan.beneficiaries,
+            network=wallet.blockchain_network.value,
+            execution_mode=execution_mode
+        )
+        if not transfer_result['success']:
+            return jsonify(transfer_result), 400
+        
+        simulation_result = transfer_manager.simulate_execution_costs(
+            transfer_plan=transfer_result['transfer_plan'],
+            inactivity_period_days=(plan.trigger_conditions or {}).get('inactivity_period', 365),
+            time_delay_days=plan.time_delay or 0,
+            price_usd=float(price_usd) if price_usd else None,
+            scenarios=scenarios
+        )
+        
+        if not simulation_result['success']:
+            return jsonify(simulation_result), 400
+        
+        return jsonify(simulation_result), 200
+        
+    except Exception as e:
+        current_app.logger.error(f"Error simulating inheritance transfer: {str(e)}")
+        return jsonify({'success': False, 'error': 'Failed to simulate transfer'}), 500
+
 @crypto_inheritance_bp.route('/plans/<int:plan_id>/transfer/execute', methods=['POST'])
 @jwt_required()
 def execute_inheritance_transfer(plan_id):
-    """Execute inheritance transfer (requires additional authorization)"""
+    """Start the inheritance transfer (requires additional authorization); poll the execution route for the outcome"""
     try:
         user_id = get_jwt_identity()
         data = request.get_json()
@@ -222,32 +408,101 @@ def execute_inheritance_transfer(plan_id):
         if not authorization_code:
             return jsonify({'success': False, 'error': 'Authorization code required'}), 400
         
-        # Execute transfer
-        execution_result = transfer_manager.execute_inheritance_transfer(
-            transfer_plan=plan.transfer_plan_data,
-            private_key_encrypted="encrypted_key_placeholder",
-            encryption_key="encryption_key_placeholder"
-        )
-        
-        if not execution_result['success']:
-            return jsonify(execution_result), 400
-        
-        # Update plan status
-        plan.plan_status = InheritanceStatus.EXECUTED
-        plan.execution_date = datetime.utcnow()
-        plan.execution_data = execution_result['execution_summary']
+        # Claim the plan with one conditional UPDATE so concurrent requests and workers cannot run it twice
+        execution_id = f"exec_{uuid.uuid4().hex}"
+        claimed = CryptoInheritancePlan.query.filter(
+            CryptoInheritancePlan.id == plan.id,
+            CryptoInheritancePlan.plan_status == InheritanceStatus.READY_FOR_EXECUTION,
+            or_(
+                CryptoInheritancePlan.execution_status.is_(None),
+                CryptoInheritancePlan.execution_status.notin_([EXECUTION_RUNNING, EXECUTION_COMPLETED])
+            )
+        ).update({
+            CryptoInheritancePlan.execution_status: EXECUTION_RUNNING,
+            CryptoInheritancePlan.execution_notes: execution_id
+        }, synchronize_session=False)
         db.session.commit()
+        if not claimed:
+            return jsonify({'success': False, 'error': 'Plan execution is already in progress or finished'}), 409
+        
+        transfer_executor.submit(run_inheritance_transfer, current_app._get_current_object(), plan.id, execution_id)
         
         return jsonify({
             'success': True,
-            'message': 'Inheritance transfer executed successfully',
-            'execution_summary': execution_result['execution_summary']
-        }), 200
+            'message': 'Inheritance transfer started',
+            'execution_id': execution_id,
+            'status': EXECUTION_RUNNING
+        }), 202
         
     except Exception as e:
+        db.session.rollback()
         current_app.logger.error(f"Error executing inheritance transfer: {str(e)}")
         return jsonify({'success': False, 'error': 'Failed to execute transfer'}), 500
 
+def run_inheritance_transfer(app, plan_id: int, execution_id: str):
+    """Execute a claimed plan's transfers; only a run where every transfer completed marks the plan executed"""
+    with app.app_context():
+        try:
+            plan = db.session.get(CryptoInheritancePlan, plan_id)
+            previous = plan.execution_data if plan.execution_data and 'transfer_results' in plan.execution_data else None
+            
+            execution_result = transfer_manager.execute_inheritance_transfer(
+                transfer_plan=plan.transfer_plan_data,
+                private_key_encrypted="encrypted_key_placeholder",
+                encryption_key="encryption_key_placeholder",
+                previous_summary=previous
+            )
+            
+            summary = execution_result.get('execution_summary') or previous
+            if summary is not None:
+                summary = dict(summary, execution_id=execution_id)
+                plan.execution_data = summary
+            
+            if execution_result['success']:
+                plan.plan_status = InheritanceStatus.EXECUTED
+                plan.execution_status = EXECUTION_COMPLETED
+                plan.execution_date = datetime.utcnow()
+                plan.execution_notes = execution_id
+            else:
+                plan.execution_status = EXECUTION_INCOMPLETE
+                plan.execution_notes = f"{execution_id}: {execution_result['error']}"
+            db.session.commit()
+            
+        except Exception as e:
+            db.session.rollback()
+            failed_plan = db.session.get(CryptoInheritancePlan, plan_id)
+            if failed_plan is not None:
+                failed_plan.execution_status = EXECUTION_INCOMPLETE
+                failed_plan.execution_notes = f"{execution_id}: {str(e)}"
+                db.session.commit()
+            app.logger.error(f"Error running inheritance transfer {execution_id}: {str(e)}")
+        finally:
+            db.session.remove()
+
+@crypto_inheritance_bp.route('/plans/<int:plan_id>/transfer/execution', methods=['GET'])
+@jwt_required()
+def get_inheritance_transfer_execution(plan_id):
+    """Get the state and per-transfer results of the plan's latest transfer execution"""
+    try:
+        user_id = get_jwt_identity()
+        plan = CryptoInheritancePlan.query.filter_by(id=plan_id, user_id=user_id).first()
+        
+        if not plan:
+            return jsonify({'success': False, 'error': 'Inheritance plan not found'}), 404
+        
+        return jsonify({
+            'success': True,
+            'plan_id': plan.id,
+            'plan_status': plan.plan_status.value if plan.plan_status else None,
+            'status': plan.execution_status,
+            'notes': plan.execution_notes,
+            'execution_summary': plan.execution_data
+        }), 200
+        
+    except Exception as e:
+        current_app.logger.error(f"Error getting inheritance transfer execution: {str(e)}")
+        return jsonify({'success': False, 'error': 'Failed to get transfer execution'}), 500
+
 @crypto_inheritance_bp.route('/plans/<int:plan_id>/compliance', methods=['GET'])
 @jwt_required()
 def get_compliance_report(plan_id):
@@ -303,10 +558,7 @@ def get_comprehensive_report(plan_id):
         # Get blockchain status if smart contract exists
         blockchain_status = {}
         if plan.smart_contract_address:
-            blockchain_status = smart_contract_manager.check_contract_status(
-                plan.smart_contract_address,
-                plan.smart_contract_network.value
-            )
+            blockchain_status = get_plan_contract_status(plan)
         
         # Get compliance report
         compliance_report = compliance_checker.check_inheritance_compliance(
@@ -368,9 +620,12 @@ def get_wallet_balance(wallet_id):
                 'asset_name': asset.asset_name,
                 'asset_symbol': asset.asset_symbol,
                 'quantity': float(asset.quantity),
+                'current_price_usd': float(asset.current_price_usd) if asset.current_price_usd else None,
                 'current_value_usd': float(asset.current_value_usd or 0),
                 'inheritance_percentage': float(asset.inheritance_percentage)
             }
+            # Derived from the price bars rather than stored
+            asset_info.update(price_rollups.price_changes(asset.asset_symbol))
             asset_data.append(asset_info)
         
         return jsonify({
@@ -393,6 +648,53 @@ def get_wallet_balance(wallet_id):
         current_app.logger.error(f"Error getting wallet balance: {str(e)}")
         return jsonify({'success': False, 'error': 'Failed to get wallet balance'}), 500
 
+@crypto_inheritance_bp.route('/wallets/balances', methods=['GET'])
+@jwt_required()
+def get_wallet_balances():
+    """Get native balances for all of the user's wallets across networks in batched RPC calls"""
+    try:
+        user_id = get_jwt_identity()
+        wallets = CryptoWallet.query.filter_by(user_id=user_id, is_active=True).all()
+        
+        # Group wallets per network so each network gets one batched lookup
+        wallets_by_network = {}
+        for wallet in wallets:
+            wallets_by_network.setdefault(wallet.blockchain_network.value, []).append(wallet)
+        
+        # Every network is queried concurrently, so latency tracks the slowest network
+        # snapshot=true pins every balance on a network to the same block
+        balances_by_network = blockchain_manager.get_multichain_balances(
+            {
+                network: [w.wallet_address for w in network_wallets]
+                for network, network_wallets in wallets_by_network.items()
+            },
+            consistent_snapshot=request.args.get('snapshot', 'false').lower() == 'true'
+        )
+        
+        wallet_balances = []
+        for network, network_wallets in wallets_by_network.items():
+            for wallet, balance in zip(network_wallets, balances_by_network[network]):
+                wallet_balances.append({
+                    'id': wallet.id,
+                    'wallet_name': wallet.wallet_name,
+                    'wallet_address': wallet.wallet_address,
+                    'network': network,
+                    'native_balance': float(balance['balance']) if balance['balance'] is not None else None,
+                    'block_number': balance['block_number'],
+                    'error': balance['error']
+                })
+        
+        return jsonify({
+            'success': True,
+            'wallet_count': len(wallet_balances),
+            'wallets': wallet_balances,
+            'last_updated': datetime.utcnow().isoformat()
+        }), 200
+        
+    except Exception as e:
+        current_app.logger.error(f"Error getting wallet balances: {str(e)}")
+        return jsonify({'success': False, 'error': 'Failed to get wallet balances'}), 500
+
 @crypto_inheritance_bp.route('/beneficiaries/<int:beneficiary_id>/verify', methods=['POST'])
 @jwt_required()
 def verify_beneficiary(beneficiary_id):
@@ -446,46 +748,10 @@ def get_portfolio_analytics():
     try:
         user_id = get_jwt_identity()
         
-        # Get all user's crypto assets and wallets
-        wallets = CryptoWallet.query.filter_by(user_id=user_id, is_active=True).all()
-        assets = CryptoAsset.query.filter_by(user_id=user_id).all()
-        inheritance_plans = CryptoInheritancePlan.query.filter_by(user_id=user_id).all()
-        
-        # Calculate portfolio metrics
-        total_portfolio_value = Decimal('0')
-        inheritance_coverage = Decimal('0')
-        network_distribution = {}
-        asset_type_distribution = {}
-        
-        for asset in assets:
-            if asset.current_value_usd:
-                total_portfolio_value += asset.current_value_usd
-                
-                # Calculate inheritance coverage
-                if asset.inheritance_percentage > 0:
-                    inheritance_coverage += asset.current_value_usd * (asset.inheritance_percentage / 100)
-                
-                # Network distribution
-                wallet = next((w for w in wallets if w.id == asset.wallet_id), None)
-                if wallet:
-                    network = wallet.blockchain_network.value
-                    if network not in network_distribution:
-                        network_distribution[network] = Decimal('0')
-                    network_distribution[network] += asset.current_value_usd
-                
-                # Asset type distribution
-                asset_type = asset.asset_type.value
-                if asset_type not in asset_type_distribution:
-                    asset_type_distribution[asset_type] = Decimal('0')
-                asset_type_distribution[asset_type] += asset.current_value_usd
-        
-        # Calculate inheritance plan statistics
-        plan_stats = {
-            'total_plans': len(inheritance_plans),
-            'active_plans': len([p for p in inheritance_plans if p.plan_status == InheritanceStatus.ACTIVE]),
-            'configured_plans': len([p for p in inheritance_plans if p.plan_status == InheritanceStatus.CONFIGURED]),
-            'smart_contract_plans': len([p for p in inheritance_plans if p.smart_contract_address])
-        }
+        # Totals are kept current on the user's snapshot row; only plan counts are read live
+        snapshot = get_portfolio_snapshot(user_id)
+        total_portfolio_value = to_decimal(snapshot.total_value_usd)
+        inheritance_coverage = to_decimal(snapshot.inheritance_coverage_usd)
         
         # Calculate coverage percentage
         coverage_percentage = float((inheritance_coverage / total_portfolio_value * 100) if total_portfolio_value > 0 else 0)
@@ -493,18 +759,18 @@ def get_portfolio_analytics():
         analytics = {
             'portfolio_summary': {
                 'total_value_usd': float(total_portfolio_value),
-                'total_wallets': len(wallets),
-                'total_assets': len(assets),
+                'total_wallets': snapshot.wallet_count,
+                'total_assets': snapshot.asset_count,
                 'inheritance_coverage_usd': float(inheritance_coverage),
                 'inheritance_coverage_percentage': coverage_percentage
             },
-            'network_distribution': {k: float(v) for k, v in network_distribution.items()},
-            'asset_type_distribution': {k: float(v) for k, v in asset_type_distribution.items()},
-            'inheritance_plan_stats': plan_stats,
+            'network_distribution': {k: float(v) for k, v in (snapshot.network_values or {}).items()},
+            'asset_type_distribution': {k: float(v) for k, v in (snapshot.asset_type_values or {}).items()},
+            'inheritance_plan_stats': get_plan_stats(user_id),
             'risk_assessment': {
-                'high_value_assets': len([a for a in assets if a.current_value_usd and a.current_value_usd > 10000]),
-                'unprotected_assets': len([a for a in assets if a.inheritance_percentage == 0]),
-                'single_point_of_failure': len(set(w.blockchain_network.value for w in wallets)) == 1
+                'high_value_assets': snapshot.high_value_assets,
+                'unprotected_assets': snapshot.unprotected_assets,
+                'single_point_of_failure': len(snapshot.wallet_networks or []) == 1
             },
             'recommendations': [
                 'Diversify across multiple blockchain networks',
@@ -524,6 +790,23 @@ def get_portfolio_analytics():
         current_app.logger.error(f"Error generating portfolio analytics: {str(e)}")
         return jsonify({'success': False, 'error': 'Failed to generate analytics'}), 500
 
+@crypto_inheritance_bp.route('/rpc/stats', methods=['GET'])
+@jwt_required()
+def get_rpc_stats():
+    """Get health, latency and error stats for every RPC endpoint"""
+    try:
+        return jsonify({
+            'success': True,
+            'networks': blockchain_manager.get_connection_status(),
+            'endpoints': blockchain_manager.get_endpoint_stats(),
+            'heartbeats': heartbeat_scheduler.get_stats(),
+            'generated_at': datetime.utcnow().isoformat()
+        }), 200
+        
+    except Exception as e:
+        current_app.logger.error(f"Error getting RPC stats: {str(e)}")
+        return jsonify({'success': False, 'error': 'Failed to get RPC stats'}), 500
+
 # Error Handlers
 
 @crypto_inheritance_bp.errorhandler(400)
@@ -0,0 +1,413 @@
+"""
+Development Chain for LastWish Crypto Inheritance
+Runs an in-process EVM behind a local JSON-RPC endpoint, seeded with wallets, tokens and inheritance contracts
+
+Set BLOCKCHAIN_PROVIDER=dev to point every network at its own dev chain instead of the public RPC endpoints.
+"""
+
+import json
+import os
+import threading
+import logging
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Sequence
+
+from eth_account import Account
+from eth_utils import to_canonical_address
+from hexbytes import HexBytes
+from web3 import Web3
+
+from utils.allocation import BASIS_POINTS, apportion, shares_to_list
+from utils.balance_cache import get_block_watcher
+from utils.contract_artifacts import encode_deployment_data, get_artifact_store
+from utils.disperse import DISPERSE_ADDRESS
+from utils.multicall import MULTICALL3_ADDRESS
+
+logger = logging.getLogger(__name__)
+
+# 'rpc' uses the configured endpoints, 'dev' the in-process chain
+BLOCKCHAIN_PROVIDER = os.environ.get('BLOCKCHAIN_PROVIDER', 'rpc')
+
+DEV_CHAIN_SEED = os.environ.get('DEV_CHAIN_SEED', 'lastwish-dev')
+DEV_WALLET_COUNT = int(os.environ.get('DEV_CHAIN_WALLETS', '200'))
+DEV_WALLET_BALANCE = 1000 * 10 ** 18
+
+# The dev chain mines one block per transaction, so heads can be polled far more often than on a real network
+DEV_POLL_INTERVAL = 0.05
+
+# Gas for fixture transactions sent straight to the backend (token mints loop over every holder)
+SEED_GAS_LIMIT = 15000000
+
+# Only the Multicall3 functions the platform calls; deployed at the canonical address in genesis
+MULTICALL3_SOURCE = """
+pragma solidity ^0.8.0;
+
+contract Multicall3 {
+    struct Call3 {
+        address target;
+        bool allowFailure;
+        bytes callData;
+    }
+
+    struct Result {
+        bool success;
+        bytes returnData;
+    }
+
+    function aggregate3(Call3[] calldata calls) public payable returns (Result[] memory returnData) {
+        uint256 length = calls.length;
+        returnData = new Result[](length);
+        for (uint256 i = 0; i < length; i++) {
+            Call3 calldata calli = calls[i];
+            (bool success, bytes memory ret) = calli.target.call(calli.callData);
+            require(success || calli.allowFailure, "Multicall3: call failed");
+            returnData[i] = Result(success, ret);
+        }
+    }
+
+    function getEthBalance(address addr) public view returns (uint256) {
+        return addr.balance;
+    }
+
+    function getCurrentBlockTimestamp() public view returns (uint256) {
+        return block.timestamp;
+    }
+
+    function getBlockNumber() public view returns (uint256) {
+        return block.number;
+    }
+}
+"""
+
+DISPERSE_SOURCE = """
+pragma solidity ^0.8.0;
+
+contract Disperse {
+    function disperseEther(address[] calldata recipients, uint256[] calldata values) external payable {
+        for (uint256 i = 0; i < recipients.length; i++) {
+            payable(recipients[i]).transfer(values[i]);
+        }
+        uint256 balance = address(this).balance;
+        if (balance > 0) {
+            payable(msg.sender).transfer(balance);
+        }
+    }
+}
+"""
+
+DEV_TOKEN_SOURCE = """
+pragma solidity ^0.8.0;
+
+contract DevToken {
+    string public name;
+    string public symbol;
+    uint8 public decimals;
+    uint256 public totalSupply;
+
+    mapping(address => uint256) public balanceOf;
+    mapping(address => mapping(address => uint256)) public allowance;
+
+    event Transfer(address indexed from, address indexed to, uint256 value);
+    event Approval(address indexed owner, address indexed spender, uint256 value);
+
+    constructor(string memory _name, string memory _symbol, uint8 _decimals, address[] memory _holders, uint256 _amount) {
+        name = _name;
+        symbol = _symbol;
+        decimals = _decimals;
+        for (uint256 i = 0; i < _holders.length; i++) {
+            balanceOf[_holders[i]] += _amount;
+            emit Transfer(address(0), _holders[i], _amount);
+        }
+        totalSupply = _amount * _holders.length;
+    }
+
+    function transfer(address to, uint256 value) external returns (bool) {
+        _transfer(msg.sender, to, value);
+        return true;
+    }
+
+    function approve(address spender, uint256 value) external returns (bool) {
+        allowance[msg.sender][spender] = value;
+        emit Approval(msg.sender, spender, value);
+        return true;
+    }
+
+    function transferFrom(address from, address to, uint256 value) external returns (bool) {
+        require(allowance[from][msg.sender] >= value, "Insufficient allowance");
+        allowance[from][msg.sender] -= value;
+        _transfer(from, to, value);
+        return true;
+    }
+
+    function _transfer(address from, address to, uint256 value) internal {
+        require(balanceOf[from] >= value, "Insufficient balance");
+        balanceOf[from] -= value;
+        balanceOf[to] += value;
+        emit Transfer(from, to, value);
+    }
+}
+"""
+
+def _to_rpc(value: Any) -> Any:
+    """Convert backend results (ints, bytes, attribute dicts) to JSON-RPC hex encoding"""
+    if isinstance(value, bool) or value is None:
+        return value
+    if isinstance(value, int):
+        return hex(value)
+    if isinstance(value, (bytes, bytearray, HexBytes)):
+        return '0x' + bytes(value).hex()
+    if hasattr(value, 'items'):
+        return {key: _to_rpc(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_to_rpc(item) for item in value]
+    return value
+
+class _RpcRequestHandler(BaseHTTPRequestHandler):
+    # Keep-alive, so pooled sessions reuse their connections as they would against a real node
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        try:
+            payload = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+            response = self.server.dev_chain.handle_payload(payload)
+        except ValueError as e:
+            response = {'jsonrpc': '2.0', 'id': None, 'error': {'code': -32700, 'message': str(e)}}
+
+        body = json.dumps(response).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+class DevChain:
+    """An eth-tester (py-evm) chain served over local HTTP JSON-RPC, with deterministic fixture wallets"""
+
+    def __init__(
+        self,
+        network: str,
+        wallet_count: int = DEV_WALLET_COUNT,
+        wallet_balance: int = DEV_WALLET_BALANCE,
+        seed: str = DEV_CHAIN_SEED
+    ):
+        self.network = network
+        self.wallet_balance = wallet_balance
+        # The same seed gives the same wallets on every network and every run
+        self.wallets = [Account.from_key(Web3.keccak(text=f'{seed}:{index}')) for index in range(wallet_count)]
+        self.artifacts = get_artifact_store()
+
+        self.web3 = None
+        self.chain_id = None
+        self._request_func = None
+        self._server = None
+        self._thread = None
+
+        # py-evm is not thread-safe; every request and fixture transaction runs under this lock
+        self._lock = threading.RLock()
+        self._http_requests = Counter()  # single requests by method, batches under 'batch'
+        self._method_counts = Counter()
+
+    @property
+    def url(self) -> Optional[str]:
+        return f'http://127.0.0.1:{self._server.server_port}' if self._server else None
+
+    def start(self) -> str:
+        """Build the genesis state, start the backend and serve it; returns the RPC URL"""
+        if self._server:
+            return self.url
+
+        # Imported lazily so production processes never need eth-tester or py-evm
+        from eth_tester import EthereumTester, PyEVMBackend
+        from web3 import EthereumTesterProvider
+
+        backend = PyEVMBackend(genesis_state=self._genesis_state(self._helper_code()))
+        self.web3 = Web3(EthereumTesterProvider(EthereumTester(backend)))
+        self.chain_id = self.web3.eth.chain_id
+        self._request_func = self.web3.provider.request_func(self.web3, self.web3.middleware_onion)
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), _RpcRequestHandler)
+        self._server.daemon_threads = True
+        self._server.dev_chain = self
+        self._thread = threading.Thread(
+            target=self._server.serve_forever,
+            name=f'dev-chain-{self.network}',
+            daemon=True
+        )
+        self._thread.start()
+
+        logger.info(f"Dev chain for {self.network} serving {len(self.wallets)} wallets at {self.url}")
+        return self.url
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def _helper_code(self) -> Dict[str, bytes]:
+        """Runtime code for the canonical Multicall3 and Disperse addresses; skipped if it cannot be compiled"""
+        code = {}
+        for address, source, contract_name in (
+            (MULTICALL3_ADDRESS, MULTICALL3_SOURCE, 'Multicall3'),
+            (DISPERSE_ADDRESS, DISPERSE_SOURCE, 'Disperse')
+        ):
+            try:
+                artifact = self.artifacts.get_artifact(source, contract_name)
+                code[address] = bytes.fromhex(artifact['runtime_bytecode'][2:])
+            except Exception as e:
+                logger.warning(f"Dev chain for {self.network} has no {contract_name} at {address}: {str(e)}")
+        return code
+
+    def _genesis_state(self, helper_code: Dict[str, bytes]) -> Dict[bytes, Dict]:
+        state = {
+            to_canonical_address(wallet.address): {
+                'balance': self.wallet_balance, 'nonce': 0, 'code': b'', 'storage': {}
+            }
+            for wallet in self.wallets
+        }
+        # Neither helper has constructor state, so placing their runtime code is the same as deploying them
+        for address, code in helper_code.items():
+            state[to_canonical_address(address)] = {'balance': 0, 'nonce': 1, 'code': code, 'storage': {}}
+        return state
+
+    def handle_payload(self, payload: Any) -> Any:
+        """Answer a single JSON-RPC request or a batch"""
+        with self._lock:
+            self._http_requests['batch' if isinstance(payload, list) else payload.get('method')] += 1
+        if isinstance(payload, list):
+            return [self._handle_request(request) for request in payload]
+        return self._handle_request(payload)
+
+    def _handle_request(self, request: Dict) -> Dict:
+        method = request.get('method')
+        with self._lock:
+            self._method_counts[method] += 1
+            try:
+                response = self._request_func(method, request.get('params') or [])
+            except Exception as e:
+                response = {'error': {'code': -32000, 'message': str(e)}}
+
+        if 'error' in response:
+            error = response['error']
+            reply = {'error': dict(error) if hasattr(error, 'items') else {'code': -32000, 'message': str(error)}}
+        else:
+            reply = {'result': _to_rpc(response.get('result'))}
+        reply.update(jsonrpc='2.0', id=request.get('id'))
+        return reply
+
+    def get_rpc_stats(self) -> Dict:
+        """HTTP round trips and JSON-RPC calls per method since the last reset
+
+        'requests' splits round trips into single calls by method and 'batch' payloads.
+        """
+        with self._lock:
+            return {
+                'http_requests': sum(self._http_requests.values()),
+                'rpc_calls': sum(self._method_counts.values()),
+                'requests': dict(self._http_requests),
+                'methods': dict(self._method_counts)
+            }
+
+    def reset_rpc_stats(self):
+        with self._lock:
+            self._http_requests.clear()
+            self._method_counts.clear()
+
+    def has_code(self, address: str) -> bool:
+        with self._lock:
+            return len(self.web3.eth.get_code(Web3.to_checksum_address(address))) > 0
+
+    def transact(self, sender, tx: Dict) -> Dict:
+        """Sign and mine a fixture transaction directly on the backend (not counted as RPC traffic)"""
+        with self._lock:
+            base_fee = self.web3.eth.get_block('latest')['baseFeePerGas']
+            signed = sender.sign_transaction(dict(
+                tx,
+                chainId=self.chain_id,
+                nonce=self.web3.eth.get_transaction_count(sender.address),
+                gas=tx.get('gas', SEED_GAS_LIMIT),
+                maxFeePerGas=2 * base_fee + 10 ** 9,
+                maxPriorityFeePerGas=10 ** 9
+            ))
+            receipt = self.web3.eth.get_transaction_receipt(self.web3.eth.send_raw_transaction(signed.rawTransaction))
+        if receipt['status'] != 1:
+            raise RuntimeError(f"Dev chain fixture transaction from {sender.address} reverted")
+        return receipt
+
+    def deploy(self, artifact: Dict, constructor_args: Sequence, deployer=None) -> str:
+        """Deploy a compiled artifact from a fixture wallet and return its address"""
+        receipt = self.transact(deployer or self.wallets[0], {'data': encode_deployment_data(artifact, constructor_args)})
+        return receipt['contractAddress']
+
+    def seed_tokens(self, count: int = 3, holders: Optional[int] = None, amount: int = 10 ** 24) -> List[str]:
+        """Deploy ERC-20 tokens that credit `amount` base units to the first `holders` wallets"""
+        artifact = self.artifacts.get_artifact(DEV_TOKEN_SOURCE, 'DevToken')
+        holder_addresses = [wallet.address for wallet in self.wallets[:holders]]
+        return [
+            self.deploy(artifact, [f'Dev Token {index}', f'DEV{index}', 18, holder_addresses, amount])
+            for index in range(count)
+        ]
+
+    def seed_inheritance_contracts(
+        self,
+        artifact: Dict,
+        count: int,
+        beneficiaries_per_contract: int = 3,
+        inactivity_period: int = 365 * 24 * 60 * 60,
+        time_delay: int = 30 * 24 * 60 * 60,
+        funding: int = 10 ** 18
+    ) -> List[Dict]:
+        """Deploy and fund CryptoInheritance contracts owned by the first `count` wallets
+
+        Beneficiaries are taken from the end of the wallet list with equal basis-point shares.
+        Returns entries shaped for InheritanceSmartContract.check_contract_statuses.
+        """
+        if count + beneficiaries_per_contract > len(self.wallets):
+            raise ValueError('Not enough dev wallets for the requested contracts and beneficiaries')
+
+        beneficiaries = [wallet.address for wallet in self.wallets[-beneficiaries_per_contract:]]
+        allocations = shares_to_list(apportion(BASIS_POINTS, [1] * beneficiaries_per_contract))
+
+        contracts = []
+        for owner in self.wallets[:count]:
+            address = self.deploy(artifact, [inactivity_period, time_delay, beneficiaries, allocations], owner)
+            if funding:
+                self.transact(owner, {'to': address, 'value': funding, 'gas': 100000})
+            contracts.append({
+                'contract_address': address,
+                'network': self.network,
+                'owner': owner.address,
+                'beneficiary_count': beneficiaries_per_contract,
+                'beneficiaries': beneficiaries,
+                'allocations': allocations
+            })
+        return contracts
+
+_chains: Dict[str, DevChain] = {}
+_chains_lock = threading.Lock()
+
+def get_dev_chain(network: str) -> DevChain:
+    """Return the process-wide dev chain for a network, starting it on first use"""
+    chain = _chains.get(network)
+    if chain is None:
+        with _chains_lock:
+            chain = _chains.get(network)
+            if chain is None:
+                chain = DevChain(network)
+                chain.start()
+                _chains[network] = chain
+    return chain
+
+def attach_dev_chains(networks: Dict[str, Dict]):
+    """Point every network config at its own dev chain and poll heads at dev-chain speed"""
+    watcher = get_block_watcher()
+    for network, config in networks.items():
+        chain = get_dev_chain(network)
+        config['rpc_url'] = chain.url
+        config['fallback_rpc_urls'] = []
+        config['chain_id'] = chain.chain_id
+        watcher.poll_intervals[network] = DEV_POLL_INTERVAL
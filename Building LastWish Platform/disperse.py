@@ -0,0 +1,108 @@
+"""
+Multi-Send Utilities for LastWish Crypto Inheritance
+Pays every beneficiary in one transaction through the Disperse contract and estimates its gas
+"""
+
+import threading
+import logging
+from typing import Dict, List, Optional
+
+from eth_abi import encode
+from web3 import Web3
+
+logger = logging.getLogger(__name__)
+
+# Disperse (disperse.app) is deployed at the same address on the supported EVM networks
+DISPERSE_ADDRESS = '0xD152f549545093347A162Dce210e7293f1452150'
+
+DISPERSE_ETHER_SELECTOR = Web3.keccak(text='disperseEther(address[],uint256[])')[:4]
+
+# Gas model used when eth_estimateGas cannot be run (e.g. the sender is not yet funded)
+TRANSACTION_BASE_GAS = 21000
+DISPERSE_OVERHEAD_GAS = 5000
+# CALL with value (9000) plus new-account surcharge (25000), minus the 2300 stipend; assumes fresh recipients
+DISPERSE_PER_RECIPIENT_GAS = 32000
+CALLDATA_NONZERO_BYTE_GAS = 16
+CALLDATA_ZERO_BYTE_GAS = 4
+# Headroom over eth_estimateGas so a slightly different state at inclusion does not run out of gas
+ESTIMATE_MARGIN = 1.1
+
+def encode_disperse_ether(recipients: List[str], values: List[int]) -> bytes:
+    """Encode disperseEther(recipients, values) call data"""
+    if len(recipients) != len(values):
+        raise ValueError('Recipients and values must have the same length')
+    return DISPERSE_ETHER_SELECTOR + encode(
+        ['address[]', 'uint256[]'],
+        [[Web3.to_checksum_address(r) for r in recipients], [int(v) for v in values]]
+    )
+
+def calldata_gas(data: bytes) -> int:
+    """Intrinsic gas charged for transaction call data"""
+    zero_bytes = data.count(0)
+    return zero_bytes * CALLDATA_ZERO_BYTE_GAS + (len(data) - zero_bytes) * CALLDATA_NONZERO_BYTE_GAS
+
+class DisperseClient:
+    """Builds and estimates single-transaction payouts against the Disperse contract"""
+
+    def __init__(self, address: str = DISPERSE_ADDRESS):
+        self.address = Web3.to_checksum_address(address)
+        self._deployed: Dict[str, bool] = {}
+        self._lock = threading.Lock()
+
+    def is_available(self, network: str, w3: Web3) -> bool:
+        """Return whether the contract has code on a network, checked once per process"""
+        if network not in self._deployed:
+            try:
+                deployed = len(w3.eth.get_code(self.address)) > 0
+            except Exception as e:
+                logger.warning(f"Could not check multi-send contract on {network}: {str(e)}")
+                return False
+            with self._lock:
+                self._deployed[network] = deployed
+        return self._deployed[network]
+
+    def build_transfer(self, recipients: List[str], values: List[int], gas: Optional[int] = None) -> Dict:
+        """Return a pipeline transfer ({to, value, data, gas}) paying every recipient at once"""
+        data = encode_disperse_ether(recipients, values)
+        return {
+            'to': self.address,
+            'value': sum(int(v) for v in values),
+            'data': data,
+            'gas': gas or self.model_gas(recipients, values)
+        }
+
+    def model_gas(self, recipients: List[str], values: List[int]) -> int:
+        """Upper-bound gas for disperseEther without touching the chain"""
+        data = encode_disperse_ether(recipients, values)
+        return (
+            TRANSACTION_BASE_GAS
+            + calldata_gas(data)
+            + DISPERSE_OVERHEAD_GAS
+            + DISPERSE_PER_RECIPIENT_GAS * len(recipients)
+        )
+
+    def estimate_gas(self, w3: Web3, sender: str, recipients: List[str], values: List[int]) -> int:
+        """Estimate gas with eth_estimateGas, falling back to the static model"""
+        try:
+            estimate = w3.eth.estimate_gas({
+                'from': Web3.to_checksum_address(sender),
+                'to': self.address,
+                'value': sum(int(v) for v in values),
+                'data': Web3.to_hex(encode_disperse_ether(recipients, values))
+            })
+            return int(estimate * ESTIMATE_MARGIN)
+        except Exception as e:
+            logger.debug(f"eth_estimateGas failed for multi-send, using gas model: {str(e)}")
+            return self.model_gas(recipients, values)
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_disperse_client() -> DisperseClient:
+    """Return the process-wide multi-send client"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = DisperseClient()
+    return _client
@@ -328,6 +328,7 @@ class SmartContract(db.Model):
     last_heartbeat = db.Column(db.DateTime, nullable=True)
     triggered_at = db.Column(db.DateTime, nullable=True)
     executed_at = db.Column(db.DateTime, nullable=True)
+    next_due_at = db.Column(db.DateTime, nullable=True, index=True)  # Next heartbeat or trigger deadline
     
     def to_dict(self):
         return {
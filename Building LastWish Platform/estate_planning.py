@@ -5,6 +5,7 @@ Handles will creation, asset management, beneficiaries, and crypto assets
 from flask import Blueprint, request, jsonify, session
 from models.user import db, User
 from models.estate_models import *
+from utils.portfolio_snapshot import get_portfolio_snapshot
 from datetime import datetime
 import json
 
@@ -26,16 +27,16 @@ def get_dashboard():
         # Get counts and summaries
         wills_count = Will.query.filter_by(user_id=user_id).count()
         assets_count = Asset.query.filter_by(user_id=user_id).count()
-        crypto_assets_count = CryptoAsset.query.filter_by(user_id=user_id).count()
         beneficiaries_count = Beneficiary.query.filter_by(user_id=user_id).count()
         
         # Calculate total asset value
         assets = Asset.query.filter_by(user_id=user_id).all()
         total_asset_value = sum(float(asset.estimated_value or 0) for asset in assets)
         
-        # Calculate crypto portfolio value
-        crypto_assets = CryptoAsset.query.filter_by(user_id=user_id).all()
-        total_crypto_value = sum(float(crypto.estimated_value or 0) for crypto in crypto_assets)
+        # Crypto totals come from the user's portfolio snapshot row
+        crypto_portfolio = get_portfolio_snapshot(user_id)
+        crypto_assets_count = crypto_portfolio.asset_count
+        total_crypto_value = float(crypto_portfolio.total_value_usd or 0)
         
         return jsonify({
             'success': True,
@@ -0,0 +1,334 @@
+"""
+Contract Event Indexer for LastWish Crypto Inheritance
+Catches up on inheritance contract logs with adaptive eth_getLogs ranges and a per-network checkpoint
+"""
+
+import threading
+import logging
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func
+from web3 import Web3
+
+from models.user import db
+from models.crypto_assets import BlockchainNetwork, ContractEvent, CryptoInheritancePlan, EventIndexCheckpoint
+from utils.rpc_connections import get_connection_registry
+
+logger = logging.getLogger(__name__)
+
+# Every CryptoInheritance event carries a single non-indexed uint256 timestamp
+INDEXED_EVENTS = {
+    Web3.to_hex(Web3.keccak(text=f'{name}(uint256)')): name
+    for name in ('ActivityRecorded', 'InheritanceTriggered', 'InheritanceExecuted')
+}
+
+# Provider error fragments that mean the block range or result set was too large
+RANGE_ERROR_MARKERS = ('range', 'too many', 'limit', 'exceed', 'timeout', '-32005')
+
+# Addresses per eth_getLogs filter; providers cap the address list size
+MAX_ADDRESSES_PER_FILTER = 500
+
+# Blocks a checkpoint may trail the head before indexed reads are considered stale
+MAX_INDEX_LAG_BLOCKS = 100
+
+class ContractEventIndexer:
+    """Indexes inheritance contract events for every deployed plan into the contract_events table"""
+
+    def __init__(
+        self,
+        networks: Dict[str, Dict],
+        initial_range: int = 2000,
+        min_range: int = 1,
+        max_range: int = 50000,
+        initial_lookback: int = 100000,
+        poll_interval: int = 30
+    ):
+        self.networks = networks
+        self.initial_range = initial_range
+        self.min_range = min_range
+        self.max_range = max_range
+        self.initial_lookback = initial_lookback
+        self.poll_interval = poll_interval
+
+        self.connections = get_connection_registry()
+
+        # Block span per eth_getLogs call, adapted per network from provider responses
+        self._ranges: Dict[str, int] = {}
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self, app):
+        """Run index_all on a background thread inside the given application's context"""
+        if self._thread and self._thread.is_alive():
+            return
+
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop_event.clear()
+            self._thread = threading.Thread(
+                target=self._run_loop,
+                args=(app,),
+                name='contract-event-indexer',
+                daemon=True
+            )
+            self._thread.start()
+
+    def stop(self):
+        """Stop the background indexing thread"""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def _run_loop(self, app):
+        while not self._stop_event.is_set():
+            with app.app_context():
+                try:
+                    self.index_all()
+                except Exception as e:
+                    logger.error(f"Error indexing contract events: {str(e)}")
+                finally:
+                    db.session.remove()
+            self._stop_event.wait(self.poll_interval)
+
+    def index_all(self) -> Dict[str, int]:
+        """Catch every supported network up to its head; returns events indexed per network"""
+        indexed = {}
+        for network in self.networks:
+            try:
+                indexed[network] = self.index_network(network)
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Error indexing contract events on {network}: {str(e)}")
+        return indexed
+
+    def _contracts(self, blockchain_network: BlockchainNetwork) -> List[CryptoInheritancePlan]:
+        return CryptoInheritancePlan.query.filter(
+            CryptoInheritancePlan.smart_contract_network == blockchain_network,
+            CryptoInheritancePlan.smart_contract_address.isnot(None)
+        ).all()
+
+    def _deployment_block(self, w3: Web3, plan: CryptoInheritancePlan, head: int) -> int:
+        """First block to scan for a plan's contract, read from its deployment receipt when not yet stored"""
+        if plan.contract_deployment_block is None and plan.contract_deployment_hash:
+            try:
+                plan.contract_deployment_block = w3.eth.get_transaction_receipt(plan.contract_deployment_hash)['blockNumber']
+            except Exception as e:
+                logger.warning(f"Could not read deployment block of {plan.smart_contract_address}: {str(e)}")
+        if plan.contract_deployment_block is not None:
+            return plan.contract_deployment_block
+        # Unknown deployment; the lookback is the best available bound
+        return max(head - self.initial_lookback, 0)
+
+    def index_network(self, network: str, to_block: Optional[int] = None) -> int:
+        """Index logs from the checkpoint to to_block (default: head), committing after every range
+
+        Contracts whose deployment block is at or below the checkpoint when first seen are
+        backfilled from that block before the shared checkpoint advances.
+        """
+        blockchain_network = BlockchainNetwork(network)
+        plans = self._contracts(blockchain_network)
+
+        w3 = self.connections.get_connection(network)
+        if not w3:
+            raise ConnectionError(f'No connection to {network}')
+        head = w3.eth.block_number if to_block is None else to_block
+
+        # address -> first block to scan, for contracts the index does not cover yet
+        starts: Dict[str, int] = {}
+        for plan in plans:
+            if plan.contract_events_indexed or not Web3.is_address(plan.smart_contract_address):
+                continue
+            address = Web3.to_checksum_address(plan.smart_contract_address)
+            start = self._deployment_block(w3, plan, head)
+            starts[address] = min(start, starts.get(address, start))
+        addresses = sorted({
+            Web3.to_checksum_address(plan.smart_contract_address)
+            for plan in plans if Web3.is_address(plan.smart_contract_address)
+        })
+
+        checkpoint = EventIndexCheckpoint.query.filter_by(blockchain_network=blockchain_network).first()
+        if checkpoint is None:
+            checkpoint = EventIndexCheckpoint(
+                blockchain_network=blockchain_network,
+                last_indexed_block=min(starts.values(), default=head + 1) - 1
+            )
+            db.session.add(checkpoint)
+
+        total = 0
+        backfill = {address: start for address, start in starts.items() if start <= checkpoint.last_indexed_block}
+        if backfill:
+            total += self._index_range(
+                network, blockchain_network, sorted(backfill), min(backfill.values()), checkpoint.last_indexed_block
+            )
+
+        if not addresses:
+            # Nothing to watch yet; later contracts are backfilled from their deployment block
+            checkpoint.last_indexed_block = head
+            db.session.commit()
+            return 0
+
+        total += self._index_range(
+            network, blockchain_network, addresses, checkpoint.last_indexed_block + 1, head, checkpoint
+        )
+
+        covered = [plan for plan in plans if not plan.contract_events_indexed]
+        for plan in covered:
+            plan.contract_events_indexed = True
+        if covered:
+            db.session.commit()
+
+        if total:
+            logger.info(f"Indexed {total} contract events on {network} through block {head}")
+        return total
+
+    def _index_range(
+        self,
+        network: str,
+        blockchain_network: BlockchainNetwork,
+        addresses: List[str],
+        from_block: int,
+        to_block: int,
+        checkpoint: Optional[EventIndexCheckpoint] = None
+    ) -> int:
+        """Index one block range with adaptive spans, committing (and advancing the checkpoint) per span"""
+        total = 0
+        while from_block <= to_block:
+            span = self._ranges.get(network, self.initial_range)
+            to = min(from_block + span - 1, to_block)
+
+            logs, error = self._get_logs(network, addresses, from_block, to)
+            if error is not None:
+                if span <= self.min_range or not self._is_range_error(error):
+                    raise RuntimeError(f'eth_getLogs {from_block}-{to} failed: {error}')
+                self._ranges[network] = max(self.min_range, span // 2)
+                continue
+
+            total += self._store_events(blockchain_network, logs)
+            if checkpoint is not None:
+                checkpoint.last_indexed_block = to
+            db.session.commit()
+
+            # Grow again after a clean range so catch-up uses as few calls as the provider allows
+            self._ranges[network] = min(self.max_range, span * 2)
+            from_block = to + 1
+        return total
+
+    def _get_logs(self, network: str, addresses: List[str], from_block: int, to_block: int) -> Tuple[List[Dict], Optional[str]]:
+        """Fetch logs for every address chunk over one range in a single batch request"""
+        calls = [
+            ('eth_getLogs', [{
+                'fromBlock': hex(from_block),
+                'toBlock': hex(to_block),
+                'address': addresses[start:start + MAX_ADDRESSES_PER_FILTER],
+                'topics': [list(INDEXED_EVENTS.keys())]
+            }])
+            for start in range(0, len(addresses), MAX_ADDRESSES_PER_FILTER)
+        ]
+
+        logs = []
+        for response in self.connections.batch_request(network, calls):
+            if response['error']:
+                return [], str(response['error'])
+            logs.extend(response['result'] or [])
+        return logs, None
+
+    @staticmethod
+    def _is_range_error(error: str) -> bool:
+        error = error.lower()
+        return any(marker in error for marker in RANGE_ERROR_MARKERS)
+
+    def _store_events(self, blockchain_network: BlockchainNetwork, logs: List[Dict]) -> int:
+        """Decode logs and insert the ones not already indexed"""
+        rows = {}
+        for log in logs:
+            if log.get('removed'):
+                continue
+            event_name = INDEXED_EVENTS.get(log['topics'][0].lower()) if log.get('topics') else None
+            if event_name is None:
+                continue
+
+            key = (log['transactionHash'], int(log['logIndex'], 16))
+            rows[key] = {
+                'blockchain_network': blockchain_network,
+                'contract_address': Web3.to_checksum_address(log['address']),
+                'event_name': event_name,
+                'block_number': int(log['blockNumber'], 16),
+                'block_hash': log['blockHash'],
+                'transaction_hash': log['transactionHash'],
+                'log_index': key[1],
+                'confirmation_status': 'unconfirmed',
+                'event_timestamp': int(log['data'], 16) if log.get('data') not in (None, '0x') else None
+            }
+
+        if not rows:
+            return 0
+
+        # Re-indexing a range (e.g. after a crash before commit) must not duplicate events
+        existing = set(
+            db.session.query(ContractEvent.transaction_hash, ContractEvent.log_index).filter(
+                ContractEvent.blockchain_network == blockchain_network,
+                ContractEvent.transaction_hash.in_([tx_hash for tx_hash, _ in rows])
+            ).all()
+        )
+        new_rows = [row for key, row in rows.items() if key not in existing]
+        if new_rows:
+            db.session.bulk_insert_mappings(ContractEvent, new_rows)
+        return len(new_rows)
+
+def get_indexed_event_summaries(network: str, contract_addresses: List[str]) -> Dict[str, Dict]:
+    """Return {address: {event_name: {'count', 'last_timestamp', 'last_block'}}} with one grouped query"""
+    blockchain_network = BlockchainNetwork(network)
+    addresses = [Web3.to_checksum_address(address) for address in contract_addresses]
+
+    rows = db.session.query(
+        ContractEvent.contract_address,
+        ContractEvent.event_name,
+        func.count(ContractEvent.id),
+        func.max(ContractEvent.event_timestamp),
+        func.max(ContractEvent.block_number)
+    ).filter(
+        ContractEvent.blockchain_network == blockchain_network,
+        ContractEvent.contract_address.in_(addresses)
+    ).group_by(ContractEvent.contract_address, ContractEvent.event_name).all()
+
+    summaries = {address: {} for address in addresses}
+    for address, event_name, count, last_timestamp, last_block in rows:
+        summaries.setdefault(address, {})[event_name] = {
+            'count': count,
+            'last_timestamp': last_timestamp,
+            'last_block': last_block
+        }
+    return summaries
+
+def get_indexed_block(network: str, contract_address: Optional[str] = None) -> Optional[int]:
+    """Return the last block indexed on a network, or None if the indexer has not run there
+
+    With a contract address, also None until that contract's history has been backfilled.
+    """
+    blockchain_network = BlockchainNetwork(network)
+    checkpoint = EventIndexCheckpoint.query.filter_by(blockchain_network=blockchain_network).first()
+    if checkpoint is None:
+        return None
+    if contract_address is not None:
+        indexed = db.session.query(CryptoInheritancePlan.id).filter(
+            CryptoInheritancePlan.smart_contract_network == blockchain_network,
+            func.lower(CryptoInheritancePlan.smart_contract_address) == contract_address.lower(),
+            CryptoInheritancePlan.contract_events_indexed.is_(True)
+        ).first()
+        if indexed is None:
+            return None
+    return checkpoint.last_indexed_block
+
+_indexer = None
+_indexer_lock = threading.Lock()
+
+def get_event_indexer(networks: Dict[str, Dict]) -> ContractEventIndexer:
+    """Return the process-wide contract event indexer"""
+    global _indexer
+    if _indexer is None:
+        with _indexer_lock:
+            if _indexer is None:
+                _indexer = ContractEventIndexer(networks)
+    return _indexer
@@ -0,0 +1,197 @@
+"""
+Gas Price Oracle for LastWish Crypto Inheritance
+Polls eth_feeHistory in the background and serves EIP-1559 fee estimates from memory
+"""
+
+import threading
+import logging
+from collections import deque
+from datetime import datetime
+from statistics import median
+from typing import Dict, Optional
+
+import numpy as np
+
+from utils.rpc_connections import get_connection_registry
+
+logger = logging.getLogger(__name__)
+
+# Reward percentiles requested from eth_feeHistory, mapped to estimate speeds
+FEE_PERCENTILES = {'slow': 10, 'standard': 50, 'fast': 90}
+
+class FeeHistory:
+    """Fixed-size ring buffer of standard gas prices (wei), one per block or legacy poll, 8 bytes each"""
+
+    def __init__(self, capacity: int = 50000):
+        self.capacity = capacity
+        self._fees = np.zeros(capacity, dtype=np.int64)
+        self._next = 0
+        self._count = 0
+
+    def append(self, gas_price: int):
+        self._fees[self._next] = gas_price
+        self._next = (self._next + 1) % self.capacity
+        self._count = min(self._count + 1, self.capacity)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def series(self) -> np.ndarray:
+        """Copy of the recorded gas prices, oldest first"""
+        if self._count < self.capacity:
+            return self._fees[:self._count].copy()
+        return np.concatenate((self._fees[self._next:], self._fees[:self._next]))
+
+class GasPriceOracle:
+    """Keeps a rolling window of base fees and priority fees for one network"""
+
+    def __init__(
+        self,
+        network: str,
+        poll_interval: int = 12,
+        window_blocks: int = 20,
+        max_staleness: int = 120,
+        history_blocks: int = 50000
+    ):
+        self.network = network
+        self.poll_interval = poll_interval
+        self.window_blocks = window_blocks
+        self.max_staleness = max_staleness
+
+        self.connections = get_connection_registry()
+
+        # Each entry: (block_number, base_fee, {speed: priority_fee})
+        self._window = deque(maxlen=window_blocks)
+        # Longer record of the same samples, kept for cost simulation
+        self._history = FeeHistory(history_blocks)
+        self._next_base_fee = None
+        self._legacy_gas_price = None
+        self._last_block = None
+        self._updated_at = None
+
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start the background polling thread if it is not already running"""
+        if self._thread and self._thread.is_alive():
+            return
+
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop_event.clear()
+            self._thread = threading.Thread(
+                target=self._poll_loop,
+                name=f'gas-oracle-{self.network}',
+                daemon=True
+            )
+            self._thread.start()
+
+    def stop(self):
+        """Stop the background polling thread"""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def _poll_loop(self):
+        while not self._stop_event.is_set():
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"Error refreshing gas oracle for {self.network}: {str(e)}")
+            self._stop_event.wait(self.poll_interval)
+
+    def refresh(self):
+        """Fetch the latest fee history and fold new blocks into the window"""
+        w3 = self.connections.get_connection(self.network)
+        if not w3:
+            return
+
+        try:
+            history = w3.eth.fee_history(self.window_blocks, 'latest', list(FEE_PERCENTILES.values()))
+        except Exception as e:
+            # Networks without EIP-1559 support fall back to the legacy gas price
+            logger.debug(f"eth_feeHistory unavailable on {self.network}: {str(e)}")
+            gas_price = w3.eth.gas_price
+            with self._lock:
+                self._legacy_gas_price = gas_price
+                self._history.append(gas_price)
+                self._updated_at = datetime.utcnow()
+            return
+
+        oldest_block = int(history['oldestBlock'])
+        base_fees = history['baseFeePerGas']
+        rewards = history.get('reward') or []
+
+        with self._lock:
+            for offset, block_rewards in enumerate(rewards):
+                block_number = oldest_block + offset
+                if self._last_block is not None and block_number <= self._last_block:
+                    continue
+                priority_fees = dict(zip(FEE_PERCENTILES.keys(), block_rewards))
+                self._window.append((block_number, base_fees[offset], priority_fees))
+                self._history.append(base_fees[offset] + priority_fees['standard'])
+                self._last_block = block_number
+
+            # The last base fee returned is the one for the next, still unmined block
+            self._next_base_fee = base_fees[-1] if base_fees else None
+            self._updated_at = datetime.utcnow()
+
+    def get_estimates(self) -> Optional[Dict]:
+        """Return slow/standard/fast fee estimates from memory without any RPC"""
+        self.start()
+
+        with self._lock:
+            if self._updated_at is None:
+                return None
+
+            age = (datetime.utcnow() - self._updated_at).total_seconds()
+            estimates = {
+                'network': self.network,
+                'base_fee': self._next_base_fee,
+                'last_block': self._last_block,
+                'updated_at': self._updated_at.isoformat(),
+                'stale': age > self.max_staleness
+            }
+
+            if self._next_base_fee is None or not self._window:
+                for speed in FEE_PERCENTILES:
+                    estimates[speed] = {
+                        'gas_price': self._legacy_gas_price or 0,
+                        'max_fee_per_gas': None,
+                        'max_priority_fee_per_gas': None
+                    }
+                return estimates
+
+            for speed in FEE_PERCENTILES:
+                priority_fee = int(median(fees[speed] for _, _, fees in self._window))
+                estimates[speed] = {
+                    'gas_price': self._next_base_fee + priority_fee,
+                    # Leave headroom for the base fee to rise over the next few blocks
+                    'max_fee_per_gas': 2 * self._next_base_fee + priority_fee,
+                    'max_priority_fee_per_gas': priority_fee
+                }
+            return estimates
+
+    def get_fee_history(self) -> np.ndarray:
+        """Return the recorded standard gas prices (wei), oldest first"""
+        self.start()
+
+        with self._lock:
+            return self._history.series()
+
+_oracles: Dict[str, GasPriceOracle] = {}
+_oracles_lock = threading.Lock()
+
+def get_gas_oracle(network: str) -> GasPriceOracle:
+    """Return the process-wide gas oracle for a network"""
+    oracle = _oracles.get(network)
+    if oracle is None:
+        with _oracles_lock:
+            oracle = _oracles.get(network)
+            if oracle is None:
+                oracle = GasPriceOracle(network)
+                _oracles[network] = oracle
+    return oracle
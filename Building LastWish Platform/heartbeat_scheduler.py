@@ -0,0 +1,374 @@
+"""
+Heartbeat Scheduler for LastWish Crypto Inheritance
+Relays owner proof-of-life (check-ins) to contracts as recordActivity() ahead of their inactivity deadline, batched per network
+A contract whose owner has not checked in since its last heartbeat gets none, so its deadline lapses as the dead-man switch intends
+"""
+
+import calendar
+import heapq
+import itertools
+import threading
+import time
+import logging
+from collections import defaultdict
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from web3 import Web3
+
+from models.user import db
+from models.crypto_assets import CryptoInheritancePlan, InheritanceStatus
+from utils.transaction_pipeline import get_transaction_pipeline
+from utils.event_indexer import get_indexed_event_summaries
+
+logger = logging.getLogger(__name__)
+
+RECORD_ACTIVITY_SELECTOR = bytes(Web3.keccak(text='recordActivity()')[:4])
+
+# recordActivity() writes one storage slot and emits one event
+HEARTBEAT_GAS_LIMIT = 60000
+
+class HeartbeatEntry:
+    """One owner contract and when its inactivity period runs out"""
+
+    def __init__(self, plan_id: int, network: str, contract_address: str, inactivity_period: int, last_activity: float, proof_of_life: float = 0):
+        self.plan_id = plan_id
+        self.network = network
+        self.contract_address = Web3.to_checksum_address(contract_address)
+        self.inactivity_period = inactivity_period  # seconds
+        self.last_activity = last_activity  # unix timestamp
+        self.proof_of_life = proof_of_life  # unix timestamp of the owner's latest check-in
+        self.due_at = None
+        self.failures = 0
+        self.pending = None  # (broadcast result, PendingTransaction) while awaiting the receipt
+        self.sent_at = None
+
+    @property
+    def deadline(self) -> float:
+        return self.last_activity + self.inactivity_period
+
+    @property
+    def has_proof_of_life(self) -> bool:
+        """Whether the owner has checked in since the contract's last recorded activity"""
+        return self.proof_of_life > self.last_activity
+
+class HeartbeatScheduler:
+    """Priority queue of contracts keyed by deadline minus safety margin; sleeps until the next one is due"""
+
+    def __init__(
+        self,
+        networks: Dict[str, Dict],
+        key_provider: Optional[Callable[[int], Optional[str]]] = None,
+        safety_margin: int = 3 * 24 * 60 * 60,
+        batch_window: int = 600,
+        max_batch: int = 200,
+        confirm_interval: int = 15,
+        confirm_timeout: int = 1800,
+        base_backoff: int = 60,
+        max_backoff: int = 6 * 60 * 60
+    ):
+        self.networks = networks
+        self.key_provider = key_provider  # callable(plan_id) -> owner private key
+        self.safety_margin = safety_margin
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.confirm_interval = confirm_interval
+        self.confirm_timeout = confirm_timeout
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+
+        self.pipeline = get_transaction_pipeline(networks)
+
+        # Heap of (due_at, sequence, plan_id); entries rescheduled or removed are skipped lazily
+        self._heap: List[tuple] = []
+        self._entries: Dict[int, HeartbeatEntry] = {}
+        self._awaiting: Dict[int, HeartbeatEntry] = {}
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self, app):
+        """Load deployed plans once, then run the scheduler on a background thread"""
+        if self._thread and self._thread.is_alive():
+            return
+
+        with self._condition:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop_event.clear()
+            self._thread = threading.Thread(
+                target=self._run_loop,
+                args=(app,),
+                name='heartbeat-scheduler',
+                daemon=True
+            )
+            self._thread.start()
+
+    def stop(self):
+        """Stop the background scheduler thread"""
+        self._stop_event.set()
+        with self._condition:
+            self._condition.notify_all()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def load_plans(self) -> int:
+        """Schedule every plan with a live contract, taking last activity from the event index and proof-of-life from last_verification"""
+        plans = CryptoInheritancePlan.query.filter(
+            CryptoInheritancePlan.smart_contract_address.isnot(None),
+            CryptoInheritancePlan.plan_status != InheritanceStatus.EXECUTED
+        ).all()
+
+        by_network = defaultdict(list)
+        for plan in plans:
+            if plan.smart_contract_network and Web3.is_address(plan.smart_contract_address):
+                by_network[plan.smart_contract_network.value].append(plan)
+
+        scheduled = 0
+        for network, network_plans in by_network.items():
+            if network not in self.networks:
+                continue
+            summaries = get_indexed_event_summaries(network, [p.smart_contract_address for p in network_plans])
+            for plan in network_plans:
+                events = summaries.get(Web3.to_checksum_address(plan.smart_contract_address), {})
+                scheduled += self.schedule_plan(plan, events)
+        return scheduled
+
+    def schedule_plan(self, plan: CryptoInheritancePlan, events: Optional[Dict] = None) -> bool:
+        """Schedule one plan's contract from its indexed events; False if it has no live contract to keep alive"""
+        if not plan.smart_contract_network or not Web3.is_address(plan.smart_contract_address or ''):
+            return False
+        network = plan.smart_contract_network.value
+        if network not in self.networks:
+            return False
+        if events is None:
+            address = Web3.to_checksum_address(plan.smart_contract_address)
+            events = get_indexed_event_summaries(network, [address])[address]
+        if 'InheritanceTriggered' in events or 'InheritanceExecuted' in events:
+            return False
+
+        activity = events.get('ActivityRecorded')
+        self.schedule(
+            plan.id,
+            network,
+            plan.smart_contract_address,
+            (plan.trigger_conditions or {}).get('inactivity_period', 365),
+            activity['last_timestamp'] if activity else calendar.timegm((plan.created_at or datetime.utcnow()).utctimetuple()),
+            calendar.timegm(plan.last_verification.utctimetuple()) if plan.last_verification else 0
+        )
+        return True
+
+    def schedule(self, plan_id: int, network: str, contract_address: str, inactivity_period_days: int, last_activity: float, proof_of_life: float = 0):
+        """Add or replace a contract's heartbeat; last_activity and proof_of_life are unix timestamps"""
+        entry = HeartbeatEntry(plan_id, network, contract_address, inactivity_period_days * 24 * 60 * 60, last_activity, proof_of_life)
+        with self._condition:
+            self._awaiting.pop(plan_id, None)
+            self._entries[plan_id] = entry
+            self._push(entry, self._heartbeat_due(entry))
+
+    def record_proof_of_life(self, plan_id: int, at: float) -> bool:
+        """Owner check-in at a unix time; a contract parked for lack of one is queued again
+
+        Returns False when the plan is not scheduled, so the caller can schedule it instead.
+        """
+        with self._condition:
+            entry = self._entries.get(plan_id)
+            if entry is None:
+                return False
+            if at <= entry.proof_of_life:
+                return True
+            entry.proof_of_life = at
+            if entry.pending is None:
+                # Past its due time the heartbeat goes out with the next batch
+                self._push(entry, max(self._heartbeat_due(entry), time.time()))
+            return True
+
+    def unschedule(self, plan_id: int):
+        """Stop sending heartbeats for a plan (e.g. once inheritance is triggered)"""
+        with self._condition:
+            self._entries.pop(plan_id, None)
+            self._awaiting.pop(plan_id, None)
+
+    def get_stats(self) -> Dict:
+        with self._condition:
+            next_due = min((e.due_at for e in self._entries.values() if e.pending is None and e.due_at is not None), default=None)
+            return {
+                'scheduled': len(self._entries),
+                'awaiting_receipt': len(self._awaiting),
+                'backing_off': len([e for e in self._entries.values() if e.failures]),
+                'without_proof_of_life': len([e for e in self._entries.values() if not e.has_proof_of_life]),
+                'next_due_at': datetime.utcfromtimestamp(next_due).isoformat() if next_due else None
+            }
+
+    def _heartbeat_due(self, entry: HeartbeatEntry) -> float:
+        # Short test periods must not collapse into back-to-back heartbeats
+        return entry.deadline - min(self.safety_margin, entry.inactivity_period / 2)
+
+    def _push(self, entry: HeartbeatEntry, due_at: float):
+        """Queue an entry; caller holds the condition"""
+        entry.due_at = due_at
+        heapq.heappush(self._heap, (due_at, next(self._sequence), entry.plan_id))
+        self._condition.notify()
+
+    def _is_current(self, due_at: float, plan_id: int) -> bool:
+        entry = self._entries.get(plan_id)
+        return entry is not None and entry.due_at == due_at and entry.pending is None
+
+    def _run_loop(self, app):
+        with app.app_context():
+            try:
+                logger.info(f"Heartbeat scheduler loaded {self.load_plans()} contracts")
+            except Exception as e:
+                logger.error(f"Error loading heartbeat schedule: {str(e)}")
+            finally:
+                db.session.remove()
+
+        while not self._stop_event.is_set():
+            due = self._wait_for_due()
+            if self._stop_event.is_set():
+                break
+            try:
+                self._check_awaiting()
+                if due:
+                    self.send_heartbeats(due)
+            except Exception as e:
+                logger.error(f"Error sending heartbeats: {str(e)}")
+
+    def _wait_for_due(self) -> List[HeartbeatEntry]:
+        """Sleep until the earliest heartbeat is due (or a receipt check), then pop a batch"""
+        with self._condition:
+            while not self._stop_event.is_set():
+                while self._heap and not self._is_current(self._heap[0][0], self._heap[0][2]):
+                    heapq.heappop(self._heap)
+
+                now = time.time()
+                if self._heap and self._heap[0][0] <= now:
+                    break
+
+                timeout = self._heap[0][0] - now if self._heap else None
+                if self._awaiting:
+                    timeout = min(timeout, self.confirm_interval) if timeout is not None else self.confirm_interval
+                    self._condition.wait(timeout)
+                    return []
+                self._condition.wait(timeout)
+
+            # Heartbeats due shortly after the first are sent early so they share its batch
+            horizon = time.time() + self.batch_window
+            due = []
+            while self._heap and self._heap[0][0] <= horizon and len(due) < self.max_batch:
+                due_at, _, plan_id = heapq.heappop(self._heap)
+                if self._is_current(due_at, plan_id):
+                    # Popped entries are unscheduled until pushed again, so a duplicate heap item is skipped
+                    entry = self._entries[plan_id]
+                    entry.due_at = None
+                    due.append(entry)
+            return due
+
+    def send_heartbeats(self, entries: List[HeartbeatEntry]):
+        """Sign one recordActivity() per contract whose owner has checked in and broadcast each network's heartbeats as one batch"""
+        by_network = defaultdict(list)
+        for entry in entries:
+            if not entry.has_proof_of_life:
+                # Parked until record_proof_of_life; without a check-in the deadline is left to lapse
+                logger.info(f"No owner check-in for plan {entry.plan_id} since its last activity; not sending a heartbeat")
+                continue
+            by_network[entry.network].append(entry)
+
+        for network, network_entries in by_network.items():
+            signed = []
+            sent = []
+            try:
+                for entry in network_entries:
+                    private_key = self.key_provider(entry.plan_id) if self.key_provider else None
+                    if not private_key:
+                        self._retry(entry, 'No owner key available')
+                        continue
+                    tx, raw = self.pipeline.build_and_sign(
+                        network,
+                        private_key,
+                        [{'to': entry.contract_address, 'value': 0, 'data': RECORD_ACTIVITY_SELECTOR}],
+                        gas_limit=HEARTBEAT_GAS_LIMIT
+                    )[0]
+                    signed.append((tx, raw, private_key))
+                    sent.append(entry)
+
+                broadcasts = self.pipeline.broadcast(network, signed) if signed else []
+            except Exception as e:
+                logger.error(f"Error broadcasting heartbeats on {network}: {str(e)}")
+                for entry in sent:
+                    self._retry(entry, str(e))
+                continue
+
+            with self._condition:
+                for entry, (result, pending) in zip(sent, broadcasts):
+                    if pending is None:
+                        self._retry(entry, result['error'])
+                        continue
+                    entry.pending = (result, pending)
+                    entry.sent_at = time.time()
+                    self._awaiting[entry.plan_id] = entry
+
+            if sent:
+                logger.info(f"Broadcast {len(sent)} heartbeats on {network}")
+
+    def _check_awaiting(self):
+        """Reschedule confirmed heartbeats from their new activity time and retry failed ones"""
+        with self._condition:
+            awaiting = list(self._awaiting.values())
+
+        now = time.time()
+        for entry in awaiting:
+            result, pending = entry.pending
+            if not pending.done.is_set():
+                if now - entry.sent_at > self.confirm_timeout:
+                    self.pipeline.receipt_watcher.abandon(pending)
+                    self._finish(entry)
+                    self._retry(entry, 'Timed out waiting for heartbeat receipt')
+                continue
+
+            self.pipeline.apply_receipt(result, pending)
+            self._finish(entry)
+            if result['status'] != 'completed':
+                self._retry(entry, result['error'])
+                continue
+
+            with self._condition:
+                if self._entries.get(entry.plan_id) is entry:
+                    # Check-ins after the broadcast are still unrelayed and keep the next heartbeat eligible
+                    entry.last_activity = min(entry.sent_at, entry.proof_of_life)
+                    entry.failures = 0
+                    self._push(entry, self._heartbeat_due(entry))
+
+    def _finish(self, entry: HeartbeatEntry):
+        with self._condition:
+            entry.pending = None
+            self._awaiting.pop(entry.plan_id, None)
+
+    def _retry(self, entry: HeartbeatEntry, error: str):
+        """Back off exponentially, capped, before the next attempt for this contract"""
+        with self._condition:
+            if self._entries.get(entry.plan_id) is not entry:
+                return
+            entry.failures += 1
+            delay = min(self.base_backoff * 2 ** (entry.failures - 1), self.max_backoff)
+            self._push(entry, time.time() + delay)
+
+        hours_left = (entry.deadline - time.time()) / 3600
+        logger.warning(
+            f"Heartbeat for plan {entry.plan_id} on {entry.network} failed ({error}); "
+            f"retrying in {delay}s, {hours_left:.1f}h before the inactivity deadline"
+        )
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+def get_heartbeat_scheduler(networks: Dict[str, Dict], key_provider: Optional[Callable[[int], Optional[str]]] = None) -> HeartbeatScheduler:
+    """Return the process-wide heartbeat scheduler"""
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = HeartbeatScheduler(networks, key_provider)
+    return _scheduler
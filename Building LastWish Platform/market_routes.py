@@ -0,0 +1,95 @@
+"""
+Market Data API Routes for LastWish Estate Planning Platform
+Serves cached prices, price changes and OHLC/VWAP charts from the price rollups, so clients need not call price APIs directly
+"""
+
+from flask import Blueprint, request, jsonify
+from flask_cors import cross_origin
+import logging
+import time
+
+from utils.price_rollups import RESOLUTIONS, get_price_rollups
+
+logger = logging.getLogger(__name__)
+
+# Create blueprint for market data routes
+market_bp = Blueprint('market', __name__, url_prefix='/api/market')
+
+# Fed by the price refresh pipeline, see crypto_inheritance
+price_rollups = get_price_rollups()
+
+MAX_SYMBOLS = 100
+MAX_CHART_BARS = 2000
+
+# Bars returned when a chart request has no start
+DEFAULT_CHART_BARS = {
+    '1m': 60,
+    '1h': 24,
+    '1d': 30
+}
+
+@market_bp.route('/prices', methods=['GET'])
+@cross_origin()
+def get_market_prices():
+    """Latest cached price and 24h, 7d and 30d changes for a comma-separated list of symbols"""
+    try:
+        symbols = [symbol.strip().upper() for symbol in request.args.get('symbols', '').split(',') if symbol.strip()]
+        if not symbols:
+            return jsonify({'success': False, 'error': 'symbols is required'}), 400
+        if len(symbols) > MAX_SYMBOLS:
+            return jsonify({'success': False, 'error': f'At most {MAX_SYMBOLS} symbols per request'}), 400
+
+        now = int(time.time())
+        prices = {}
+        for symbol in dict.fromkeys(symbols):
+            latest = price_rollups.latest(symbol)
+            if latest is None:
+                prices[symbol] = None
+                continue
+            quoted_at, price = latest
+            prices[symbol] = {
+                'price_usd': price,
+                'quoted_at': quoted_at,
+                **price_rollups.price_changes(symbol, now)
+            }
+
+        return jsonify({
+            'success': True,
+            'prices': prices,
+            'timestamp': now
+        })
+
+    except Exception as e:
+        logger.error(f"Error getting market prices: {str(e)}")
+        return jsonify({'success': False, 'error': 'Failed to get market prices'}), 500
+
+@market_bp.route('/<symbol>/chart', methods=['GET'])
+@cross_origin()
+def get_market_chart(symbol):
+    """OHLC/VWAP bars for one symbol at a resolution (1m, 1h, 1d) between unix start and end times"""
+    try:
+        resolution = request.args.get('resolution', '1h')
+        if resolution not in RESOLUTIONS:
+            return jsonify({'success': False, 'error': f"resolution must be one of {', '.join(RESOLUTIONS)}"}), 400
+        seconds = RESOLUTIONS[resolution]
+
+        try:
+            end = int(request.args.get('end', time.time()))
+            start = int(request.args.get('start', end - DEFAULT_CHART_BARS[resolution] * seconds))
+        except ValueError:
+            return jsonify({'success': False, 'error': 'start and end must be unix timestamps'}), 400
+        if start >= end:
+            return jsonify({'success': False, 'error': 'start must be before end'}), 400
+        if (end - start) // seconds > MAX_CHART_BARS:
+            return jsonify({'success': False, 'error': f'At most {MAX_CHART_BARS} bars per request'}), 400
+
+        return jsonify({
+            'success': True,
+            'symbol': symbol.upper(),
+            'resolution': resolution,
+            'bars': price_rollups.bars(symbol, resolution, start, end)
+        })
+
+    except Exception as e:
+        logger.error(f"Error getting market chart: {str(e)}")
+        return jsonify({'success': False, 'error': 'Failed to get market chart'}), 500
@@ -0,0 +1,136 @@
+"""
+Multicall3 Aggregation Utilities for LastWish Crypto Inheritance
+Packs many contract view calls into a single eth_call against the Multicall3 contract
+"""
+
+import logging
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from eth_abi import decode, encode
+from web3 import Web3
+
+logger = logging.getLogger(__name__)
+
+# Multicall3 is deployed at the same address on every supported EVM network
+MULTICALL3_ADDRESS = '0xcA11bde05977b3631167028862bE2a173976CA11'
+
+MULTICALL3_ABI = [
+    {
+        "inputs": [
+            {
+                "components": [
+                    {"name": "target", "type": "address"},
+                    {"name": "allowFailure", "type": "bool"},
+                    {"name": "callData", "type": "bytes"}
+                ],
+                "name": "calls",
+                "type": "tuple[]"
+            }
+        ],
+        "name": "aggregate3",
+        "outputs": [
+            {
+                "components": [
+                    {"name": "success", "type": "bool"},
+                    {"name": "returnData", "type": "bytes"}
+                ],
+                "name": "returnData",
+                "type": "tuple[]"
+            }
+        ],
+        "stateMutability": "payable",
+        "type": "function"
+    }
+]
+
+AGGREGATE3_SELECTOR = Web3.keccak(text='aggregate3((address,bool,bytes)[])')[:4]
+
+class ContractCall:
+    """A single contract view call described by its function signature"""
+
+    def __init__(self, target: str, signature: str, args: Sequence[Any] = (), returns: Sequence[str] = ('uint256',)):
+        self.target = Web3.to_checksum_address(target)
+        self.signature = signature
+        self.args = tuple(args)
+        self.returns = tuple(returns)
+
+        arg_list = signature[signature.index('(') + 1:signature.rindex(')')]
+        self.arg_types = [t.strip() for t in arg_list.split(',')] if arg_list.strip() else []
+
+    def encode_call_data(self) -> bytes:
+        """ABI-encode the selector and arguments for this call"""
+        selector = Web3.keccak(text=self.signature)[:4]
+        return selector + encode(self.arg_types, list(self.args))
+
+    def decode_result(self, data: bytes) -> Any:
+        """Decode the return data, unwrapping single-value results"""
+        values = decode(list(self.returns), data)
+        return values[0] if len(values) == 1 else values
+
+def encode_aggregate3(calls: List['ContractCall']) -> bytes:
+    """Encode raw aggregate3 call data for transports that bypass the contract wrapper"""
+    payload = [(call.target, True, call.encode_call_data()) for call in calls]
+    return AGGREGATE3_SELECTOR + encode(['(address,bool,bytes)[]'], [payload])
+
+def decode_aggregate3(data: bytes) -> List[Tuple[bool, bytes]]:
+    """Decode raw aggregate3 return data into (success, returnData) pairs"""
+    return list(decode(['(bool,bytes)[]'], data)[0])
+
+def decode_call_results(calls: List['ContractCall'], responses: List[Tuple[bool, bytes]]) -> List[Dict]:
+    """Turn aggregate3 (success, returnData) pairs into {'success', 'result', 'error'} dicts"""
+    results = []
+    for call, (success, return_data) in zip(calls, responses):
+        if not success or not return_data:
+            results.append({'success': False, 'result': None, 'error': f'Call reverted: {call.signature}'})
+            continue
+        try:
+            results.append({'success': True, 'result': call.decode_result(return_data), 'error': None})
+        except Exception as e:
+            results.append({'success': False, 'result': None, 'error': f'Decode failed: {str(e)}'})
+    return results
+
+class Multicall3Aggregator:
+    """Executes batches of view calls through Multicall3.aggregate3"""
+
+    def __init__(self, w3: Web3, address: str = MULTICALL3_ADDRESS, max_calls_per_request: int = 500):
+        self.w3 = w3
+        self.max_calls_per_request = max_calls_per_request
+        self.contract = w3.eth.contract(address=Web3.to_checksum_address(address), abi=MULTICALL3_ABI)
+
+    def aggregate(self, calls: List[ContractCall], block_identifier: Any = 'latest') -> List[Dict]:
+        """Run every call and return {'success', 'result', 'error'} per call in input order"""
+        results = []
+        for start in range(0, len(calls), self.max_calls_per_request):
+            chunk = calls[start:start + self.max_calls_per_request]
+            results.extend(self._aggregate_chunk(chunk, block_identifier))
+        return results
+
+    def _aggregate_chunk(self, calls: List[ContractCall], block_identifier: Any) -> List[Dict]:
+        payload = [(call.target, True, call.encode_call_data()) for call in calls]
+
+        try:
+            responses = self.contract.functions.aggregate3(payload).call(block_identifier=block_identifier)
+        except Exception as e:
+            logger.error(f"Multicall aggregate3 failed: {str(e)}")
+            return [{'success': False, 'result': None, 'error': str(e)} for _ in calls]
+
+        return decode_call_results(calls, responses)
+
+    def get_token_balances(
+        self,
+        holders: List[str],
+        token_contracts: List[str],
+        block_identifier: Any = 'latest'
+    ) -> Dict[Tuple[str, str], Optional[int]]:
+        """Read raw balanceOf for every (token, holder) pair in one aggregated call"""
+        pairs = [(token, holder) for token in token_contracts for holder in holders]
+        calls = [ContractCall(token, 'balanceOf(address)', [Web3.to_checksum_address(holder)]) for token, holder in pairs]
+
+        results = self.aggregate(calls, block_identifier)
+        return {pair: result['result'] for pair, result in zip(pairs, results)}
+
+    def aggregate_named(self, calls: Dict[str, ContractCall], block_identifier: Any = 'latest') -> Dict[str, Dict]:
+        """Run a mapping of named calls in one aggregated call and key the results the same way"""
+        keys = list(calls.keys())
+        results = self.aggregate([calls[key] for key in keys], block_identifier)
+        return dict(zip(keys, results))
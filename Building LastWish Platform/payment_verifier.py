@@ -0,0 +1,400 @@
+"""
+Crypto Payment Verifier for LastWish Subscriptions
+Confirms pending crypto payments from batched receipts and activates the purchased subscription
+"""
+
+import os
+import threading
+import time
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta
+from decimal import ROUND_CEILING, Decimal
+from typing import Dict, List, Optional
+
+from web3 import Web3
+
+from models.user import db, User
+from models.subscription_models import Payment, SubscriptionTier, UserSubscription
+from models import estate_models
+from utils.rpc_connections import get_connection_registry
+from utils.token_metadata import get_token_metadata_cache
+from utils.confirmation_tracker import FINALITY_DEPTHS
+from utils.price_rollups import get_price_rollups
+
+logger = logging.getLogger(__name__)
+
+# Platform wallet that receives subscription payments
+PAYMENT_RECEIVER_ADDRESS = os.environ.get('PAY_TO_ADDRESS', '0x016ae25Ac494B123C40EDb2418d9b1FC2d62279b')
+
+# Stablecoins accepted for payment, per network
+PAYMENT_TOKENS = {
+    'ethereum': {
+        'USDC': '0xA0b86991c6218b36c1d19D4a2e9Eb0cE3606eB48',
+        'USDT': '0xdAC17F958D2ee523a2206206994597C13D831ec7'
+    },
+    'polygon': {
+        'USDC': '0x3c499c542cEF5E3811e1192ce70d8cC03d5c3359',
+        'USDT': '0xc2132D05D31c914a87C6611C10748AEb04B58e8F'
+    },
+    'binance_smart_chain': {
+        'USDC': '0x8AC76a51cc950d9822D68b83fE1Ad97B32Cd580d',
+        'USDT': '0x55d398326f99059fF775485246999027B3197955'
+    },
+    'avalanche': {
+        'USDC': '0xB97EF9Ef8734C71904D8002F8b6Bc66Dd9c48a6E',
+        'USDT': '0x9702230A8Ea53601f5cD2dc00fDBc13d4dF4A8c7'
+    }
+}
+
+# Native coin payments are converted from the tier's USD price at the latest quote, which must be this recent
+NATIVE_PRICE_MAX_AGE = 60 * 60
+
+# Shortfall accepted on native coin payments for price movement between sending and verification
+NATIVE_PRICE_TOLERANCE = Decimal('0.02')
+
+# Short network names clients send, mapped to the network keys payments are verified against
+NETWORK_ALIASES = {
+    'eth': 'ethereum',
+    'matic': 'polygon',
+    'bsc': 'binance_smart_chain',
+    'bnb': 'binance_smart_chain',
+    'avax': 'avalanche'
+}
+
+TRANSFER_TOPIC = Web3.to_hex(Web3.keccak(text='Transfer(address,address,uint256)'))
+
+def _topic_address(topic: str) -> str:
+    return Web3.to_checksum_address('0x' + topic[-40:])
+
+def normalize_network(network: Optional[str]) -> Optional[str]:
+    """Canonical network key for a client-supplied network name, e.g. 'bsc' -> 'binance_smart_chain'"""
+    if not network:
+        return network
+    network = network.strip().lower()
+    return NETWORK_ALIASES.get(network, network)
+
+class PaymentVerifier:
+    """Verifies pending crypto payments in fixed-size batches, one database transaction per batch"""
+
+    def __init__(
+        self,
+        networks: Dict[str, Dict],
+        receiver_address: str = PAYMENT_RECEIVER_ADDRESS,
+        batch_size: int = 200,
+        poll_interval: int = 30,
+        expire_after: timedelta = timedelta(hours=24)
+    ):
+        self.networks = networks
+        self.receiver_address = Web3.to_checksum_address(receiver_address)
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.expire_after = expire_after
+
+        self.connections = get_connection_registry()
+        self.token_metadata = get_token_metadata_cache()
+
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self, app):
+        """Run verify_pending on a background thread inside the given application's context"""
+        if self._thread and self._thread.is_alive():
+            return
+
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop_event.clear()
+            self._thread = threading.Thread(
+                target=self._run_loop,
+                args=(app,),
+                name='crypto-payment-verifier',
+                daemon=True
+            )
+            self._thread.start()
+
+    def stop(self):
+        """Stop the background verification thread"""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def _run_loop(self, app):
+        while not self._stop_event.is_set():
+            with app.app_context():
+                try:
+                    self.verify_pending()
+                except Exception as e:
+                    logger.error(f"Error verifying crypto payments: {str(e)}")
+                finally:
+                    estate_models.db.session.remove()
+                    db.session.remove()
+            self._stop_event.wait(self.poll_interval)
+
+    def verify_pending(self) -> Dict[str, int]:
+        """Walk the pending queue by primary key, one batch at a time"""
+        totals = defaultdict(int)
+        last_id = 0
+        while True:
+            payments = Payment.query.filter(
+                Payment.status == 'pending',
+                Payment.payment_method == 'crypto',
+                Payment.id > last_id
+            ).order_by(Payment.id).limit(self.batch_size).all()
+            if not payments:
+                break
+
+            last_id = payments[-1].id
+            try:
+                for outcome, count in self.verify_batch(payments).items():
+                    totals[outcome] += count
+            except Exception as e:
+                estate_models.db.session.rollback()
+                db.session.rollback()
+                logger.error(f"Error verifying payment batch ending at {last_id}: {str(e)}")
+
+        if totals.get('completed') or totals.get('failed'):
+            logger.info(f"Crypto payment verification: {dict(totals)}")
+        return dict(totals)
+
+    def verify_batch(self, payments: List[Payment]) -> Dict[str, int]:
+        """Check one batch of payments against chain and commit every outcome together"""
+        outcomes = defaultdict(int)
+        by_network = defaultdict(list)
+        for payment in payments:
+            # Payments stored before names were normalized may still carry an alias
+            by_network[normalize_network(payment.crypto_network)].append(payment)
+
+        # A transaction hash can only pay for one subscription
+        hashes = [p.crypto_transaction_hash for p in payments if p.crypto_transaction_hash]
+        used_hashes = {
+            row[0] for row in estate_models.db.session.query(Payment.crypto_transaction_hash).filter(
+                Payment.crypto_transaction_hash.in_(hashes),
+                Payment.status == 'completed'
+            ).all()
+        } if hashes else set()
+
+        verified = []
+        for network, network_payments in by_network.items():
+            if network not in self.networks:
+                for payment in network_payments:
+                    self._fail(payment, f'Unsupported network: {network}')
+                    outcomes['failed'] += 1
+                continue
+
+            try:
+                network_results = self._verify_network(network, network_payments, used_hashes)
+            except Exception as e:
+                # Leave this network's payments pending; the rest of the batch still commits
+                logger.error(f"Error fetching payment receipts on {network}: {str(e)}")
+                continue
+
+            for payment, outcome in network_results:
+                outcomes[outcome] += 1
+                if outcome == 'completed':
+                    verified.append(payment)
+
+        self._activate_subscriptions(verified)
+        # Payments and subscriptions live in the estate database, users in the main one
+        estate_models.db.session.commit()
+        db.session.commit()
+        return dict(outcomes)
+
+    def _verify_network(self, network: str, payments: List[Payment], used_hashes: set):
+        """Fetch every transaction and receipt for one network in a single batch"""
+        w3 = self.connections.get_connection(network)
+        if not w3:
+            logger.warning(f"Skipping payment verification on {network}: no healthy connection")
+            return []
+
+        head = w3.eth.block_number
+        depth = FINALITY_DEPTHS.get(network, 12)
+
+        calls = []
+        for payment in payments:
+            calls.append(('eth_getTransactionByHash', [payment.crypto_transaction_hash]))
+            calls.append(('eth_getTransactionReceipt', [payment.crypto_transaction_hash]))
+        responses = self.connections.batch_request(network, calls)
+
+        token_decimals = self._token_decimals(network, payments, w3)
+
+        results = []
+        for index, payment in enumerate(payments):
+            tx = responses[2 * index]['result']
+            receipt = responses[2 * index + 1]['result']
+            results.append((payment, self._check_payment(
+                payment, network, tx, receipt, head, depth, token_decimals, used_hashes
+            )))
+        return results
+
+    def _token_decimals(self, network: str, payments: List[Payment], w3: Web3) -> Dict[str, int]:
+        tokens = PAYMENT_TOKENS.get(network, {})
+        contracts = sorted({tokens[p.crypto_currency] for p in payments if p.crypto_currency in tokens})
+        if not contracts:
+            return {}
+        metadata = self.token_metadata.get_many(network, contracts, w3)
+        return {address: m['decimals'] for address, m in metadata.items() if m}
+
+    def _check_payment(
+        self,
+        payment: Payment,
+        network: str,
+        tx: Optional[Dict],
+        receipt: Optional[Dict],
+        head: int,
+        depth: int,
+        token_decimals: Dict[str, int],
+        used_hashes: set
+    ) -> str:
+        if payment.crypto_transaction_hash in used_hashes:
+            return self._fail(payment, 'Transaction already used for another payment')
+
+        expired = payment.created_at and datetime.now() - payment.created_at > self.expire_after
+        if tx is None or receipt is None:
+            if expired:
+                return self._fail(payment, 'Transaction not found on chain')
+            return 'pending'
+
+        if int(receipt['status'], 16) != 1:
+            return self._fail(payment, 'Transaction reverted')
+
+        payer = Web3.to_checksum_address(tx['from'])
+        if payment.crypto_wallet_address and Web3.is_address(payment.crypto_wallet_address) \
+                and payer != Web3.to_checksum_address(payment.crypto_wallet_address):
+            return self._fail(payment, 'Transaction was not sent from the submitted wallet')
+
+        # A missing quote is usually transient; wait for the price feed until the payment expires
+        currency = (payment.crypto_currency or '').upper()
+        if currency == self.networks[network].get('native_currency') and self._native_price(currency) is None and not expired:
+            return 'pending'
+
+        error = self._check_transfer(payment, network, tx, receipt, token_decimals)
+        if error:
+            return self._fail(payment, error)
+
+        block_number = int(receipt['blockNumber'], 16)
+        payment.crypto_block_number = block_number
+        payment.crypto_block_hash = receipt['blockHash']
+
+        if head - block_number + 1 < depth:
+            payment.crypto_confirmation_status = 'unconfirmed'
+            return 'pending'
+
+        payment.crypto_confirmation_status = 'final'
+        payment.status = 'completed'
+        payment.processed_at = datetime.now()
+        used_hashes.add(payment.crypto_transaction_hash)
+        return 'completed'
+
+    @staticmethod
+    def _native_price(currency: str) -> Optional[Decimal]:
+        """Latest USD price of a native coin from the price feed, None if there is no recent quote"""
+        latest = get_price_rollups().latest(currency)
+        if latest is None or time.time() - latest[0] > NATIVE_PRICE_MAX_AGE or latest[1] <= 0:
+            return None
+        return Decimal(str(latest[1]))
+
+    def _check_transfer(self, payment: Payment, network: str, tx: Dict, receipt: Dict, token_decimals: Dict[str, int]) -> Optional[str]:
+        """Return an error if the transaction does not pay the receiver the tier's USD price; the client's crypto_amount is not trusted"""
+        currency = (payment.crypto_currency or '').upper()
+        usd_amount = Decimal(str(payment.amount or 0))
+        if usd_amount <= 0:
+            return 'Payment has no USD amount to verify against'
+
+        if currency == self.networks[network].get('native_currency'):
+            if not tx.get('to') or Web3.to_checksum_address(tx['to']) != self.receiver_address:
+                return 'Transaction recipient is not the payment address'
+            price = self._native_price(currency)
+            if price is None:
+                return f'No recent USD price for {currency}'
+            expected = (usd_amount / price * (1 - NATIVE_PRICE_TOLERANCE) * Decimal('10') ** 18).to_integral_value(ROUND_CEILING)
+            if int(tx['value'], 16) < expected:
+                return 'Transaction amount is below the tier price'
+            return None
+
+        token = PAYMENT_TOKENS.get(network, {}).get(currency)
+        if token is None:
+            return f'Unsupported payment currency on {network}: {currency}'
+        if token not in token_decimals:
+            return f'Could not read decimals for {currency}'
+
+        # Accepted stablecoins are taken at one USD
+        expected = (usd_amount * Decimal('10') ** token_decimals[token]).to_integral_value(ROUND_CEILING)
+        paid = sum(
+            int(log['data'], 16)
+            for log in receipt.get('logs', [])
+            if Web3.to_checksum_address(log['address']) == token
+            and len(log['topics']) == 3 and log['topics'][0].lower() == TRANSFER_TOPIC
+            and _topic_address(log['topics'][2]) == self.receiver_address
+        )
+        if paid < expected:
+            return 'Token transfer to the payment address is below the tier price'
+        return None
+
+    @staticmethod
+    def _fail(payment: Payment, reason: str) -> str:
+        payment.status = 'failed'
+        payment.failure_reason = reason
+        payment.processed_at = datetime.now()
+        return 'failed'
+
+    def _activate_subscriptions(self, payments: List[Payment]):
+        """Activate the purchased tier for every verified payment, loading related rows in bulk"""
+        if not payments:
+            return
+
+        user_ids = list({p.user_id for p in payments})
+        tiers = {t.id: t for t in SubscriptionTier.query.filter(
+            SubscriptionTier.id.in_([p.tier_id for p in payments if p.tier_id])
+        ).all()}
+        users = {u.id: u for u in User.query.filter(User.id.in_(user_ids)).all()}
+        subscriptions = {s.user_id: s for s in UserSubscription.query.filter(
+            UserSubscription.user_id.in_(user_ids),
+            UserSubscription.status == 'active'
+        ).all()}
+
+        for payment in payments:
+            tier = tiers.get(payment.tier_id)
+            if tier is None:
+                logger.warning(f"Verified crypto payment {payment.id} has no tier to activate")
+                continue
+
+            start_date = datetime.now()
+            end_date = start_date + timedelta(days=365 if payment.billing_cycle == 'yearly' else 30)
+
+            subscription = subscriptions.get(payment.user_id)
+            if subscription is None:
+                subscription = UserSubscription(user_id=payment.user_id)
+                estate_models.db.session.add(subscription)
+                subscriptions[payment.user_id] = subscription
+
+            subscription.tier_id = tier.id
+            subscription.billing_cycle = payment.billing_cycle or 'monthly'
+            subscription.status = 'active'
+            subscription.start_date = start_date
+            subscription.end_date = end_date
+            subscription.next_billing_date = end_date
+            subscription.amount_paid = payment.amount
+            subscription.payment_method = 'crypto'
+
+            payment.subscription = subscription
+            payment.billing_period_start = start_date
+            payment.billing_period_end = end_date
+
+            user = users.get(payment.user_id)
+            if user is not None:
+                user.subscription_tier = tier.name
+
+_verifier = None
+_verifier_lock = threading.Lock()
+
+def get_payment_verifier(networks: Dict[str, Dict]) -> PaymentVerifier:
+    """Return the process-wide crypto payment verifier"""
+    global _verifier
+    if _verifier is None:
+        with _verifier_lock:
+            if _verifier is None:
+                _verifier = PaymentVerifier(networks)
+    return _verifier
@@ -0,0 +1,121 @@
+"""
+Portfolio Analytics for LastWish Crypto Inheritance
+Aggregates users' wallets, assets and inheritance plans with grouped queries, so only totals leave the database
+"""
+
+import logging
+from decimal import Decimal
+from typing import Dict, List
+
+from sqlalchemy import Numeric, case, func, type_coerce
+
+from models.user import db
+from models.crypto_assets import CryptoWallet, CryptoAsset, CryptoInheritancePlan, InheritanceStatus
+
+logger = logging.getLogger(__name__)
+
+# Assets worth more than this are flagged in the risk assessment
+HIGH_VALUE_THRESHOLD_USD = 10000
+
+def to_decimal(value) -> Decimal:
+    # SUM over no rows is NULL, SQLite hands back floats for Numeric arithmetic and snapshots store strings
+    if value is None:
+        return Decimal('0')
+    return value if isinstance(value, Decimal) else Decimal(str(value))
+
+def empty_portfolio() -> Dict:
+    """Aggregates of a user with no wallets or assets; keys match the PortfolioSnapshot columns"""
+    return {
+        'total_value_usd': Decimal('0'),
+        'inheritance_coverage_usd': Decimal('0'),
+        'network_values': {},
+        'asset_type_values': {},
+        'asset_count': 0,
+        'high_value_assets': 0,
+        'unprotected_assets': 0,
+        'wallet_count': 0,
+        'wallet_networks': []
+    }
+
+def aggregate_portfolios(user_ids: List[int]) -> Dict[int, Dict]:
+    """Return {user_id: aggregates} from three grouped queries, with Decimal values keyed by enum value"""
+    value = CryptoAsset.current_value_usd
+    percentage = CryptoAsset.inheritance_percentage
+
+    # Unpriced and zero-value assets count towards the asset totals but not the value breakdowns
+    asset_rows = db.session.query(
+        CryptoAsset.user_id,
+        CryptoAsset.asset_type,
+        func.count(CryptoAsset.id),
+        func.count(case((value != 0, 1))),
+        func.sum(value),
+        # Typed wide enough that the driver does not round the covered amount to the percentage scale
+        func.sum(type_coerce(case((percentage > 0, value * percentage / 100)), Numeric(30, 10))),
+        func.count(case((value > HIGH_VALUE_THRESHOLD_USD, 1))),
+        func.count(case((percentage == 0, 1)))
+    ).filter(
+        CryptoAsset.user_id.in_(user_ids)
+    ).group_by(CryptoAsset.user_id, CryptoAsset.asset_type).all()
+
+    # Assets only count towards a network through one of the user's active wallets
+    network_rows = db.session.query(
+        CryptoAsset.user_id,
+        CryptoWallet.blockchain_network,
+        func.sum(value)
+    ).join(
+        CryptoWallet, CryptoAsset.wallet_id == CryptoWallet.id
+    ).filter(
+        CryptoAsset.user_id.in_(user_ids),
+        CryptoWallet.user_id == CryptoAsset.user_id,
+        CryptoWallet.is_active == True,
+        value != 0
+    ).group_by(CryptoAsset.user_id, CryptoWallet.blockchain_network).all()
+
+    wallet_rows = db.session.query(
+        CryptoWallet.user_id,
+        CryptoWallet.blockchain_network,
+        func.count(CryptoWallet.id)
+    ).filter(
+        CryptoWallet.user_id.in_(user_ids),
+        CryptoWallet.is_active == True
+    ).group_by(CryptoWallet.user_id, CryptoWallet.blockchain_network).all()
+
+    portfolios = {user_id: empty_portfolio() for user_id in user_ids}
+
+    for user_id, asset_type, count, valued, total, covered, high_value, unprotected in asset_rows:
+        portfolio = portfolios[user_id]
+        portfolio['asset_count'] += count
+        portfolio['high_value_assets'] += high_value
+        portfolio['unprotected_assets'] += unprotected
+        portfolio['total_value_usd'] += to_decimal(total)
+        portfolio['inheritance_coverage_usd'] += to_decimal(covered)
+        if valued:
+            portfolio['asset_type_values'][asset_type.value] = to_decimal(total)
+
+    for user_id, network, total in network_rows:
+        portfolios[user_id]['network_values'][network.value] = to_decimal(total)
+
+    for user_id, network, count in wallet_rows:
+        portfolios[user_id]['wallet_count'] += count
+        portfolios[user_id]['wallet_networks'].append(network.value)
+
+    for portfolio in portfolios.values():
+        portfolio['wallet_networks'].sort()
+    return portfolios
+
+def get_plan_stats(user_id: int) -> Dict:
+    """Inheritance plan counts for one user from a query grouped by plan status"""
+    rows = db.session.query(
+        CryptoInheritancePlan.plan_status,
+        func.count(CryptoInheritancePlan.id),
+        func.count(case((CryptoInheritancePlan.smart_contract_address != '', 1)))
+    ).filter(
+        CryptoInheritancePlan.user_id == user_id
+    ).group_by(CryptoInheritancePlan.plan_status).all()
+
+    return {
+        'total_plans': sum(count for _, count, _ in rows),
+        'active_plans': sum(count for status, count, _ in rows if status == InheritanceStatus.ACTIVE),
+        'configured_plans': sum(count for status, count, _ in rows if status == InheritanceStatus.CONFIGURED),
+        'smart_contract_plans': sum(contracts for _, _, contracts in rows)
+    }
@@ -0,0 +1,333 @@
+"""
+Portfolio Snapshots for LastWish Crypto Inheritance
+Keeps one row of portfolio totals per user, applying asset changes as deltas at flush time and reconciling periodically
+"""
+
+import threading
+import logging
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import event, inspect
+from sqlalchemy.exc import IntegrityError
+
+from models.user import db
+from models.crypto_assets import CryptoAsset, CryptoWallet, PortfolioSnapshot
+from utils.portfolio_analytics import HIGH_VALUE_THRESHOLD_USD, aggregate_portfolios, to_decimal
+
+logger = logging.getLogger(__name__)
+
+# Asset columns a snapshot depends on; a change to any other column leaves the totals alone
+ASSET_COLUMNS = ('user_id', 'wallet_id', 'asset_type', 'current_value_usd', 'inheritance_percentage')
+
+# Wallet columns that move assets between networks or in and out of the active set
+WALLET_COLUMNS = ('user_id', 'blockchain_network', 'is_active')
+
+USD_PLACES = Decimal('0.00000001')
+
+def _quantize(value) -> Decimal:
+    return to_decimal(value).quantize(USD_PLACES)
+
+def _normalize(values: Dict) -> Dict:
+    """Snapshot or aggregate values in one comparable form, rounded to the stored precision"""
+    return {
+        'total_value_usd': _quantize(values['total_value_usd']),
+        'inheritance_coverage_usd': _quantize(values['inheritance_coverage_usd']),
+        'network_values': {k: _quantize(v) for k, v in (values['network_values'] or {}).items()},
+        'asset_type_values': {k: _quantize(v) for k, v in (values['asset_type_values'] or {}).items()},
+        'asset_count': values['asset_count'] or 0,
+        'high_value_assets': values['high_value_assets'] or 0,
+        'unprotected_assets': values['unprotected_assets'] or 0,
+        'wallet_count': values['wallet_count'] or 0,
+        'wallet_networks': sorted(values['wallet_networks'] or [])
+    }
+
+def _store(snapshot: PortfolioSnapshot, values: Dict):
+    """Write normalized values onto a snapshot row; JSON breakdowns keep exact decimal strings"""
+    snapshot.total_value_usd = values['total_value_usd']
+    snapshot.inheritance_coverage_usd = values['inheritance_coverage_usd']
+    snapshot.network_values = {k: str(v) for k, v in values['network_values'].items()}
+    snapshot.asset_type_values = {k: str(v) for k, v in values['asset_type_values'].items()}
+    snapshot.asset_count = values['asset_count']
+    snapshot.high_value_assets = values['high_value_assets']
+    snapshot.unprotected_assets = values['unprotected_assets']
+    snapshot.wallet_count = values['wallet_count']
+    snapshot.wallet_networks = values['wallet_networks']
+
+def _snapshot_values(snapshot: PortfolioSnapshot) -> Dict:
+    return _normalize({column: getattr(snapshot, column) for column in (
+        'total_value_usd', 'inheritance_coverage_usd', 'network_values', 'asset_type_values', 'asset_count',
+        'high_value_assets', 'unprotected_assets', 'wallet_count', 'wallet_networks'
+    )})
+
+def _refresh_batch(user_ids: List[int]) -> Tuple[Dict[int, PortfolioSnapshot], int]:
+    """Recompute snapshots for a batch of users; returns the rows and how many had drifted. Caller commits"""
+    snapshots = {
+        snapshot.user_id: snapshot
+        for snapshot in PortfolioSnapshot.query.filter(PortfolioSnapshot.user_id.in_(user_ids)).with_for_update()
+    }
+    drifted = 0
+    now = datetime.utcnow()
+    for user_id, aggregates in aggregate_portfolios(user_ids).items():
+        values = _normalize(aggregates)
+        snapshot = snapshots.get(user_id)
+        if snapshot is None:
+            snapshot = snapshots[user_id] = PortfolioSnapshot(user_id=user_id)
+            db.session.add(snapshot)
+        elif not snapshot.needs_reconcile and _snapshot_values(snapshot) != values:
+            drifted += 1
+        _store(snapshot, values)
+        snapshot.needs_reconcile = False
+        snapshot.reconciled_at = now
+    return snapshots, drifted
+
+def refresh_portfolio_snapshots(user_ids: Iterable[int]) -> Dict[int, PortfolioSnapshot]:
+    """Recompute and commit the snapshots of the given users, creating missing rows
+
+    Changes made outside the ORM (bulk UPDATEs such as a price refresh) bypass the flush-time deltas,
+    so whatever issues them calls this for the users it touched.
+    """
+    user_ids = sorted(set(user_ids))
+    if not user_ids:
+        return {}
+    try:
+        snapshots, _ = _refresh_batch(user_ids)
+        db.session.commit()
+    except IntegrityError:
+        # Another worker created a missing row first; its totals are as fresh as ours
+        db.session.rollback()
+        snapshots = {s.user_id: s for s in PortfolioSnapshot.query.filter(PortfolioSnapshot.user_id.in_(user_ids))}
+    return snapshots
+
+def get_portfolio_snapshot(user_id: int) -> PortfolioSnapshot:
+    """Return a user's snapshot row, computing it first if it is missing or marked for reconciliation"""
+    snapshot = PortfolioSnapshot.query.filter_by(user_id=user_id).first()
+    if snapshot is None or snapshot.needs_reconcile:
+        snapshot = refresh_portfolio_snapshots([user_id])[user_id]
+    return snapshot
+
+def _contribution(values: Dict, wallet: Optional[CryptoWallet]) -> Dict:
+    """What one asset row adds to its owner's snapshot, by the same rules as aggregate_portfolios"""
+    value = to_decimal(values['current_value_usd'])
+    percentage = values['inheritance_percentage']
+    contribution = {
+        'total_value_usd': value,
+        'inheritance_coverage_usd': Decimal('0'),
+        'network_values': {},
+        'asset_type_values': {},
+        'asset_count': 1,
+        'high_value_assets': 1 if value > HIGH_VALUE_THRESHOLD_USD else 0,
+        'unprotected_assets': 1 if percentage is not None and percentage == 0 else 0
+    }
+    if value:
+        if percentage is not None and percentage > 0:
+            contribution['inheritance_coverage_usd'] = value * to_decimal(percentage) / 100
+        contribution['asset_type_values'][values['asset_type'].value] = value
+        if wallet is not None and wallet.is_active and wallet.user_id == values['user_id']:
+            contribution['network_values'][wallet.blockchain_network.value] = value
+    return contribution
+
+def _apply_contribution(snapshot: PortfolioSnapshot, contribution: Dict, sign: int):
+    snapshot.total_value_usd = _quantize(to_decimal(snapshot.total_value_usd) + sign * contribution['total_value_usd'])
+    snapshot.inheritance_coverage_usd = _quantize(
+        to_decimal(snapshot.inheritance_coverage_usd) + sign * contribution['inheritance_coverage_usd']
+    )
+    for column in ('asset_count', 'high_value_assets', 'unprotected_assets'):
+        setattr(snapshot, column, (getattr(snapshot, column) or 0) + sign * contribution[column])
+    for column in ('network_values', 'asset_type_values'):
+        # Reassign rather than mutate so the JSON column is seen as changed
+        breakdown = dict(getattr(snapshot, column) or {})
+        for key, value in contribution[column].items():
+            total = to_decimal(breakdown.get(key)) + sign * value
+            if total:
+                breakdown[key] = str(total)
+            else:
+                breakdown.pop(key, None)
+        setattr(snapshot, column, breakdown)
+
+def _asset_values(session, asset: CryptoAsset, persisted: Dict[int, Dict]) -> Tuple[Optional[Dict], Optional[Dict]]:
+    """(values as stored, values after this flush) for an asset; None where the row does not exist"""
+    state = inspect(asset)
+    if state.pending:
+        new = {}
+        for column in ASSET_COLUMNS:
+            value = getattr(asset, column)
+            default = CryptoAsset.__table__.c[column].default
+            new[column] = default.arg if value is None and default is not None and default.is_scalar else value
+        # Assets added through a relationship have no foreign keys until the flush assigns them
+        if new['user_id'] is None and asset.user is not None:
+            new['user_id'] = asset.user.id
+        if new['wallet_id'] is None and asset.wallet is not None:
+            new['wallet_id'] = asset.wallet.id
+        return None, new
+
+    old = persisted.get(asset.id)
+    if old is None:
+        old = {}
+        for column in ASSET_COLUMNS:
+            history = state.attrs[column].history
+            if history.deleted or history.unchanged:
+                old[column] = (history.deleted or history.unchanged)[0]
+            else:
+                old[column] = getattr(asset, column)  # Expired: loads the stored value
+    if asset in session.deleted:
+        return old, None
+    return old, {column: getattr(asset, column) for column in ASSET_COLUMNS}
+
+def _needs_stored_values(asset: CryptoAsset) -> bool:
+    """True when an attribute was set without its previous value ever being loaded"""
+    state = inspect(asset)
+    return any(
+        state.attrs[column].history.added and not state.attrs[column].history.deleted
+        for column in ASSET_COLUMNS
+    )
+
+def _tracked_change(obj, columns) -> bool:
+    state = inspect(obj)
+    return any(state.attrs[column].history.has_changes() for column in columns)
+
+@event.listens_for(db.session, 'before_flush')
+def apply_snapshot_deltas(session, flush_context, instances):
+    """Fold asset inserts, updates and deletes into their owners' snapshots within the same flush
+
+    Wallet changes move value between networks for every asset in the wallet, so they mark the
+    snapshot for recomputation instead. Users without a snapshot row are left for the first read.
+    """
+    assets = [obj for obj in session.new if isinstance(obj, CryptoAsset)]
+    assets += [obj for obj in session.deleted if isinstance(obj, CryptoAsset)]
+    assets += [obj for obj in session.dirty if isinstance(obj, CryptoAsset) and _tracked_change(obj, ASSET_COLUMNS)]
+
+    wallets = [obj for obj in session.new | session.deleted if isinstance(obj, CryptoWallet)]
+    wallets += [obj for obj in session.dirty if isinstance(obj, CryptoWallet) and _tracked_change(obj, WALLET_COLUMNS)]
+    if not assets and not wallets:
+        return
+
+    with session.no_autoflush:
+        stale_users = set()
+        for wallet in wallets:
+            # A wallet moved to another user leaves both portfolios stale
+            history = inspect(wallet).attrs.user_id.history
+            stale_users.update(history.deleted or ())
+            stale_users.add(wallet.user_id)
+
+        # One read for rows whose previous values were overwritten before they were ever loaded
+        unloaded = [asset.id for asset in assets if not inspect(asset).pending and _needs_stored_values(asset)]
+        persisted = {}
+        if unloaded:
+            for row in session.query(CryptoAsset.id, *[getattr(CryptoAsset, c) for c in ASSET_COLUMNS]).filter(CryptoAsset.id.in_(unloaded)):
+                persisted[row[0]] = dict(zip(ASSET_COLUMNS, row[1:]))
+
+        changes = []
+        for asset in assets:
+            old, new = _asset_values(session, asset, persisted)
+            if any(values and values['user_id'] is None for values in (old, new)):
+                continue  # Owner not resolvable yet (e.g. a new user); the first read or the reconciler computes it
+            changes.append((old, new))
+            for values in (old, new):
+                if values and values['wallet_id'] is None:
+                    stale_users.add(values['user_id'])  # Wallet is new in this flush
+
+        user_ids = {values['user_id'] for change in changes for values in change if values} | stale_users
+        user_ids.discard(None)
+        snapshots = {
+            snapshot.user_id: snapshot
+            for snapshot in session.query(PortfolioSnapshot).filter(PortfolioSnapshot.user_id.in_(user_ids)).with_for_update()
+        }
+        for user_id in stale_users:
+            if user_id in snapshots:
+                snapshots[user_id].needs_reconcile = True
+
+        for old, new in changes:
+            for values, sign in ((old, -1), (new, 1)):
+                if not values:
+                    continue
+                snapshot = snapshots.get(values['user_id'])
+                if snapshot is None or snapshot.needs_reconcile:
+                    continue
+                wallet = session.get(CryptoWallet, values['wallet_id'])
+                _apply_contribution(snapshot, _contribution(values, wallet), sign)
+
+def _portfolio_user_ids() -> List[int]:
+    """Every user with assets, wallets or an existing snapshot"""
+    rows = db.session.query(CryptoAsset.user_id).union(
+        db.session.query(CryptoWallet.user_id),
+        db.session.query(PortfolioSnapshot.user_id)
+    ).all()
+    return sorted(row[0] for row in rows)
+
+class PortfolioSnapshotReconciler:
+    """Periodically recomputes every snapshot from the source tables, repairing drift from missed deltas"""
+
+    def __init__(self, interval: int = 3600, batch_size: int = 500):
+        self.interval = interval
+        self.batch_size = batch_size
+
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self, app):
+        """Run reconcile_all on a background thread inside the given application's context"""
+        if self._thread and self._thread.is_alive():
+            return
+
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop_event.clear()
+            self._thread = threading.Thread(
+                target=self._run_loop,
+                args=(app,),
+                name='portfolio-snapshot-reconciler',
+                daemon=True
+            )
+            self._thread.start()
+
+    def stop(self):
+        """Stop the background reconciliation thread"""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def _run_loop(self, app):
+        while not self._stop_event.is_set():
+            with app.app_context():
+                try:
+                    stats = self.reconcile_all()
+                    if stats['drifted']:
+                        logger.warning(f"Repaired {stats['drifted']} of {stats['checked']} portfolio snapshots")
+                except Exception as e:
+                    logger.error(f"Error reconciling portfolio snapshots: {str(e)}")
+                finally:
+                    db.session.remove()
+            self._stop_event.wait(self.interval)
+
+    def reconcile_all(self) -> Dict[str, int]:
+        """Recompute every snapshot in batches, committing per batch; returns checked and drifted counts"""
+        user_ids = _portfolio_user_ids()
+        stats = {'checked': 0, 'drifted': 0}
+        for start in range(0, len(user_ids), self.batch_size):
+            batch = user_ids[start:start + self.batch_size]
+            try:
+                _, drifted = _refresh_batch(batch)
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Error reconciling portfolio snapshots for {len(batch)} users: {str(e)}")
+                continue
+            stats['checked'] += len(batch)
+            stats['drifted'] += drifted
+        return stats
+
+_reconciler = None
+_reconciler_lock = threading.Lock()
+
+def get_portfolio_reconciler() -> PortfolioSnapshotReconciler:
+    """Return the process-wide portfolio snapshot reconciler"""
+    global _reconciler
+    if _reconciler is None:
+        with _reconciler_lock:
+            if _reconciler is None:
+                _reconciler = PortfolioSnapshotReconciler()
+    return _reconciler
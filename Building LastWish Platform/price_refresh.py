@@ -0,0 +1,378 @@
+"""
+Price Refresh Pipeline for LastWish Crypto Inheritance
+Prices every distinct asset in batched provider calls, upserts market data in bulk and revalues assets with set-based UPDATEs
+"""
+
+import calendar
+import json
+import os
+import threading
+import logging
+from datetime import datetime
+from decimal import Decimal
+from typing import Callable, Dict, List, Optional, Tuple
+
+import requests
+from sqlalchemy import bindparam, delete, func, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+
+from models.user import db
+from models.crypto_assets import AssetType, BlockchainNetwork, CryptoAsset, CryptoMarketData, CryptoWallet
+from utils.portfolio_snapshot import refresh_portfolio_snapshots
+from utils.price_store import get_price_store
+
+logger = logging.getLogger(__name__)
+
+# 'coingecko' calls the CoinGecko API; 'static' prices from PRICE_FEED_PATH (or the built-in table) are for development only
+PRICE_PROVIDER = os.environ.get('PRICE_PROVIDER', 'coingecko')
+PRICE_FEED_PATH = os.environ.get('PRICE_FEED_PATH')
+COINGECKO_API_URL = os.environ.get('COINGECKO_API_URL', 'https://api.coingecko.com/api/v3')
+COINGECKO_API_KEY = os.environ.get('COINGECKO_API_KEY')
+
+# (asset_symbol, wallet network value, contract_address) exactly as stored, so UPDATEs can match on them
+PriceKey = Tuple[str, Optional[str], Optional[str]]
+
+# Dialects whose INSERT supports ON CONFLICT DO UPDATE against the market data unique index
+UPSERT_DIALECTS = {
+    'postgresql': postgresql.insert,
+    'sqlite': sqlite.insert
+}
+
+# NFTs are valued per token, not per symbol
+UNPRICED_ASSET_TYPE = AssetType.NFT
+
+# Stand-in USD prices for development, tests and benchmarks
+DEFAULT_STATIC_PRICES = {
+    'BTC': '67000', 'ETH': '3200', 'BNB': '580', 'MATIC': '0.55', 'POL': '0.55', 'AVAX': '28',
+    'SOL': '150', 'ADA': '0.45', 'DOT': '6.5', 'ARB': '0.8', 'OP': '1.7',
+    'USDC': '1', 'USDT': '1', 'DAI': '1', 'WBTC': '67000', 'WETH': '3200',
+    'LINK': '14', 'UNI': '8', 'AAVE': '150', 'LDO': '1.9'
+}
+
+COINGECKO_IDS = {
+    'BTC': 'bitcoin', 'ETH': 'ethereum', 'BNB': 'binancecoin', 'MATIC': 'matic-network', 'POL': 'matic-network',
+    'AVAX': 'avalanche-2', 'SOL': 'solana', 'ADA': 'cardano', 'DOT': 'polkadot', 'ARB': 'arbitrum',
+    'OP': 'optimism', 'USDC': 'usd-coin', 'USDT': 'tether', 'DAI': 'dai', 'WBTC': 'wrapped-bitcoin',
+    'WETH': 'weth', 'LINK': 'chainlink', 'UNI': 'uniswap', 'AAVE': 'aave', 'LDO': 'lido-dao'
+}
+
+COINGECKO_PLATFORMS = {
+    'ethereum': 'ethereum',
+    'binance_smart_chain': 'binance-smart-chain',
+    'polygon': 'polygon-pos',
+    'avalanche': 'avalanche',
+    'arbitrum': 'arbitrum-one',
+    'optimism': 'optimistic-ethereum',
+    'solana': 'solana'
+}
+
+class StaticPriceFeed:
+    """Local stand-in provider: fixed USD prices by symbol, optionally by 'network:contract', from a dict or JSON file"""
+
+    name = 'static'
+    batch_size = 1000
+
+    def __init__(self, prices: Optional[Dict[str, str]] = None, path: Optional[str] = None):
+        if prices is None and path:
+            with open(path, 'r') as f:
+                prices = json.load(f)
+        self.prices = {key.upper() if ':' not in key else key.lower(): Decimal(str(price))
+                       for key, price in (prices or DEFAULT_STATIC_PRICES).items()}
+
+    def fetch_prices(self, keys: List[PriceKey]) -> Dict[PriceKey, Dict]:
+        quotes = {}
+        for key in keys:
+            symbol, network, contract = key
+            price = self.prices.get(f'{network}:{contract}'.lower()) if contract else None
+            if price is None:
+                price = self.prices.get(symbol.upper())
+            if price is not None:
+                quotes[key] = {'price_usd': price}
+        return quotes
+
+class CoinGeckoPriceProvider:
+    """CoinGecko simple price API: tokens by contract per platform, everything else by coin id"""
+
+    name = 'coingecko'
+    batch_size = 100  # Ids or contract addresses per request
+
+    def __init__(self, api_url: str = COINGECKO_API_URL, api_key: Optional[str] = COINGECKO_API_KEY, timeout: float = 15):
+        self.api_url = api_url.rstrip('/')
+        self.timeout = timeout
+        self.session = requests.Session()
+        if api_key:
+            self.session.headers['x-cg-demo-api-key'] = api_key
+
+    def _get(self, path: str, params: Dict) -> Dict:
+        params = dict(params, vs_currencies='usd', include_market_cap='true', include_24hr_vol='true')
+        response = self.session.get(f'{self.api_url}{path}', params=params, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+    @staticmethod
+    def _quote(data: Dict) -> Dict:
+        return {
+            'price_usd': Decimal(str(data['usd'])),
+            'market_cap_usd': Decimal(str(data['usd_market_cap'])) if data.get('usd_market_cap') else None,
+            'volume_24h_usd': Decimal(str(data['usd_24h_vol'])) if data.get('usd_24h_vol') else None
+        }
+
+    def fetch_prices(self, keys: List[PriceKey]) -> Dict[PriceKey, Dict]:
+        quotes = {}
+
+        by_platform: Dict[str, List[PriceKey]] = {}
+        for key in keys:
+            platform = COINGECKO_PLATFORMS.get(key[1])
+            if key[2] and platform:
+                by_platform.setdefault(platform, []).append(key)
+        for platform, platform_keys in by_platform.items():
+            data = self._get(f'/simple/token_price/{platform}', {
+                'contract_addresses': ','.join(sorted({key[2].lower() for key in platform_keys}))
+            })
+            for key in platform_keys:
+                if data.get(key[2].lower(), {}).get('usd') is not None:
+                    quotes[key] = self._quote(data[key[2].lower()])
+
+        # Native coins, and tokens the platform lookup did not know, by symbol
+        by_id: Dict[str, List[PriceKey]] = {}
+        for key in keys:
+            coin_id = COINGECKO_IDS.get(key[0].upper())
+            if key not in quotes and coin_id:
+                by_id.setdefault(coin_id, []).append(key)
+        if by_id:
+            data = self._get('/simple/price', {'ids': ','.join(sorted(by_id))})
+            for coin_id, id_keys in by_id.items():
+                if data.get(coin_id, {}).get('usd') is not None:
+                    for key in id_keys:
+                        quotes[key] = self._quote(data[coin_id])
+        return quotes
+
+def default_price_provider():
+    if PRICE_PROVIDER == 'coingecko':
+        return CoinGeckoPriceProvider()
+    if PRICE_PROVIDER == 'static':
+        logger.warning("PRICE_PROVIDER is 'static'; assets are valued at stand-in prices")
+        return StaticPriceFeed(path=PRICE_FEED_PATH)
+    # An unknown provider must not fall back to fake prices that overwrite real valuations
+    raise ValueError(f"Unknown PRICE_PROVIDER: {PRICE_PROVIDER}")
+
+class PriceRefreshPipeline:
+    """Refreshes the price of every priced asset on a background timer, or on demand with refresh_all"""
+
+    def __init__(self, provider=None, price_store=None, networks: Optional[Dict[str, Dict]] = None, interval: int = 300,
+                 update_batch_size: int = 500, snapshot_batch_size: int = 500):
+        self.provider = provider or default_price_provider()
+        # Every network's native coin is quoted whether or not anyone holds it; payment verification prices native coin payments from it
+        self.native_keys: List[PriceKey] = [
+            (config['native_currency'], network, None)
+            for network, config in (networks or {}).items()
+            if config.get('native_currency')
+        ]
+        self.price_store = price_store or get_price_store()
+        self.interval = interval
+        self.update_batch_size = update_batch_size
+        self.snapshot_batch_size = snapshot_batch_size
+        self._handlers: List[Callable[[int, Dict[str, Dict]], None]] = []
+
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def add_handler(self, handler: Callable[[int, Dict[str, Dict]], None]):
+        """Call handler(unix time, {symbol: quote}) after every refresh, with one quote per symbol"""
+        self._handlers.append(handler)
+
+    def start(self, app):
+        """Run refresh_all on a background thread inside the given application's context"""
+        if self._thread and self._thread.is_alive():
+            return
+
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop_event.clear()
+            self._thread = threading.Thread(
+                target=self._run_loop,
+                args=(app,),
+                name='price-refresh',
+                daemon=True
+            )
+            self._thread.start()
+
+    def stop(self):
+        """Stop the background refresh thread"""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def _run_loop(self, app):
+        while not self._stop_event.is_set():
+            with app.app_context():
+                try:
+                    self.refresh_all()
+                except Exception as e:
+                    db.session.rollback()
+                    logger.error(f"Error refreshing prices: {str(e)}")
+                finally:
+                    db.session.remove()
+            self._stop_event.wait(self.interval)
+
+    def distinct_keys(self) -> List[PriceKey]:
+        """Every distinct (symbol, network, contract) held in a priced asset, from one DISTINCT query, plus the native coins"""
+        rows = db.session.query(
+            CryptoAsset.asset_symbol,
+            CryptoWallet.blockchain_network,
+            CryptoAsset.contract_address
+        ).join(
+            CryptoWallet, CryptoAsset.wallet_id == CryptoWallet.id
+        ).filter(
+            CryptoAsset.asset_type != UNPRICED_ASSET_TYPE
+        ).distinct().all()
+        keys = [(symbol, network.value, contract) for symbol, network, contract in rows]
+        held = set(keys)
+        return keys + [key for key in self.native_keys if key not in held]
+
+    def fetch(self, keys: List[PriceKey]) -> Dict[PriceKey, Dict]:
+        """Quote keys in provider-sized batches; a failed batch is logged and left unpriced"""
+        quotes = {}
+        for start in range(0, len(keys), self.provider.batch_size):
+            batch = keys[start:start + self.provider.batch_size]
+            try:
+                quotes.update(self.provider.fetch_prices(batch))
+            except Exception as e:
+                logger.error(f"Error fetching {len(batch)} prices from {self.provider.name}: {str(e)}")
+        return quotes
+
+    def refresh_all(self) -> Dict:
+        """Price every held asset, record market data, revalue the assets and their owners' snapshots"""
+        keys = self.distinct_keys()
+        quotes = self.fetch(keys)
+        now = datetime.utcnow()
+
+        revalued = {}
+        if quotes:
+            self._record_market_data(quotes, now)
+            self._revalue(quotes, now)
+            # Rows revalued per owner; executemany rowcounts are not reliable across drivers
+            revalued = dict(db.session.query(CryptoAsset.user_id, func.count(CryptoAsset.id)).filter(
+                CryptoAsset.last_price_update == now
+            ).group_by(CryptoAsset.user_id).all())
+            db.session.commit()
+            self._record_history(quotes, now)
+
+        # The UPDATEs bypass the ORM snapshot deltas, so recompute the owners of every revalued asset
+        user_ids = sorted(revalued)
+        for start in range(0, len(user_ids), self.snapshot_batch_size):
+            refresh_portfolio_snapshots(user_ids[start:start + self.snapshot_batch_size])
+
+        missing = len(keys) - len(quotes)
+        if missing:
+            logger.info(f"{missing} of {len(keys)} assets had no price from {self.provider.name}")
+        return {
+            'assets': len(keys),
+            'priced': len(quotes),
+            'missing': missing,
+            'revalued_rows': sum(revalued.values()),
+            'portfolios': len(user_ids),
+            'refreshed_at': now.isoformat()
+        }
+
+    def _record_market_data(self, quotes: Dict[PriceKey, Dict], now: datetime):
+        """Upsert the one market data row per quoted asset with a single multi-row statement
+
+        Price history lives in the price store, so the table keeps only the latest quote.
+        """
+        rows = [
+            {
+                'asset_symbol': symbol,
+                'contract_address': contract,
+                'blockchain_network': BlockchainNetwork(network),
+                'price_usd': quote['price_usd'],
+                'market_cap_usd': quote.get('market_cap_usd'),
+                'volume_24h_usd': quote.get('volume_24h_usd'),
+                'data_source': self.provider.name,
+                'last_updated': now,
+                'created_at': now
+            }
+            for (symbol, network, contract), quote in quotes.items()
+        ]
+
+        dialect = db.session.get_bind().dialect.name
+        if dialect not in UPSERT_DIALECTS:
+            # No ON CONFLICT support; replace the rows inside the refresh transaction instead
+            table = CryptoMarketData.__table__
+            db.session.execute(delete(table).where(
+                table.c.asset_symbol == bindparam('symbol'),
+                table.c.blockchain_network == bindparam('network'),
+                table.c.contract_address.is_not_distinct_from(bindparam('contract'))
+            ), [
+                {'symbol': row['asset_symbol'], 'network': row['blockchain_network'], 'contract': row['contract_address']}
+                for row in rows
+            ])
+            db.session.execute(insert(CryptoMarketData), rows)
+            return
+
+        statement = UPSERT_DIALECTS[dialect](CryptoMarketData)
+        statement = statement.on_conflict_do_update(
+            index_elements=CryptoMarketData.key_columns(),
+            set_={
+                column: statement.excluded[column]
+                for column in ('price_usd', 'market_cap_usd', 'volume_24h_usd', 'data_source', 'last_updated')
+            }
+        )
+        db.session.execute(statement, rows)
+
+    @staticmethod
+    def _symbol_quotes(quotes: Dict[PriceKey, Dict]) -> Dict[str, Dict]:
+        """One quote per symbol, preferring the native coin's quote over bridged tokens"""
+        symbol_quotes = {}
+        for (symbol, network, contract), quote in sorted(quotes.items(), key=lambda item: item[0][2] is not None):
+            symbol_quotes.setdefault(symbol.upper(), quote)
+        return symbol_quotes
+
+    def _record_history(self, quotes: Dict[PriceKey, Dict], now: datetime):
+        """Append one point per symbol to the price store and pass the same quotes to the handlers"""
+        at = calendar.timegm(now.utctimetuple())
+        symbol_quotes = self._symbol_quotes(quotes)
+        self.price_store.append(at, {symbol: quote['price_usd'] for symbol, quote in symbol_quotes.items()})
+        for handler in self._handlers:
+            try:
+                handler(at, symbol_quotes)
+            except Exception as e:
+                logger.error(f"Error in price refresh handler: {str(e)}")
+
+    def _revalue(self, quotes: Dict[PriceKey, Dict], now: datetime):
+        """One UPDATE statement executed per batch of quotes, setting price, value and timestamp for every matching row"""
+        assets = CryptoAsset.__table__
+        statement = update(assets).where(
+            assets.c.asset_symbol == bindparam('symbol'),
+            assets.c.contract_address.is_not_distinct_from(bindparam('contract')),
+            assets.c.asset_type != UNPRICED_ASSET_TYPE,
+            assets.c.wallet_id.in_(
+                select(CryptoWallet.id).where(CryptoWallet.blockchain_network == bindparam('network'))
+            )
+        ).values(
+            current_price_usd=bindparam('price'),
+            current_value_usd=assets.c.quantity * bindparam('price'),
+            last_price_update=now,
+            updated_at=now
+        )
+
+        params = [
+            {'symbol': symbol, 'contract': contract, 'network': BlockchainNetwork(network), 'price': quote['price_usd']}
+            for (symbol, network, contract), quote in quotes.items()
+        ]
+        for start in range(0, len(params), self.update_batch_size):
+            db.session.connection().execute(statement, params[start:start + self.update_batch_size])
+
+_pipeline = None
+_pipeline_lock = threading.Lock()
+
+def get_price_refresh_pipeline(networks: Optional[Dict[str, Dict]] = None) -> PriceRefreshPipeline:
+    """Return the process-wide price refresh pipeline"""
+    global _pipeline
+    if _pipeline is None:
+        with _pipeline_lock:
+            if _pipeline is None:
+                _pipeline = PriceRefreshPipeline(networks=networks)
+    return _pipeline
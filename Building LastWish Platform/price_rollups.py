@@ -0,0 +1,395 @@
+"""
+Price Rollups for LastWish Crypto Inheritance
+Streams refreshed prices into 1m, 1h and 1d OHLC/VWAP bars held in ring buffers, and flushes finished bars to the database in bulk
+"""
+
+import threading
+import logging
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import delete, insert
+
+from models.user import db
+from models.crypto_assets import PriceBar
+from utils.price_store import PRICE_CHANGE_WINDOWS, PRICE_DTYPE, TIMESTAMP_DTYPE, get_price_store
+
+logger = logging.getLogger(__name__)
+
+RESOLUTIONS = {
+    '1m': 60,
+    '1h': 60 * 60,
+    '1d': 24 * 60 * 60
+}
+
+# Finished bars kept in memory per symbol; older chart ranges are read from price_bars
+RING_CAPACITY = {
+    '1m': 2 * 24 * 60,
+    '1h': 30 * 24,
+    '1d': 365
+}
+
+# Stored bars older than this are deleted on flush
+RETENTION_SECONDS = {
+    '1m': 7 * 24 * 60 * 60,
+    '1h': 365 * 24 * 60 * 60,
+    '1d': 5 * 365 * 24 * 60 * 60
+}
+
+# Resolution each price change is read from, so the window's start is off by at most one bar
+PRICE_CHANGE_RESOLUTIONS = {
+    'price_change_24h': '1m',
+    'price_change_7d': '1h',
+    'price_change_30d': '1d'
+}
+
+# Columns of a bar's values row
+BAR_FIELDS = ('open', 'high', 'low', 'close', 'vwap', 'volume', 'samples')
+CLOSE = BAR_FIELDS.index('close')
+
+def _bar_dict(start: int, values) -> Dict:
+    """Same shape as PriceBar.to_dict"""
+    bar = {'time': int(start)}
+    for field, value in zip(BAR_FIELDS, values):
+        bar[field] = None if np.isnan(value) else float(value)
+    bar['samples'] = int(bar['samples'])
+    return bar
+
+class _OpenBar:
+    """Bar still receiving quotes"""
+
+    __slots__ = ('start', 'open', 'high', 'low', 'close', 'weighted', 'weight', 'total', 'volume', 'samples')
+
+    def __init__(self, start: int, price: float):
+        self.start = start
+        self.open = self.high = self.low = self.close = price
+        self.weighted = self.weight = self.total = 0.0
+        self.volume = np.nan
+        self.samples = 0
+
+    def add(self, price: float, volume: Optional[float]):
+        self.high = max(self.high, price)
+        self.low = min(self.low, price)
+        self.close = price
+        self.total += price
+        self.samples += 1
+        if volume:
+            self.weighted += price * volume
+            self.weight += volume
+            self.volume = volume
+
+    def values(self) -> np.ndarray:
+        # Quotes without a reported volume only count when none in the bar had one
+        vwap = self.weighted / self.weight if self.weight else self.total / self.samples
+        return np.array([self.open, self.high, self.low, self.close, vwap, self.volume, self.samples], dtype=PRICE_DTYPE)
+
+class BarRing:
+    """Fixed-capacity ring of finished bars for one symbol and resolution; the oldest bar is overwritten first"""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._starts = np.zeros(capacity, dtype=TIMESTAMP_DTYPE)
+        self._values = np.zeros((capacity, len(BAR_FIELDS)), dtype=PRICE_DTYPE)
+        self._next = 0
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def first_start(self) -> Optional[int]:
+        return int(self._starts[(self._next - self._size) % self.capacity]) if self._size else None
+
+    @property
+    def last_start(self) -> Optional[int]:
+        return int(self._starts[self._next - 1]) if self._size else None
+
+    def push(self, start: int, values: np.ndarray):
+        self._starts[self._next] = start
+        self._values[self._next] = values
+        self._next = (self._next + 1) % self.capacity
+        self._size = min(self._size + 1, self.capacity)
+
+    def _order(self) -> np.ndarray:
+        """Physical slots oldest first"""
+        return (self._next - self._size + np.arange(self._size)) % self.capacity
+
+    def window(self, start: int, end: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Copies of the bars with start <= bar start < end, oldest first"""
+        order = self._order()
+        first, last = np.searchsorted(self._starts[order], [start, end], side='left')
+        slots = order[first:last]
+        return self._starts[slots], self._values[slots]
+
+    def close_as_of(self, at: int, seconds: int) -> Optional[float]:
+        """Close of the last bar that ended at or before a unix time"""
+        order = self._order()
+        index = np.searchsorted(self._starts[order], at - seconds, side='right') - 1
+        return float(self._values[order[index], CLOSE]) if index >= 0 else None
+
+class SymbolRollup:
+    """One symbol's ring and open bar per resolution"""
+
+    def __init__(self, symbol: str):
+        self.symbol = symbol
+        self.rings = {resolution: BarRing(RING_CAPACITY[resolution]) for resolution in RESOLUTIONS}
+        self.open_bars: Dict[str, Optional[_OpenBar]] = dict.fromkeys(RESOLUTIONS)
+        self.last_at: Optional[int] = None
+        self.last_price: Optional[float] = None
+
+    def _finish(self, resolution: str) -> Tuple[str, int, np.ndarray]:
+        bar = self.open_bars[resolution]
+        values = bar.values()
+        self.rings[resolution].push(bar.start, values)
+        self.open_bars[resolution] = None
+        return resolution, bar.start, values
+
+    def add(self, at: int, price: float, volume: Optional[float] = None) -> List[Tuple[str, int, np.ndarray]]:
+        """Fold one quote into every resolution; returns the bars it finished"""
+        finished = []
+        for resolution, seconds in RESOLUTIONS.items():
+            start = at - at % seconds
+            bar = self.open_bars[resolution]
+            if bar is not None and start > bar.start:
+                finished.append(self._finish(resolution))
+                bar = None
+            if bar is None:
+                # A late quote for a bar that is already finished is dropped
+                last_start = self.rings[resolution].last_start
+                if last_start is not None and start <= last_start:
+                    continue
+                bar = self.open_bars[resolution] = _OpenBar(start, price)
+            elif start < bar.start:
+                continue
+            bar.add(price, volume)
+
+        if self.last_at is None or at >= self.last_at:
+            self.last_at, self.last_price = at, price
+        return finished
+
+    def seal(self, now: int) -> List[Tuple[str, int, np.ndarray]]:
+        """Finish open bars whose time is up, so a quiet symbol's last bars are still flushed"""
+        return [
+            self._finish(resolution)
+            for resolution, seconds in RESOLUTIONS.items()
+            if self.open_bars[resolution] is not None and self.open_bars[resolution].start + seconds <= now
+        ]
+
+    def first_start(self, resolution: str) -> Optional[int]:
+        """Start of the oldest bar held in memory, finished or open"""
+        first = self.rings[resolution].first_start
+        if first is None and self.open_bars[resolution] is not None:
+            first = self.open_bars[resolution].start
+        return first
+
+    def window(self, resolution: str, start: int, end: int) -> List[Dict]:
+        starts, values = self.rings[resolution].window(start, end)
+        bars = [_bar_dict(bar_start, bar_values) for bar_start, bar_values in zip(starts, values)]
+        bar = self.open_bars[resolution]
+        if bar is not None and start <= bar.start < end:
+            bars.append(_bar_dict(bar.start, bar.values()))
+        return bars
+
+    def close_as_of(self, resolution: str, at: int) -> Optional[float]:
+        seconds = RESOLUTIONS[resolution]
+        bar = self.open_bars[resolution]
+        if bar is not None and bar.start + seconds <= at:
+            return bar.close
+        return self.rings[resolution].close_as_of(at, seconds)
+
+class PriceRollups:
+    """Bars for every quoted symbol, fed by the price refresh pipeline and flushed to price_bars on a background timer"""
+
+    def __init__(self, price_store=None, flush_interval: int = 60):
+        self.price_store = price_store or get_price_store()
+        self.flush_interval = flush_interval
+
+        self._symbols: Dict[str, SymbolRollup] = {}
+        self._pending: List[Dict] = []
+        self._bars_lock = threading.Lock()
+
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self, app):
+        """Run flush on a background thread inside the given application's context"""
+        if self._thread and self._thread.is_alive():
+            return
+
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop_event.clear()
+            self._thread = threading.Thread(
+                target=self._run_loop,
+                args=(app,),
+                name='price-rollups',
+                daemon=True
+            )
+            self._thread.start()
+
+    def stop(self):
+        """Stop the background flush thread"""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def _run_loop(self, app):
+        while not self._stop_event.wait(self.flush_interval):
+            with app.app_context():
+                try:
+                    self.flush()
+                except Exception as e:
+                    logger.error(f"Error flushing price bars: {str(e)}")
+                finally:
+                    db.session.remove()
+
+    def _rollup(self, symbol: str) -> SymbolRollup:
+        rollup = self._symbols.get(symbol)
+        if rollup is None:
+            rollup = self._symbols[symbol] = SymbolRollup(symbol)
+        return rollup
+
+    @staticmethod
+    def _rows(symbol: str, finished: List[Tuple[str, int, np.ndarray]]) -> List[Dict]:
+        rows = []
+        for resolution, start, values in finished:
+            bar = _bar_dict(start, values)
+            rows.append({
+                'asset_symbol': symbol,
+                'resolution': resolution,
+                'bucket_start': bar['time'],
+                'open_usd': bar['open'],
+                'high_usd': bar['high'],
+                'low_usd': bar['low'],
+                'close_usd': bar['close'],
+                'vwap_usd': bar['vwap'],
+                'volume_usd': bar['volume'],
+                'sample_count': bar['samples']
+            })
+        return rows
+
+    def ingest(self, at: int, quotes: Dict[str, Dict]):
+        """Price refresh handler: fold one quote per symbol, taken at a unix time, into the open bars"""
+        with self._bars_lock:
+            for symbol, quote in quotes.items():
+                symbol = symbol.upper()
+                volume = quote.get('volume_24h_usd')
+                finished = self._rollup(symbol).add(at, float(quote['price_usd']), float(volume) if volume else None)
+                self._pending.extend(self._rows(symbol, finished))
+
+    def warm(self, now: Optional[int] = None):
+        """Load each resolution's most recent stored bars into the rings, e.g. after a restart"""
+        now = int(now if now is not None else time.time())
+        for resolution, seconds in RESOLUTIONS.items():
+            rows = db.session.query(
+                PriceBar.asset_symbol, PriceBar.bucket_start,
+                PriceBar.open_usd, PriceBar.high_usd, PriceBar.low_usd, PriceBar.close_usd,
+                PriceBar.vwap_usd, PriceBar.volume_usd, PriceBar.sample_count
+            ).filter(
+                PriceBar.resolution == resolution,
+                PriceBar.bucket_start >= now - RING_CAPACITY[resolution] * seconds
+            ).order_by(PriceBar.asset_symbol, PriceBar.bucket_start).all()
+
+            with self._bars_lock:
+                for symbol, start, *values in rows:
+                    rollup = self._rollup(symbol)
+                    ring, bar = rollup.rings[resolution], rollup.open_bars[resolution]
+                    if (ring.last_start is None or start > ring.last_start) and (bar is None or start < bar.start):
+                        ring.push(start, np.array([np.nan if v is None else float(v) for v in values], dtype=PRICE_DTYPE))
+
+    def _unstored(self, rows: List[Dict]) -> List[Dict]:
+        # Another worker process running its own pipeline may have stored the same bar already
+        stored = set(db.session.query(PriceBar.asset_symbol, PriceBar.resolution, PriceBar.bucket_start).filter(
+            PriceBar.asset_symbol.in_({row['asset_symbol'] for row in rows}),
+            PriceBar.bucket_start >= min(row['bucket_start'] for row in rows)
+        ).all())
+        return [row for row in rows if (row['asset_symbol'], row['resolution'], row['bucket_start']) not in stored]
+
+    def flush(self, now: Optional[int] = None) -> int:
+        """Insert every finished bar not yet stored in one statement and delete bars past retention; returns bars inserted"""
+        now = int(now if now is not None else time.time())
+        with self._bars_lock:
+            for symbol, rollup in self._symbols.items():
+                self._pending.extend(self._rows(symbol, rollup.seal(now)))
+            pending, self._pending = self._pending, []
+
+        try:
+            rows = self._unstored(pending) if pending else []
+            if rows:
+                db.session.execute(insert(PriceBar), rows)
+            for resolution, retention in RETENTION_SECONDS.items():
+                db.session.execute(delete(PriceBar).where(
+                    PriceBar.resolution == resolution,
+                    PriceBar.bucket_start < now - retention
+                ))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            # Keep the bars for the next flush
+            with self._bars_lock:
+                self._pending[:0] = pending
+            raise
+        return len(rows)
+
+    def bars(self, symbol: str, resolution: str, start: int, end: int) -> List[Dict]:
+        """Bars with start <= bar start < end, oldest first; ranges older than the ring come from price_bars and the last bar may still be open"""
+        symbol = symbol.upper()
+        with self._bars_lock:
+            rollup = self._symbols.get(symbol)
+            recent = rollup.window(resolution, start, end) if rollup else []
+            first_start = rollup.first_start(resolution) if rollup else None
+
+        stored = []
+        if first_start is None or start < first_start:
+            stored = [bar.to_dict() for bar in PriceBar.query.filter(
+                PriceBar.asset_symbol == symbol,
+                PriceBar.resolution == resolution,
+                PriceBar.bucket_start >= start,
+                PriceBar.bucket_start < (min(end, first_start) if first_start is not None else end)
+            ).order_by(PriceBar.bucket_start).all()]
+        return stored + recent
+
+    def latest(self, symbol: str) -> Optional[Tuple[int, float]]:
+        """Last quoted (unix time, price), from the price store before the first quote since startup"""
+        with self._bars_lock:
+            rollup = self._symbols.get(symbol.upper())
+            if rollup is not None and rollup.last_at is not None:
+                return rollup.last_at, rollup.last_price
+        series = self.price_store.series(symbol)
+        return series.latest() if series else None
+
+    def price_changes(self, symbol: str, now: Optional[int] = None) -> Dict[str, Optional[float]]:
+        """Percent change over 24h, 7d and 30d, each from its matching resolution's bars, falling back to the price store where they do not reach back far enough"""
+        now = int(now if now is not None else time.time())
+        with self._bars_lock:
+            rollup = self._symbols.get(symbol.upper())
+            current = rollup.last_price if rollup else None
+            previous = {
+                field: rollup.close_as_of(PRICE_CHANGE_RESOLUTIONS[field], now - window) if rollup else None
+                for field, window in PRICE_CHANGE_WINDOWS.items()
+            }
+
+        changes = {}
+        fallback = None
+        for field in PRICE_CHANGE_WINDOWS:
+            if current is None or not previous[field]:
+                fallback = fallback or self.price_store.price_changes(symbol, now)
+                changes[field] = fallback[field]
+            else:
+                changes[field] = round((current - previous[field]) / previous[field] * 100, 6)
+        return changes
+
+_rollups = None
+_rollups_lock = threading.Lock()
+
+def get_price_rollups() -> PriceRollups:
+    """Return the process-wide price rollups"""
+    global _rollups
+    if _rollups is None:
+        with _rollups_lock:
+            if _rollups is None:
+                _rollups = PriceRollups()
+    return _rollups
@@ -0,0 +1,245 @@
+"""
+Price Store for LastWish Crypto Inheritance
+Append-only, memory-mapped NumPy time series of USD prices per symbol, for as-of lookups and range queries
+"""
+
+import fcntl
+import os
+import re
+import threading
+import logging
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Kept out of the source tree so deployments and checkouts do not carry price history around
+DEFAULT_PRICE_STORE_DIR = os.environ.get(
+    'PRICE_STORE_DIR',
+    os.path.join(os.environ.get('XDG_DATA_HOME', os.path.expanduser('~/.local/share')), 'lastwish', 'price_store')
+)
+
+TIMESTAMP_DTYPE = np.dtype('<i8')  # Unix seconds
+PRICE_DTYPE = np.dtype('<f8')  # USD
+
+# Every Nth timestamp is kept in memory, so a lookup touches one block of the mapped file
+SPARSE_INDEX_STRIDE = 4096
+
+PRICE_CHANGE_WINDOWS = {
+    'price_change_24h': 24 * 60 * 60,
+    'price_change_7d': 7 * 24 * 60 * 60,
+    'price_change_30d': 30 * 24 * 60 * 60
+}
+
+def _file_stem(symbol: str) -> str:
+    return re.sub(r'[^A-Z0-9_.-]', '_', symbol.upper())
+
+class PriceSeries:
+    """One symbol's prices as two column files (timestamps, prices), appended in timestamp order and mapped read-only
+
+    Every process running a refresh pipeline appends to the same files, so writes and crash repair
+    happen under an exclusive flock on a sidecar lock file.
+    """
+
+    def __init__(self, directory: str, symbol: str):
+        self.symbol = symbol.upper()
+        stem = os.path.join(directory, _file_stem(symbol))
+        self.timestamp_path = f'{stem}.ts.i8'
+        self.price_path = f'{stem}.px.f8'
+        self.lock_path = f'{stem}.lock'
+
+        self._timestamps = np.empty(0, dtype=TIMESTAMP_DTYPE)
+        self._prices = np.empty(0, dtype=PRICE_DTYPE)
+        self._sparse = np.empty(0, dtype=TIMESTAMP_DTYPE)
+        self._lock = threading.Lock()
+        self._open()
+
+    @contextmanager
+    def _file_lock(self):
+        """Exclusive lock on this series shared with every other process"""
+        with open(self.lock_path, 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _open(self):
+        with self._file_lock():
+            self._reload()
+
+    def _reload(self):
+        """Map both columns as they are on disk, dropping a trailing partial write left by a crash between the two appends; call with the file lock held"""
+        columns = ((self.timestamp_path, TIMESTAMP_DTYPE), (self.price_path, PRICE_DTYPE))
+        count = min(os.path.getsize(path) // dtype.itemsize if os.path.exists(path) else 0 for path, dtype in columns)
+        for path, dtype in columns:
+            if os.path.exists(path) and os.path.getsize(path) != count * dtype.itemsize:
+                with open(path, 'r+b') as f:
+                    f.truncate(count * dtype.itemsize)
+        # Another process may have appended since this one last mapped the files
+        if count != len(self._timestamps):
+            self._remap(count)
+
+    def _remap(self, count: int):
+        # Zero-length files cannot be mapped
+        if count:
+            self._timestamps = np.memmap(self.timestamp_path, dtype=TIMESTAMP_DTYPE, mode='r', shape=(count,))
+            self._prices = np.memmap(self.price_path, dtype=PRICE_DTYPE, mode='r', shape=(count,))
+        else:
+            self._timestamps = np.empty(0, dtype=TIMESTAMP_DTYPE)
+            self._prices = np.empty(0, dtype=PRICE_DTYPE)
+        self._sparse = np.array(self._timestamps[::SPARSE_INDEX_STRIDE])
+
+    def __len__(self) -> int:
+        return len(self._timestamps)
+
+    @property
+    def last_timestamp(self) -> Optional[int]:
+        return int(self._timestamps[-1]) if len(self._timestamps) else None
+
+    def append(self, timestamps, prices) -> int:
+        """Append points newer than the last stored one; returns how many were written"""
+        timestamps = np.asarray(timestamps, dtype=TIMESTAMP_DTYPE)
+        prices = np.asarray(prices, dtype=PRICE_DTYPE)
+        if timestamps.shape != prices.shape:
+            raise ValueError('timestamps and prices must have the same length')
+
+        with self._lock, self._file_lock():
+            self._reload()
+            # Keep the series strictly increasing; out-of-order or repeated points are dropped
+            order = np.argsort(timestamps, kind='stable')
+            timestamps, prices = timestamps[order], prices[order]
+            keep = np.ones(len(timestamps), dtype=bool)
+            keep[1:] = timestamps[1:] > timestamps[:-1]
+            if self.last_timestamp is not None:
+                keep &= timestamps > self.last_timestamp
+            timestamps, prices = timestamps[keep], prices[keep]
+            if not len(timestamps):
+                return 0
+
+            # Prices first: a crash after this leaves an extra price, which _open truncates
+            with open(self.price_path, 'ab') as f:
+                f.write(prices.tobytes())
+            with open(self.timestamp_path, 'ab') as f:
+                f.write(timestamps.tobytes())
+            self._remap(len(self._timestamps) + len(timestamps))
+            return len(timestamps)
+
+    def _columns(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        with self._lock:
+            return self._timestamps, self._prices, self._sparse
+
+    @staticmethod
+    def _search(timestamps: np.ndarray, sparse: np.ndarray, at) -> np.ndarray:
+        """Index of the last point at or before each time in `at`, -1 where there is none"""
+        at = np.asarray(at, dtype=TIMESTAMP_DTYPE)
+        block = np.searchsorted(sparse, at, side='right') - 1
+        if at.ndim == 0:
+            start = max(int(block), 0) * SPARSE_INDEX_STRIDE
+            window = timestamps[start:start + SPARSE_INDEX_STRIDE]
+            return np.asarray(start + np.searchsorted(window, at, side='right') - 1)
+        return np.searchsorted(timestamps, at, side='right') - 1
+
+    def price_at(self, at: int) -> Optional[float]:
+        """Price in force at a unix time, i.e. the last one recorded at or before it"""
+        timestamps, prices, sparse = self._columns()
+        if not len(timestamps):
+            return None
+        index = int(self._search(timestamps, sparse, at))
+        return float(prices[index]) if index >= 0 else None
+
+    def prices_at(self, at) -> np.ndarray:
+        """Vectorized as-of lookup for an array of unix times; NaN before the first point"""
+        timestamps, prices, sparse = self._columns()
+        at = np.asarray(at, dtype=TIMESTAMP_DTYPE)
+        if not len(timestamps):
+            return np.full(at.shape, np.nan)
+        indexes = self._search(timestamps, sparse, at)
+        result = np.asarray(prices)[np.maximum(indexes, 0)].astype(PRICE_DTYPE)
+        result[indexes < 0] = np.nan
+        return result
+
+    def range(self, start: int, end: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Copies of the timestamps and prices with start <= t < end"""
+        timestamps, prices, _ = self._columns()
+        first, last = np.searchsorted(timestamps, [start, end], side='left')
+        return np.array(timestamps[first:last]), np.array(prices[first:last])
+
+    def latest(self) -> Optional[Tuple[int, float]]:
+        timestamps, prices, _ = self._columns()
+        if not len(timestamps):
+            return None
+        return int(timestamps[-1]), float(prices[-1])
+
+    def price_changes(self, now: Optional[int] = None) -> Dict[str, Optional[float]]:
+        """Percent change over 24h, 7d and 30d from the price as of each window's start"""
+        now = int(now if now is not None else time.time())
+        current = self.price_at(now)
+        starts = self.prices_at([now - window for window in PRICE_CHANGE_WINDOWS.values()])
+        changes = {}
+        for field, previous in zip(PRICE_CHANGE_WINDOWS, starts):
+            if current is None or np.isnan(previous) or previous == 0:
+                changes[field] = None
+            else:
+                changes[field] = round(float((current - previous) / previous * 100), 6)
+        return changes
+
+class PriceStore:
+    """Directory of price series, opened on first use and kept in an in-memory index by symbol"""
+
+    def __init__(self, directory: str = DEFAULT_PRICE_STORE_DIR):
+        self.directory = directory
+        self._series: Dict[str, PriceSeries] = {}
+        self._lock = threading.Lock()
+
+    def series(self, symbol: str, create: bool = False) -> Optional[PriceSeries]:
+        """The series for a symbol; None if it has never been written, unless create is set"""
+        symbol = symbol.upper()
+        series = self._series.get(symbol)
+        if series is not None:
+            return series
+
+        with self._lock:
+            series = self._series.get(symbol)
+            if series is None:
+                stem = os.path.join(self.directory, _file_stem(symbol))
+                if not create and not os.path.exists(f'{stem}.ts.i8'):
+                    return None
+                os.makedirs(self.directory, exist_ok=True)
+                series = self._series[symbol] = PriceSeries(self.directory, symbol)
+        return series
+
+    def append(self, at: int, prices: Dict[str, float]) -> int:
+        """Record one price per symbol at a unix time; returns the number of points written"""
+        written = 0
+        for symbol, price in prices.items():
+            try:
+                written += self.series(symbol, create=True).append([at], [float(price)])
+            except Exception as e:
+                logger.error(f"Error appending {symbol} price: {str(e)}")
+        return written
+
+    def price_at(self, symbol: str, at: int) -> Optional[float]:
+        series = self.series(symbol)
+        return series.price_at(at) if series else None
+
+    def price_changes(self, symbol: str, now: Optional[int] = None) -> Dict[str, Optional[float]]:
+        series = self.series(symbol)
+        if series is None:
+            return {field: None for field in PRICE_CHANGE_WINDOWS}
+        return series.price_changes(now)
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_price_store() -> PriceStore:
+    """Return the process-wide price store"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = PriceStore()
+    return _store
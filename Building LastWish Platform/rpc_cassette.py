@@ -0,0 +1,251 @@
+"""
+RPC Cassette for LastWish Crypto Inheritance
+Records JSON-RPC traffic on the pooled HTTP sessions to a compact file and replays it offline with injected latency
+
+Set RPC_CASSETTE to a file path and RPC_CASSETTE_MODE to 'record' or 'replay'. Replays wait
+RPC_REPLAY_LATENCY_MS plus or minus RPC_REPLAY_JITTER_MS per HTTP request.
+"""
+
+import atexit
+import gzip
+import json
+import os
+import random
+import threading
+import time
+import logging
+from collections import Counter, defaultdict, deque
+from typing import Any, Deque, Dict, List, Optional
+
+from requests import Response
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+logger = logging.getLogger(__name__)
+
+RPC_CASSETTE_PATH = os.environ.get('RPC_CASSETTE')
+RPC_CASSETTE_MODE = os.environ.get('RPC_CASSETTE_MODE', 'replay')
+RPC_REPLAY_LATENCY_MS = float(os.environ.get('RPC_REPLAY_LATENCY_MS', '0'))
+RPC_REPLAY_JITTER_MS = float(os.environ.get('RPC_REPLAY_JITTER_MS', '0'))
+
+# Signed transactions embed the chain id and fee fields, so they are replayed in order instead of by params
+ORDER_MATCHED_METHODS = {'eth_sendRawTransaction'}
+
+# Position of the block parameter; reads pinned to a head that differs between runs fall back to any block
+BLOCK_PARAM_POSITIONS = {
+    'eth_getBalance': 1,
+    'eth_getTransactionCount': 1,
+    'eth_getCode': 1,
+    'eth_call': 1,
+    'eth_getStorageAt': 2
+}
+
+def _call_key(network: str, method: str, params: Any) -> str:
+    if method in ORDER_MATCHED_METHODS:
+        params = None
+    return json.dumps([network, method, params], sort_keys=True, separators=(',', ':'))
+
+def _any_block_key(network: str, method: str, params: Any) -> Optional[str]:
+    position = BLOCK_PARAM_POSITIONS.get(method)
+    if position is None or not isinstance(params, list):
+        return None
+    return _call_key(network, method, params[:position] + params[position + 1:] + ['*'])
+
+class RpcCassette:
+    """Recorded JSON-RPC exchanges per network, answered call by call on replay
+
+    Batches are stored as sent but replayed per call, so a replaying run may group its
+    calls differently without missing. A call seen several times is answered in recorded
+    order and its last answer repeats (e.g. eth_blockNumber once the recording ran out).
+    """
+
+    RECORD = 'record'
+    REPLAY = 'replay'
+
+    def __init__(self, path: str, mode: str = REPLAY, latency: float = 0.0, jitter: float = 0.0, seed: Optional[int] = None):
+        if mode not in (self.RECORD, self.REPLAY):
+            raise ValueError(f'Unknown cassette mode: {mode}')
+        self.path = path
+        self.mode = mode
+        self.latency = latency  # seconds
+        self.jitter = jitter  # seconds, uniform either side of latency
+
+        self._interactions: List[Dict] = []
+        self._responses: Dict[str, Deque[Dict]] = {}
+        self._stats = defaultdict(lambda: {
+            'requests': Counter(), 'methods': Counter(), 'urls': Counter(), 'misses': 0
+        })
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+        if mode == self.REPLAY:
+            self.load()
+
+    def load(self):
+        """Read a cassette written by save() into per-call replay queues"""
+        with gzip.open(self.path, 'rt', encoding='utf-8') as f:
+            for line in f:
+                interaction = json.loads(line)
+                self._interactions.append(interaction)
+                for method, params, response in interaction['calls']:
+                    for key in (_call_key(interaction['network'], method, params),
+                                _any_block_key(interaction['network'], method, params)):
+                        if key:
+                            self._responses.setdefault(key, deque()).append(response)
+        logger.info(f"Loaded {len(self._interactions)} recorded RPC requests from {self.path}")
+
+    def save(self):
+        """Write every recorded exchange as gzipped JSON lines"""
+        with self._lock:
+            interactions = list(self._interactions)
+
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        # Write then rename so an interrupted save never leaves a truncated cassette
+        temp_path = f'{self.path}.{os.getpid()}.tmp'
+        with gzip.open(temp_path, 'wt', encoding='utf-8') as f:
+            for interaction in interactions:
+                f.write(json.dumps(interaction, separators=(',', ':')))
+                f.write('\n')
+        os.replace(temp_path, self.path)
+        logger.info(f"Saved {len(interactions)} RPC requests to {self.path}")
+
+    def _count(self, network: str, url: str, payload: Any, misses: int = 0):
+        """Tally one HTTP request; caller holds the lock"""
+        calls = payload if isinstance(payload, list) else [payload]
+        stats = self._stats[network]
+        stats['requests']['batch' if isinstance(payload, list) else payload.get('method')] += 1
+        stats['methods'].update(call.get('method') for call in calls)
+        stats['urls'][url] += 1
+        stats['misses'] += misses
+
+    def record(self, network: str, url: str, payload: Any, body: Any):
+        """Store one HTTP exchange; payload and body are the parsed request and response"""
+        calls = payload if isinstance(payload, list) else [payload]
+        if isinstance(body, list):
+            by_id = {item.get('id'): item for item in body if isinstance(item, dict)}
+            responses = [by_id.get(call.get('id'), {'error': {'code': -32000, 'message': 'Missing response'}}) for call in calls]
+        else:
+            # A single response, or one error object answering a whole rejected batch
+            responses = [body] * len(calls)
+
+        interaction = {
+            'network': network,
+            'url': url,
+            'batch': isinstance(payload, list),
+            'calls': [
+                [call.get('method'), call.get('params', []), {k: v for k, v in response.items() if k in ('result', 'error')}]
+                for call, response in zip(calls, responses)
+            ]
+        }
+        with self._lock:
+            self._interactions.append(interaction)
+            self._count(network, url, payload)
+
+    def replay(self, network: str, url: str, payload: Any) -> Any:
+        """Answer a request or batch from the recording after the injected latency"""
+        calls = payload if isinstance(payload, list) else [payload]
+        with self._lock:
+            answers = [self._answer(network, call) for call in calls]
+            misses = len([answer for answer in answers if answer is None])
+            self._count(network, url, payload, misses)
+            delay = max(0.0, self.latency + self._rng.uniform(-self.jitter, self.jitter))
+
+        replies = []
+        for call, answer in zip(calls, answers):
+            if answer is None:
+                answer = {'error': {'code': -32000, 'message': f"No recorded response for {call.get('method')}"}}
+            replies.append(dict(answer, jsonrpc='2.0', id=call.get('id')))
+
+        if delay:
+            time.sleep(delay)
+        return replies if isinstance(payload, list) else replies[0]
+
+    def _answer(self, network: str, call: Dict) -> Optional[Dict]:
+        """Next recorded response for a call, at any block if its exact block was never read; caller holds the lock"""
+        method, params = call.get('method'), call.get('params', [])
+        queue = self._responses.get(_call_key(network, method, params))
+        if not queue:
+            any_block = _any_block_key(network, method, params)
+            queue = self._responses.get(any_block) if any_block else None
+        if not queue:
+            return None
+        return queue.popleft() if len(queue) > 1 else queue[0]
+
+    def get_stats(self) -> Dict[str, Dict]:
+        """Per network: HTTP requests, RPC calls per method, requests per URL and replay misses"""
+        with self._lock:
+            return {
+                network: {
+                    'http_requests': sum(stats['requests'].values()),
+                    'rpc_calls': sum(stats['methods'].values()),
+                    'requests': dict(stats['requests']),
+                    'methods': dict(stats['methods']),
+                    'urls': dict(stats['urls']),
+                    'misses': stats['misses']
+                }
+                for network, stats in self._stats.items()
+            }
+
+    def reset_stats(self):
+        with self._lock:
+            self._stats.clear()
+
+class CassetteAdapter(HTTPAdapter):
+    """Transport adapter that records real exchanges, or replays them without touching the network"""
+
+    def __init__(self, cassette: RpcCassette, network: str, **kwargs):
+        super().__init__(**kwargs)
+        self.cassette = cassette
+        self.network = network
+
+    def send(self, request, **kwargs):
+        payload = json.loads(request.body)
+
+        if self.cassette.mode == RpcCassette.RECORD:
+            response = super().send(request, **kwargs)
+            if response.status_code == 200:
+                try:
+                    self.cassette.record(self.network, request.url, payload, response.json())
+                except ValueError:
+                    logger.debug(f"Not recording non-JSON response from {request.url}")
+            return response
+
+        response = Response()
+        response.status_code = 200
+        response.reason = 'OK'
+        response.headers = CaseInsensitiveDict({'Content-Type': 'application/json'})
+        response._content = json.dumps(self.cassette.replay(self.network, request.url, payload)).encode('utf-8')
+        response.encoding = 'utf-8'
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        return response
+
+_cassette = None
+_cassette_lock = threading.Lock()
+
+def configure_rpc_cassette(path: str, mode: str, latency: float = 0.0, jitter: float = 0.0) -> RpcCassette:
+    """Install the process-wide cassette explicitly; must run before any network connection is built"""
+    global _cassette
+    with _cassette_lock:
+        _cassette = RpcCassette(path, mode, latency=latency, jitter=jitter)
+        if _cassette.mode == RpcCassette.RECORD:
+            atexit.register(_cassette.save)
+    return _cassette
+
+def get_rpc_cassette() -> Optional[RpcCassette]:
+    """Return the process-wide cassette configured by RPC_CASSETTE, or None when recording and replay are off"""
+    global _cassette
+    if _cassette is None and RPC_CASSETTE_PATH:
+        with _cassette_lock:
+            if _cassette is None:
+                _cassette = RpcCassette(
+                    RPC_CASSETTE_PATH,
+                    RPC_CASSETTE_MODE,
+                    latency=RPC_REPLAY_LATENCY_MS / 1000,
+                    jitter=RPC_REPLAY_JITTER_MS / 1000
+                )
+                if _cassette.mode == RpcCassette.RECORD:
+                    atexit.register(_cassette.save)
+    return _cassette
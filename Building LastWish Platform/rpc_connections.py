@@ -0,0 +1,579 @@
+"""
+RPC Connection Registry for LastWish Crypto Inheritance
+Keeps one long-lived, health-checked Web3 provider per network, routed across a pool of RPC endpoints
+"""
+
+import json
+import re
+import threading
+import time
+import logging
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from web3 import Web3
+from web3.providers.base import JSONBaseProvider
+
+from utils.rpc_cassette import CassetteAdapter, get_rpc_cassette
+
+logger = logging.getLogger(__name__)
+
+def parse_batch_response(body: Any, count: int) -> List[Dict]:
+    """Map a JSON-RPC batch response back to {'result', 'error'} dicts ordered by request id"""
+    # Some providers answer an oversized or unsupported batch with a single error object
+    if not isinstance(body, list):
+        error = body.get('error', {}) if isinstance(body, dict) else {}
+        message = error.get('message', 'Batch request rejected') if isinstance(error, dict) else str(error)
+        return [{'result': None, 'error': message} for _ in range(count)]
+
+    responses = {item.get('id'): item for item in body if isinstance(item, dict)}
+    results = []
+    for index in range(count):
+        item = responses.get(index)
+        if item is None:
+            results.append({'result': None, 'error': 'Missing response'})
+        elif item.get('error'):
+            error = item['error']
+            results.append({
+                'result': None,
+                'error': error.get('message', str(error)) if isinstance(error, dict) else str(error)
+            })
+        else:
+            results.append({'result': item.get('result'), 'error': None})
+    return results
+
+URL_PATTERN = re.compile(r'https?://[^\s\'",)]+')
+
+def redact_url(url: str) -> str:
+    """Scheme and host only; RPC providers put API keys in the path, query or userinfo"""
+    parts = urlsplit(url)
+    host = parts.hostname or ''
+    return f'{parts.scheme}://{host}:{parts.port}' if parts.port else f'{parts.scheme}://{host}'
+
+def redact_error(error: Optional[str]) -> Optional[str]:
+    """Error text with every URL in it redacted, as transport errors quote the full request URL"""
+    return URL_PATTERN.sub(lambda match: redact_url(match.group(0)), error) if error else error
+
+def build_batch_payload(calls: List[Tuple[str, List[Any]]]) -> List[Dict]:
+    """Build a JSON-RPC batch payload whose ids are the call positions"""
+    return [
+        {'jsonrpc': '2.0', 'id': index, 'method': method, 'params': params}
+        for index, (method, params) in enumerate(calls)
+    ]
+
+class RpcEndpoint:
+    """A single RPC URL with rolling latency statistics and a circuit breaker"""
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(
+        self,
+        url: str,
+        ewma_alpha: float = 0.2,
+        failure_threshold: int = 5,
+        cooldown_seconds: float = 30.0,
+        sample_size: int = 200
+    ):
+        self.url = url
+        self.ewma_alpha = ewma_alpha
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+
+        self.ewma_latency = None
+        self.latencies = deque(maxlen=sample_size)
+        self.total_requests = 0
+        self.total_errors = 0
+        self.hedges_won = 0
+        self.consecutive_failures = 0
+        self.last_error = None
+
+        self.state = self.CLOSED
+        self.opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def is_available(self) -> bool:
+        """Whether a request could be sent now; only reads state, so ranking never claims the trial slot"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN:
+                return time.monotonic() - self.opened_at >= self.cooldown_seconds
+            return not self._trial_in_flight
+
+    def try_acquire(self) -> bool:
+        """Claim the right to send one request: always when closed, and the single trial request once an open circuit has cooled down
+
+        Called just before sending; a claimed trial is released by record_success or record_failure.
+        """
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.cooldown_seconds:
+                self.state = self.HALF_OPEN
+            if self.state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self, latency: float):
+        with self._lock:
+            self.total_requests += 1
+            self.latencies.append(latency)
+            self.ewma_latency = latency if self.ewma_latency is None else (
+                self.ewma_alpha * latency + (1 - self.ewma_alpha) * self.ewma_latency
+            )
+            self.consecutive_failures = 0
+            self.last_error = None
+            self.state = self.CLOSED
+            self._trial_in_flight = False
+
+    def record_failure(self, error: str):
+        with self._lock:
+            self.total_requests += 1
+            self.total_errors += 1
+            self.consecutive_failures += 1
+            self.last_error = error
+            self._trial_in_flight = False
+            if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.warning(f"Circuit opened for RPC endpoint {redact_url(self.url)}: {redact_error(error)}")
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+    def latency_percentile(self, percentile: float) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self.latencies)
+        if not samples:
+            return None
+        index = min(len(samples) - 1, int(round(percentile / 100 * (len(samples) - 1))))
+        return samples[index]
+
+    def to_dict(self) -> Dict:
+        return {
+            'url': redact_url(self.url),
+            'state': self.state,
+            'ewma_latency_ms': round(self.ewma_latency * 1000, 1) if self.ewma_latency is not None else None,
+            'p50_latency_ms': _to_ms(self.latency_percentile(50)),
+            'p95_latency_ms': _to_ms(self.latency_percentile(95)),
+            'total_requests': self.total_requests,
+            'total_errors': self.total_errors,
+            'error_rate': round(self.total_errors / self.total_requests, 4) if self.total_requests else 0.0,
+            'hedges_won': self.hedges_won,
+            'consecutive_failures': self.consecutive_failures,
+            'last_error': redact_error(self.last_error)
+        }
+
+def _to_ms(seconds: Optional[float]) -> Optional[float]:
+    return round(seconds * 1000, 1) if seconds is not None else None
+
+class EndpointPool:
+    """Routes requests across a network's RPC endpoints by latency, with hedging and failover"""
+
+    # Broadcasts are never duplicated speculatively; they only fail over on transport errors
+    NON_HEDGED_METHODS = {'eth_sendRawTransaction', 'eth_sendTransaction'}
+
+    def __init__(
+        self,
+        network: str,
+        urls: List[str],
+        session: requests.Session,
+        request_timeout: float = 10,
+        min_hedge_delay: float = 0.05,
+        min_hedge_samples: int = 20,
+        max_workers: int = 20
+    ):
+        self.network = network
+        self.endpoints = [RpcEndpoint(url) for url in urls]
+        self.session = session
+        self.request_timeout = request_timeout
+        self.min_hedge_delay = min_hedge_delay
+        self.min_hedge_samples = min_hedge_samples
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f'rpc-{network}')
+
+    @property
+    def urls(self) -> List[str]:
+        return [endpoint.url for endpoint in self.endpoints]
+
+    def ranked_endpoints(self) -> List[RpcEndpoint]:
+        """Available endpoints, fastest EWMA first; unmeasured endpoints are tried early"""
+        available = [endpoint for endpoint in self.endpoints if endpoint.is_available()]
+        return sorted(available, key=lambda e: e.ewma_latency if e.ewma_latency is not None else 0.0)
+
+    def best_url(self) -> Optional[str]:
+        ranked = self.ranked_endpoints()
+        return ranked[0].url if ranked else None
+
+    def _hedge_delay(self, endpoint: RpcEndpoint) -> Optional[float]:
+        if len(endpoint.latencies) < self.min_hedge_samples:
+            return None
+        return max(self.min_hedge_delay, endpoint.latency_percentile(95))
+
+    def _post(self, endpoint: RpcEndpoint, body: bytes, claim: bool = True) -> bytes:
+        # Another request took the half-open trial since this endpoint was ranked
+        if claim and not endpoint.try_acquire():
+            raise ConnectionError('Circuit open')
+        start = time.monotonic()
+        try:
+            response = self.session.post(
+                endpoint.url,
+                data=body,
+                headers={'Content-Type': 'application/json'},
+                timeout=self.request_timeout
+            )
+            response.raise_for_status()
+        except Exception as e:
+            endpoint.record_failure(str(e))
+            raise
+        endpoint.record_success(time.monotonic() - start)
+        return response.content
+
+    def send(self, body: bytes, hedge: bool = True) -> bytes:
+        """Send a raw JSON-RPC body and return the first successful response body
+
+        The request goes to the fastest endpoint. If it has not answered by its own p95
+        latency, one duplicate is sent to the next endpoint. Transport failures fall
+        over to the remaining endpoints in latency order.
+        """
+        candidates = self.ranked_endpoints()
+        if not candidates:
+            raise ConnectionError(f'No available RPC endpoints for {self.network}')
+
+        primary = candidates.pop(0)
+        in_flight = {self._executor.submit(self._post, primary, body): primary}
+        hedge_delay = self._hedge_delay(primary) if hedge else None
+        deadline = time.monotonic() + self.request_timeout
+        errors = []
+
+        while in_flight:
+            remaining_time = max(0.0, deadline - time.monotonic())
+            timeout = min(hedge_delay, remaining_time) if hedge_delay is not None and candidates else remaining_time
+            done, _ = wait(in_flight.keys(), timeout=timeout, return_when=FIRST_COMPLETED)
+
+            if not done:
+                if hedge_delay is not None and candidates:
+                    hedge_endpoint = candidates.pop(0)
+                    in_flight[self._executor.submit(self._post, hedge_endpoint, body)] = hedge_endpoint
+                    hedge_delay = None  # Only one speculative duplicate per request
+                    continue
+                break
+
+            for future in done:
+                endpoint = in_flight.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    errors.append(f'{endpoint.url}: {str(e)}')
+                    if candidates and not in_flight:
+                        failover = candidates.pop(0)
+                        in_flight[self._executor.submit(self._post, failover, body)] = failover
+                    continue
+                if endpoint is not primary:
+                    endpoint.hedges_won += 1
+                return result
+
+        raise ConnectionError(f"All RPC endpoints failed for {self.network}: {'; '.join(errors) or 'timed out'}")
+
+    def probe_all(self, body: bytes) -> bool:
+        """Probe every endpoint directly, bypassing routing so open circuits can recover"""
+        healthy = False
+        for endpoint in self.endpoints:
+            try:
+                self._post(endpoint, body, claim=False)
+                healthy = True
+            except Exception as e:
+                logger.debug(f"Health probe failed for {endpoint.url}: {str(e)}")
+        return healthy
+
+    def get_stats(self) -> List[Dict]:
+        return [endpoint.to_dict() for endpoint in self.endpoints]
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+class PooledHTTPProvider(JSONBaseProvider):
+    """Web3 provider that sends every request through an EndpointPool"""
+
+    def __init__(self, pool: EndpointPool):
+        super().__init__()
+        self.pool = pool
+
+    def __str__(self) -> str:
+        return f"RPC endpoint pool for {self.pool.network} ({len(self.pool.endpoints)} endpoints)"
+
+    def make_request(self, method: str, params: Any) -> Dict:
+        request_data = self.encode_rpc_request(method, params)
+        raw_response = self.pool.send(request_data, hedge=method not in EndpointPool.NON_HEDGED_METHODS)
+        return self.decode_rpc_response(raw_response)
+
+class NetworkConnection:
+    """Long-lived Web3 connection to a single network backed by a keep-alive session and an endpoint pool"""
+
+    HEALTH_PROBE = json.dumps({'jsonrpc': '2.0', 'id': 0, 'method': 'web3_clientVersion', 'params': []}).encode()
+
+    def __init__(
+        self,
+        network: str,
+        rpc_urls: List[str],
+        pool_size: int = 20,
+        request_timeout: int = 10,
+        batch_limit: int = 100
+    ):
+        self.network = network
+        self.rpc_urls = list(rpc_urls)
+        self.batch_limit = batch_limit
+        self.pool_size = pool_size
+        self.request_timeout = request_timeout
+
+        self.healthy = False
+        self.checked = False
+        self.last_check = None
+        self.last_error = None
+        self.consecutive_failures = 0
+
+        self.session = None
+        self.pool = None
+        self.w3 = None
+        self._build()
+
+    def _build(self):
+        """Create the pooled HTTP session, the endpoint pool and the Web3 instance that uses them"""
+        session = requests.Session()
+        adapter_options = {'pool_connections': len(self.rpc_urls), 'pool_maxsize': self.pool_size, 'max_retries': 0}
+        # RPC_CASSETTE records this session's traffic, or replays it instead of calling the endpoints
+        cassette = get_rpc_cassette()
+        if cassette:
+            adapter = CassetteAdapter(cassette, self.network, **adapter_options)
+        else:
+            adapter = HTTPAdapter(**adapter_options)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+
+        self.session = session
+        self.pool = EndpointPool(
+            self.network,
+            self.rpc_urls,
+            session,
+            request_timeout=self.request_timeout,
+            max_workers=self.pool_size
+        )
+        self.w3 = Web3(PooledHTTPProvider(self.pool))
+
+    def check_health(self) -> bool:
+        """Probe every endpoint once and record whether any of them answered"""
+        try:
+            self.healthy = self.pool.probe_all(self.HEALTH_PROBE)
+            self.last_error = None if self.healthy else 'No endpoint reachable'
+        except Exception as e:
+            self.healthy = False
+            self.last_error = str(e)
+
+        self.checked = True
+        self.last_check = datetime.utcnow()
+        self.consecutive_failures = 0 if self.healthy else self.consecutive_failures + 1
+        return self.healthy
+
+    def batch_request(self, calls: List[Tuple[str, List[Any]]]) -> List[Dict]:
+        """Send JSON-RPC calls as batch payloads, chunked to the provider limit
+        
+        Returns one {'result', 'error'} dict per call, in input order.
+        """
+        results = []
+        for start in range(0, len(calls), self.batch_limit):
+            chunk = calls[start:start + self.batch_limit]
+            results.extend(self._send_batch(chunk))
+        return results
+
+    def _send_batch(self, chunk: List[Tuple[str, List[Any]]]) -> List[Dict]:
+        payload = build_batch_payload(chunk)
+        hedge = not any(method in EndpointPool.NON_HEDGED_METHODS for method, _ in chunk)
+
+        try:
+            body = json.loads(self.pool.send(json.dumps(payload).encode(), hedge=hedge))
+        except Exception as e:
+            logger.error(f"Batch request to {self.network} failed: {str(e)}")
+            return [{'result': None, 'error': str(e)} for _ in chunk]
+
+        return parse_batch_response(body, len(chunk))
+
+    def reconnect(self):
+        """Drop the current session and rebuild the provider from scratch"""
+        logger.warning(f"Reconnecting to {self.network} network")
+        self.close()
+        self._build()
+
+    def close(self):
+        """Close the pooled HTTP session and the endpoint pool"""
+        try:
+            self.pool.close()
+            self.session.close()
+        except Exception as e:
+            logger.debug(f"Error closing session for {self.network}: {str(e)}")
+
+    def to_dict(self) -> Dict:
+        return {
+            'network': self.network,
+            'rpc_urls': [redact_url(url) for url in self.rpc_urls],
+            'batch_limit': self.batch_limit,
+            'healthy': self.healthy,
+            'last_check': self.last_check.isoformat() if self.last_check else None,
+            'last_error': redact_error(self.last_error),
+            'consecutive_failures': self.consecutive_failures
+        }
+
+class Web3ConnectionRegistry:
+    """Process-wide registry of network connections with background health checks"""
+
+    def __init__(self, health_check_interval: int = 30, failure_threshold: int = 3, pool_size: int = 20):
+        self.health_check_interval = health_check_interval
+        self.failure_threshold = failure_threshold
+        self.pool_size = pool_size
+
+        self._connections: Dict[str, NetworkConnection] = {}
+        self._lock = threading.RLock()
+        self._stop_event = threading.Event()
+        self._health_thread = None
+
+    def register_network(self, network: str, rpc_urls: List[str], batch_limit: int = 100) -> NetworkConnection:
+        """Register a network, reusing the existing connection if the URLs are unchanged"""
+        with self._lock:
+            connection = self._connections.get(network)
+            if connection and connection.rpc_urls == list(rpc_urls):
+                connection.batch_limit = batch_limit
+                return connection
+
+            if connection:
+                connection.close()
+
+            connection = NetworkConnection(
+                network,
+                rpc_urls,
+                pool_size=self.pool_size,
+                batch_limit=batch_limit
+            )
+            self._connections[network] = connection
+            return connection
+
+    def get_connection(self, network: str) -> Optional[Web3]:
+        """Return the pooled Web3 instance for a network, or None if it is unhealthy"""
+        connection = self._connections.get(network)
+        if not connection:
+            logger.error(f"Unsupported network: {network}")
+            return None
+
+        # Only the very first lookup probes inline; afterwards the health thread owns probing
+        if not connection.checked:
+            with self._lock:
+                if not connection.checked:
+                    connection.check_health()
+                    if connection.healthy:
+                        logger.info(f"Connected to {network} network")
+            self._ensure_health_thread()
+
+        if not connection.healthy:
+            logger.error(f"Failed to connect to {network} network")
+            return None
+
+        return connection.w3
+
+    def batch_request(self, network: str, calls: List[Tuple[str, List[Any]]]) -> List[Dict]:
+        """Send JSON-RPC calls to a network in batch payloads"""
+        connection = self._connections.get(network)
+        if not connection:
+            logger.error(f"Unsupported network: {network}")
+            return [{'result': None, 'error': f'Unsupported network: {network}'} for _ in calls]
+
+        if not calls:
+            return []
+
+        return connection.batch_request(calls)
+
+    def mark_unhealthy(self, network: str, error: str = None):
+        """Let callers report a failed RPC so the next health check reconnects"""
+        connection = self._connections.get(network)
+        if connection:
+            connection.healthy = False
+            connection.last_error = error
+            connection.consecutive_failures = max(connection.consecutive_failures, self.failure_threshold)
+
+    def get_endpoint_pool(self, network: str) -> Optional[EndpointPool]:
+        """Return a network's endpoint pool, for transports that send requests themselves"""
+        connection = self._connections.get(network)
+        return connection.pool if connection else None
+
+    def get_best_url(self, network: str) -> Optional[str]:
+        """Return the currently fastest available endpoint URL for a network"""
+        connection = self._connections.get(network)
+        return connection.pool.best_url() if connection else None
+
+    def get_endpoint_stats(self) -> Dict[str, List[Dict]]:
+        """Return per-endpoint latency, error and circuit breaker stats for every network"""
+        return {network: connection.pool.get_stats() for network, connection in self._connections.items()}
+
+    def get_status(self) -> Dict:
+        """Return health information for every registered network"""
+        return {network: connection.to_dict() for network, connection in self._connections.items()}
+
+    def check_all(self):
+        """Probe every registered network, reconnecting the ones that keep failing"""
+        for network, connection in list(self._connections.items()):
+            if connection.consecutive_failures >= self.failure_threshold:
+                connection.reconnect()
+
+            was_healthy = connection.healthy
+            if connection.check_health() and not was_healthy:
+                logger.info(f"Connection to {network} network restored")
+            elif not connection.healthy and was_healthy:
+                logger.error(f"Connection to {network} network lost: {connection.last_error}")
+
+    def _ensure_health_thread(self):
+        if self._health_thread and self._health_thread.is_alive():
+            return
+
+        with self._lock:
+            if self._health_thread and self._health_thread.is_alive():
+                return
+            self._stop_event.clear()
+            self._health_thread = threading.Thread(
+                target=self._health_loop,
+                name='web3-health-check',
+                daemon=True
+            )
+            self._health_thread.start()
+
+    def _health_loop(self):
+        while not self._stop_event.wait(self.health_check_interval):
+            try:
+                self.check_all()
+            except Exception as e:
+                logger.error(f"Error during RPC health check: {str(e)}")
+
+    def shutdown(self):
+        """Stop the health thread and close every pooled session"""
+        self._stop_event.set()
+        if self._health_thread:
+            self._health_thread.join(timeout=5)
+
+        with self._lock:
+            for connection in self._connections.values():
+                connection.close()
+            self._connections.clear()
+
+_registry = None
+_registry_lock = threading.Lock()
+
+def get_connection_registry() -> Web3ConnectionRegistry:
+    """Return the process-wide connection registry"""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = Web3ConnectionRegistry()
+    return _registry
@@ -4,7 +4,7 @@ Handles monetization, subscription tiers, and payment processing
 """
 
 from datetime import datetime, timedelta
-from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, Text, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, Text, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from .estate_models import db
 
@@ -204,10 +204,16 @@ class Payment(db.Model):
     Payment transaction records for subscription billing
     """
     __tablename__ = 'payments'
+    __table_args__ = (
+        # Serves the verification worker's scan of pending crypto payments
+        Index('ix_payments_pending_crypto', 'status', 'payment_method', 'id'),
+    )
     
     id = Column(Integer, primary_key=True)
-    subscription_id = Column(Integer, ForeignKey('user_subscriptions.id'), nullable=False)
+    subscription_id = Column(Integer, ForeignKey('user_subscriptions.id'))  # Set once a crypto payment is verified
     user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
+    tier_id = Column(Integer, ForeignKey('subscription_tiers.id'))  # Tier purchased, for deferred activation
+    billing_cycle = Column(String(10))  # monthly, yearly
     
     # Payment details
     amount = Column(Float, nullable=False)
@@ -225,7 +231,10 @@ class Payment(db.Model):
     crypto_currency = Column(String(10))  # ETH, BTC, USDC, etc.
     crypto_amount = Column(Float)
     crypto_wallet_address = Column(String(100))
-    crypto_network = Column(String(20))  # ethereum, polygon, bsc
+    crypto_network = Column(String(20))  # ethereum, polygon, binance_smart_chain, avalanche
+    crypto_block_number = Column(Integer)
+    crypto_block_hash = Column(String(66))
+    crypto_confirmation_status = Column(String(20), index=True)  # unconfirmed, final
     
     # Billing details
     billing_period_start = Column(DateTime)
@@ -274,7 +283,9 @@ class Payment(db.Model):
                 'amount': self.crypto_amount,
                 'wallet_address': self.crypto_wallet_address,
                 'network': self.crypto_network,
-                'transaction_hash': self.crypto_transaction_hash
+                'transaction_hash': self.crypto_transaction_hash,
+                'block_number': self.crypto_block_number,
+                'confirmation_status': self.crypto_confirmation_status
             } if self.crypto_currency else None,
             'billing_period': {
                 'start': self.billing_period_start.isoformat() if self.billing_period_start else None,
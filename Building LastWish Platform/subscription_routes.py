@@ -15,6 +15,8 @@ from models.subscription_models import (
     SubscriptionTier, UserSubscription, Payment, PromoCode, UsageLog,
     get_user_subscription, check_feature_limit, log_feature_usage
 )
+from utils.blockchain_integration import get_blockchain_manager
+from utils.payment_verifier import get_payment_verifier, normalize_network
 
 # Create blueprint
 subscription_bp = Blueprint('subscription', __name__)
@@ -26,6 +28,14 @@ logger = logging.getLogger(__name__)
 # Create blueprint for subscription routes
 subscription_bp = Blueprint('subscription', __name__, url_prefix='/api/subscription')
 
+# Verifies submitted crypto payments on chain in the background
+payment_verifier = get_payment_verifier(get_blockchain_manager().networks)
+
+@subscription_bp.record_once
+def start_payment_verification(state):
+    """Start the crypto payment verification worker when the blueprint is registered"""
+    payment_verifier.start(state.app)
+
 @subscription_bp.route('/health', methods=['GET'])
 @cross_origin()
 def health_check():
@@ -618,7 +628,7 @@ def process_crypto_payment():
         crypto_amount = data.get('crypto_amount')
         transaction_hash = data.get('transaction_hash')
         wallet_address = data.get('wallet_address')
-        network = data.get('network', 'ethereum')
+        network = normalize_network(data.get('network', 'ethereum'))
         
         if not all([tier_id, crypto_currency, crypto_amount, transaction_hash, wallet_address]):
             return jsonify({'error': 'Missing required payment information'}), 400
@@ -638,6 +648,8 @@ def process_crypto_payment():
             currency='USD',
             payment_method='crypto',
             status='pending',  # Will be verified by blockchain monitoring
+            tier_id=target_tier.id,
+            billing_cycle=billing_cycle,
             crypto_currency=crypto_currency,
             crypto_amount=float(crypto_amount),
             crypto_wallet_address=wallet_address,
@@ -0,0 +1,88 @@
+"""
+Tests for the basis-point allocation engine
+"""
+
+import random
+from decimal import Decimal
+
+import numpy as np
+import pytest
+
+from utils.allocation import (
+    BASIS_POINTS, allocate_basis_points, apportion, from_base_units, shares_to_list, split_by_basis_points,
+    to_base_units, validate_allocations
+)
+
+@pytest.mark.parametrize('percentages, valid', [
+    ([50, 50], True),
+    (['33.33', '33.33', '33.34'], True),
+    ([33.33, 33.33, 33.34], True),
+    ([100], True),
+    ([0, 100], True),
+    ([50, 49.99], False),
+    ([60, 50, -10], False),
+    ([], False),
+    (['abc', 100], False),
+    ([float('nan'), 100], False),
+    ([float('inf'), 100], False),
+    (['NaN'], False)
+])
+def test_validate_allocations(percentages, valid):
+    assert validate_allocations(percentages) is valid
+
+def test_allocate_basis_points_exact():
+    assert allocate_basis_points([50, 25, 25]).tolist() == [5000, 2500, 2500]
+    assert allocate_basis_points(['33.33', '33.33', '33.34']).tolist() == [3333, 3333, 3334]
+
+def test_allocate_basis_points_finer_precision_totals_exactly():
+    basis_points = allocate_basis_points(['33.333', '33.333', '33.334'])
+    assert basis_points.sum() == BASIS_POINTS
+    assert basis_points.dtype == np.int64
+
+@pytest.mark.parametrize('percentages', [[50, 49], [float('nan'), 100], ['x']])
+def test_allocate_basis_points_rejects_invalid(percentages):
+    with pytest.raises(ValueError):
+        allocate_basis_points(percentages)
+
+def test_apportion_sums_to_total_and_breaks_ties_by_index():
+    assert apportion(10, [1, 1, 1]).tolist() == [4, 3, 3]
+    parts = apportion(10 ** 30 + 7, [3, 5, 11, 13])
+    assert sum(parts) == 10 ** 30 + 7
+
+def test_apportion_rejects_zero_weights():
+    with pytest.raises(ValueError):
+        apportion(100, [0, 0])
+
+def test_split_single_total():
+    shares = split_by_basis_points(1001, [5000, 5000])
+    assert shares.tolist() == [501, 500]
+
+def test_split_many_totals_rows_sum_to_totals():
+    rng = random.Random(7)
+    basis_points = apportion(BASIS_POINTS, [rng.randint(1, 100) for _ in range(37)])
+    totals = [rng.randint(0, 10 ** 24) for _ in range(50)]
+    shares = split_by_basis_points(totals, basis_points)
+    assert shares.shape == (50, 37)
+    assert [int(sum(int(s) for s in row)) for row in shares] == totals
+    assert (shares >= 0).all()
+
+def test_split_beyond_int64_uses_python_ints():
+    total = 2 ** 255
+    shares = split_by_basis_points(total, [3333, 3333, 3334])
+    assert sum(shares_to_list(shares)) == total
+
+@pytest.mark.parametrize('basis_points', [[5000, 4000], [11000, -1000]])
+def test_split_rejects_invalid_basis_points(basis_points):
+    with pytest.raises(ValueError):
+        split_by_basis_points(100, basis_points)
+
+def test_base_unit_round_trip():
+    assert to_base_units('1.5') == 1500000000000000000
+    assert to_base_units('0.0000000000000000019') == 1  # Dust below one wei is truncated
+    assert to_base_units('12.34', decimals=6) == 12340000
+    assert from_base_units(1500000000000000000) == Decimal('1.5')
+
+def test_shares_to_list_returns_python_ints():
+    shares = shares_to_list(np.asarray([1, 2, 3], dtype=np.int64))
+    assert shares == [1, 2, 3]
+    assert all(type(share) is int for share in shares)
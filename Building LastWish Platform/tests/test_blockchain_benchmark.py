@@ -0,0 +1,171 @@
+"""
+Dev chain benchmarks: balance fan-out, contract reads, deployment and multi-beneficiary execution
+against the in-process EVM, checking the JSON-RPC round trips each scenario makes
+
+Timings are collected by pytest-benchmark and the RPC counts of every scenario are stored in its
+extra_info, so `--benchmark-save` / `--benchmark-compare` track both across runs.
+"""
+
+import math
+
+import pytest
+
+pytest.importorskip('eth_tester')
+pytest.importorskip('pytest_benchmark')
+
+from cryptography.fernet import Fernet
+
+import utils.blockchain_integration as blockchain_integration
+from utils.blockchain_integration import (
+    BlockchainManager, CryptoTransferManager, InheritanceSmartContract, encrypt_sensitive_data
+)
+from utils.dev_chain import get_dev_chain
+from utils.disperse import DISPERSE_ADDRESS
+from utils.multicall import MULTICALL3_ADDRESS
+
+NETWORK = 'ethereum'
+CONTRACTS = 20
+BENEFICIARIES = 10
+
+# Polled on their own timers, so their counts depend on wall time rather than on the scenario
+BACKGROUND_METHODS = {'eth_blockNumber', 'eth_feeHistory', 'eth_gasPrice', 'web3_clientVersion'}
+
+@pytest.fixture(scope='module')
+def manager():
+    """A blockchain manager whose networks all run on in-process dev chains"""
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(blockchain_integration, 'BLOCKCHAIN_PROVIDER', 'dev')
+        manager = BlockchainManager()
+    yield manager
+    manager.async_engine.shutdown()
+
+@pytest.fixture(scope='module')
+def chain(manager):
+    return get_dev_chain(NETWORK)
+
+@pytest.fixture(scope='module')
+def contract_manager(manager):
+    return InheritanceSmartContract(manager)
+
+@pytest.fixture(scope='module')
+def artifact(contract_manager):
+    try:
+        return contract_manager.get_contract_artifact()
+    except Exception as e:
+        pytest.skip(f'CryptoInheritance could not be compiled: {str(e)}')
+
+@pytest.fixture(scope='module')
+def spenders(chain):
+    """Wallets between the contract owners and the beneficiaries, each handed out once so nonces never collide"""
+    return iter(chain.wallets[CONTRACTS:-BENEFICIARIES])
+
+@pytest.fixture(scope='module')
+def beneficiaries(chain):
+    beneficiaries = [
+        {'beneficiary_name': f'Beneficiary {index}', 'crypto_wallet_address': wallet.address,
+         'wallet_address': wallet.address, 'allocation_percentage': round(100 / BENEFICIARIES, 2)}
+        for index, wallet in enumerate(chain.wallets[-BENEFICIARIES:])
+    ]
+    # Percentages must total exactly 100; put the rounding on the first beneficiary
+    beneficiaries[0]['allocation_percentage'] = round(100 - sum(b['allocation_percentage'] for b in beneficiaries[1:]), 2)
+    return beneficiaries
+
+def measure_rpc(benchmark, networks, run):
+    """Run once more outside the timer and return the scenario's HTTP round trips and RPC calls, without background polling"""
+    chains = [get_dev_chain(network) for network in networks]
+    for dev_chain in chains:
+        dev_chain.reset_rpc_stats()
+    run()
+
+    totals = {'http_requests': 0, 'rpc_calls': 0, 'methods': {}}
+    for dev_chain in chains:
+        stats = dev_chain.get_rpc_stats()
+        totals['http_requests'] += sum(count for kind, count in stats['requests'].items() if kind not in BACKGROUND_METHODS)
+        for method, count in stats['methods'].items():
+            if method not in BACKGROUND_METHODS:
+                totals['rpc_calls'] += count
+                totals['methods'][method] = totals['methods'].get(method, 0) + count
+    benchmark.extra_info.update(totals)
+    return totals
+
+def test_balance_fanout(benchmark, manager, chain):
+    addresses = [wallet.address for wallet in chain.wallets]
+
+    def run():
+        manager.balance_cache.clear()
+        return manager.get_wallet_balances(addresses, NETWORK)
+
+    results = benchmark(run)
+    assert all(result['balance'] is not None for result in results)
+
+    rpc = measure_rpc(benchmark, [NETWORK], run)
+    assert rpc['methods'] == {'eth_getBalance': len(addresses)}
+    assert rpc['http_requests'] <= math.ceil(len(addresses) / manager.networks[NETWORK]['batch_limit'])
+
+def test_multichain_balances(benchmark, manager, chain):
+    addresses = [wallet.address for wallet in chain.wallets]
+    queries = {network: addresses for network in manager.networks}
+
+    def run():
+        manager.balance_cache.clear()
+        return manager.get_multichain_balances(queries)
+
+    results = benchmark(run)
+    assert all(result['balance'] is not None for rows in results.values() for result in rows)
+
+    rpc = measure_rpc(benchmark, list(manager.networks), run)
+    assert rpc['methods'] == {'eth_getBalance': len(addresses) * len(manager.networks)}
+
+def test_token_balances(benchmark, manager, chain):
+    if not chain.has_code(MULTICALL3_ADDRESS):
+        pytest.skip('Multicall3 could not be compiled for the dev chain')
+    tokens = chain.seed_tokens(count=3)
+    # 300 balances fit one aggregate3 request
+    holders = [wallet.address for wallet in chain.wallets[:100]]
+
+    balances = benchmark(manager.get_token_balances, holders, tokens, NETWORK)
+    assert all(value is not None for by_holder in balances.values() for value in by_holder.values())
+
+    rpc = measure_rpc(benchmark, [NETWORK], lambda: manager.get_token_balances(holders, tokens, NETWORK))
+    # Every token x holder balance in one aggregated eth_call; decimals are cached by now
+    assert rpc['methods'] == {'eth_call': 1}
+
+def test_contract_reads(benchmark, contract_manager, chain, artifact):
+    if not chain.has_code(MULTICALL3_ADDRESS):
+        pytest.skip('Multicall3 could not be compiled for the dev chain')
+    contracts = chain.seed_inheritance_contracts(artifact, CONTRACTS, BENEFICIARIES)
+
+    statuses = benchmark(contract_manager.check_contract_statuses, contracts)
+    assert all(status['status'] != 'error' for status in statuses)
+
+    rpc = measure_rpc(benchmark, [NETWORK], lambda: contract_manager.check_contract_statuses(contracts))
+    # One aggregated read per contract, sent concurrently
+    assert rpc['methods'] == {'eth_call': len(contracts)}
+
+def test_deployment(benchmark, contract_manager, artifact, spenders, beneficiaries):
+    def setup():
+        return (NETWORK, next(spenders).key.hex(), beneficiaries, 365, 30), {}
+
+    deployed = benchmark.pedantic(contract_manager.deploy_inheritance_contract, setup=setup, rounds=3, iterations=1)
+    assert deployed is not None
+
+@pytest.mark.parametrize('execution_mode', ['per_transfer', 'batched'])
+def test_execution(benchmark, manager, chain, spenders, beneficiaries, execution_mode):
+    if execution_mode == 'batched' and not chain.has_code(DISPERSE_ADDRESS):
+        pytest.skip('Disperse could not be compiled for the dev chain')
+    transfer_manager = CryptoTransferManager(manager)
+    encryption_key = Fernet.generate_key().decode()
+
+    def setup():
+        sender = next(spenders)
+        prepared = transfer_manager.prepare_inheritance_transfer(
+            sender.address, '', beneficiaries, NETWORK, execution_mode=execution_mode
+        )
+        assert prepared['success'], prepared.get('error')
+        return (prepared['transfer_plan'], encrypt_sensitive_data(sender.key.hex(), encryption_key), encryption_key), {}
+
+    executed = benchmark.pedantic(transfer_manager.execute_inheritance_transfer, setup=setup, rounds=3, iterations=1)
+    assert executed['success'], executed.get('error')
+    summary = executed['execution_summary']
+    assert summary['successful_transfers'] == len(beneficiaries)
+    assert summary['failed_transfers'] == summary['pending_transfers'] == 0
@@ -0,0 +1,108 @@
+"""
+Tests for the memory-mapped price store
+"""
+
+import multiprocessing
+import os
+
+import numpy as np
+import pytest
+
+from utils.price_store import PriceSeries, PriceStore, SPARSE_INDEX_STRIDE
+
+DAY = 24 * 60 * 60
+
+@pytest.fixture
+def store(tmp_path):
+    return PriceStore(str(tmp_path))
+
+def test_unknown_symbol_has_no_series(store):
+    assert store.series('ETH') is None
+    assert store.price_at('ETH', 100) is None
+    assert store.price_changes('ETH', 100) == {'price_change_24h': None, 'price_change_7d': None, 'price_change_30d': None}
+
+def test_as_of_lookups(store):
+    store.append(100, {'eth': 10})
+    store.append(200, {'ETH': 20})
+    series = store.series('Eth')
+    assert len(series) == 2
+    assert series.price_at(99) is None
+    assert series.price_at(100) == 10
+    assert series.price_at(199) == 10
+    assert series.price_at(500) == 20
+    assert series.latest() == (200, 20.0)
+
+def test_append_keeps_series_strictly_increasing(tmp_path):
+    series = PriceSeries(str(tmp_path), 'BTC')
+    assert series.append([30, 10, 20, 20], [3, 1, 2, 9]) == 3
+    assert series.append([20, 40], [5, 4]) == 1
+    timestamps, prices = series.range(0, 100)
+    assert timestamps.tolist() == [10, 20, 30, 40]
+    assert prices.tolist() == [1, 2, 3, 4]
+
+def test_append_rejects_mismatched_columns(tmp_path):
+    with pytest.raises(ValueError):
+        PriceSeries(str(tmp_path), 'BTC').append([1, 2], [1])
+
+def test_vectorized_lookup_across_sparse_blocks(tmp_path):
+    series = PriceSeries(str(tmp_path), 'SOL')
+    count = SPARSE_INDEX_STRIDE * 3 + 5
+    timestamps = np.arange(count, dtype=np.int64) * 10 + 1000
+    series.append(timestamps, timestamps / 10)
+
+    at = np.array([0, 1000, 1005, 1000 + 10 * SPARSE_INDEX_STRIDE, timestamps[-1] + 50])
+    expected = [np.nan, 100, 100, 100 + SPARSE_INDEX_STRIDE, timestamps[-1] / 10]
+    np.testing.assert_array_equal(series.prices_at(at), expected)
+    assert [series.price_at(int(t)) for t in at[1:]] == expected[1:]
+
+def test_range_is_half_open(tmp_path):
+    series = PriceSeries(str(tmp_path), 'ADA')
+    series.append([10, 20, 30], [1, 2, 3])
+    timestamps, _ = series.range(10, 30)
+    assert timestamps.tolist() == [10, 20]
+
+def test_price_changes(store):
+    now = 100 * DAY
+    store.append(now - 30 * DAY, {'ETH': 50})
+    store.append(now - 7 * DAY, {'ETH': 80})
+    store.append(now - DAY, {'ETH': 100})
+    store.append(now, {'ETH': 110})
+    changes = store.price_changes('ETH', now)
+    assert changes == {'price_change_24h': 10.0, 'price_change_7d': 37.5, 'price_change_30d': 120.0}
+
+def test_reopen_drops_partial_write(tmp_path):
+    series = PriceSeries(str(tmp_path), 'DOT')
+    series.append([1, 2], [1.5, 2.5])
+    # A crash between the two column appends leaves one extra price
+    with open(series.price_path, 'ab') as f:
+        f.write(np.asarray([9.9]).tobytes())
+
+    reopened = PriceSeries(str(tmp_path), 'DOT')
+    assert len(reopened) == 2
+    assert os.path.getsize(reopened.price_path) == 2 * 8
+    assert reopened.append([3], [3.5]) == 1
+    assert reopened.range(0, 10)[1].tolist() == [1.5, 2.5, 3.5]
+
+def test_sees_appends_from_another_store(tmp_path):
+    first, second = PriceStore(str(tmp_path)), PriceStore(str(tmp_path))
+    first.append(100, {'ETH': 1})
+    second.append(100, {'ETH': 2})  # Already written by the other store
+    second.append(200, {'ETH': 3})
+    assert second.series('ETH').range(0, 1000)[1].tolist() == [1, 3]
+
+def _append_all(directory, count):
+    store = PriceStore(directory)
+    for index in range(count):
+        store.append(1000 + index, {'ETH': index})
+
+def test_concurrent_processes_never_duplicate_points(tmp_path):
+    processes = [multiprocessing.Process(target=_append_all, args=(str(tmp_path), 300)) for _ in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+        assert process.exitcode == 0
+
+    timestamps, prices = PriceStore(str(tmp_path)).series('ETH').range(0, 10 ** 6)
+    assert timestamps.tolist() == list(range(1000, 1300))
+    assert prices.tolist() == list(range(300))
@@ -0,0 +1,129 @@
+"""
+Tests for recording and replaying JSON-RPC traffic with the RPC cassette
+"""
+
+import json
+import time
+
+import pytest
+import requests
+
+from utils.rpc_cassette import CassetteAdapter, RpcCassette
+
+URL = 'http://rpc.invalid'
+
+def _call(method, params, id=0):
+    return {'jsonrpc': '2.0', 'id': id, 'method': method, 'params': params}
+
+@pytest.fixture
+def cassette_path(tmp_path):
+    """A cassette recorded from a short ethereum session"""
+    path = str(tmp_path / 'rpc.jsonl.gz')
+    cassette = RpcCassette(path, RpcCassette.RECORD)
+    cassette.record('ethereum', URL, _call('eth_blockNumber', []), {'id': 0, 'result': '0x10'})
+    cassette.record('ethereum', URL, _call('eth_blockNumber', []), {'id': 0, 'result': '0x11'})
+    cassette.record('ethereum', URL, [
+        _call('eth_getBalance', ['0xaa', '0x10'], 0),
+        _call('eth_getBalance', ['0xbb', '0x10'], 1)
+    ], [{'id': 1, 'result': '0x2'}, {'id': 0, 'result': '0x1'}])
+    cassette.record('ethereum', URL, _call('eth_sendRawTransaction', ['0xsigned-a']), {'id': 0, 'result': '0xhash-a'})
+    cassette.record('ethereum', URL, _call('eth_sendRawTransaction', ['0xsigned-b']), {'id': 0, 'result': '0xhash-b'})
+    cassette.record('ethereum', URL, _call('eth_call', [{'to': '0xcc'}, 'latest']), {'id': 0, 'error': {'code': 3, 'message': 'reverted'}})
+    cassette.save()
+    return path
+
+def test_save_and_load_round_trip(cassette_path):
+    replay = RpcCassette(cassette_path)
+    assert replay.mode == RpcCassette.REPLAY
+    assert len(replay._interactions) == 6
+
+def test_unknown_mode_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        RpcCassette(str(tmp_path / 'rpc.jsonl.gz'), 'rewind')
+
+def test_repeated_calls_answer_in_order_then_repeat_the_last(cassette_path):
+    replay = RpcCassette(cassette_path)
+    answers = [replay.replay('ethereum', URL, _call('eth_blockNumber', [], id=7))['result'] for _ in range(3)]
+    assert answers == ['0x10', '0x11', '0x11']
+
+def test_batches_are_answered_per_call_in_any_grouping(cassette_path):
+    replay = RpcCassette(cassette_path)
+    # Recorded as one batch; replayed as a reversed batch and as a single call
+    batch = replay.replay('ethereum', URL, [_call('eth_getBalance', ['0xbb', '0x10'], 0)])
+    single = replay.replay('ethereum', URL, _call('eth_getBalance', ['0xaa', '0x10'], 5))
+    assert batch == [{'result': '0x2', 'jsonrpc': '2.0', 'id': 0}]
+    assert single == {'result': '0x1', 'jsonrpc': '2.0', 'id': 5}
+
+def test_block_pinned_reads_fall_back_to_any_block(cassette_path):
+    replay = RpcCassette(cassette_path)
+    response = replay.replay('ethereum', URL, _call('eth_getBalance', ['0xaa', '0x99']))
+    assert response['result'] == '0x1'
+
+def test_transactions_replay_in_recorded_order(cassette_path):
+    replay = RpcCassette(cassette_path)
+    # Re-signed transactions differ from the recording; they are matched by order, not params
+    first = replay.replay('ethereum', URL, _call('eth_sendRawTransaction', ['0xresigned-1']))
+    second = replay.replay('ethereum', URL, _call('eth_sendRawTransaction', ['0xresigned-2']))
+    assert (first['result'], second['result']) == ('0xhash-a', '0xhash-b')
+
+def test_errors_replay_and_misses_are_counted(cassette_path):
+    replay = RpcCassette(cassette_path)
+    reverted = replay.replay('ethereum', URL, _call('eth_call', [{'to': '0xcc'}, 'latest']))
+    missing = replay.replay('ethereum', URL, _call('eth_chainId', []))
+    other_network = replay.replay('polygon', URL, _call('eth_blockNumber', []))
+    assert reverted['error'] == {'code': 3, 'message': 'reverted'}
+    assert 'No recorded response' in missing['error']['message']
+    assert 'error' in other_network
+
+    stats = replay.get_stats()
+    assert stats['ethereum']['http_requests'] == 2
+    assert stats['ethereum']['misses'] == 1
+    assert stats['polygon']['misses'] == 1
+    replay.reset_stats()
+    assert replay.get_stats() == {}
+
+def test_replay_injects_latency(cassette_path):
+    replay = RpcCassette(cassette_path, latency=0.05, jitter=0.01, seed=1)
+    start = time.perf_counter()
+    replay.replay('ethereum', URL, _call('eth_blockNumber', []))
+    assert time.perf_counter() - start >= 0.04
+
+def test_adapter_serves_replies_without_the_network(cassette_path):
+    session = requests.Session()
+    session.mount('http://', CassetteAdapter(RpcCassette(cassette_path), 'ethereum'))
+    response = session.post(URL, data=json.dumps([
+        _call('eth_getBalance', ['0xaa', '0x10'], 0),
+        _call('eth_getBalance', ['0xbb', '0x10'], 1)
+    ]), headers={'Content-Type': 'application/json'})
+    response.raise_for_status()
+    assert [item['result'] for item in response.json()] == ['0x1', '0x2']
+
+def test_adapter_records_a_live_endpoint_for_replay(tmp_path):
+    """Record a dev chain through the adapter, then replay the same requests with the chain out of the loop"""
+    pytest.importorskip('eth_tester')
+    from utils.dev_chain import DevChain
+
+    chain = DevChain('ethereum', wallet_count=3)
+    chain.start()
+    path = str(tmp_path / 'dev.jsonl.gz')
+    payloads = [
+        _call('eth_chainId', []),
+        [_call('eth_getBalance', [wallet.address, 'latest'], index) for index, wallet in enumerate(chain.wallets)]
+    ]
+    try:
+        recorder = RpcCassette(path, RpcCassette.RECORD)
+        session = requests.Session()
+        session.mount('http://', CassetteAdapter(recorder, 'ethereum'))
+        recorded = [session.post(chain.url, json=payload).json() for payload in payloads]
+        recorder.save()
+        chain.reset_rpc_stats()
+
+        session = requests.Session()
+        session.mount('http://', CassetteAdapter(RpcCassette(path), 'ethereum'))
+        replayed = [session.post(chain.url, json=payload).json() for payload in payloads]
+        assert chain.get_rpc_stats()['http_requests'] == 0
+    finally:
+        chain.stop()
+
+    assert replayed == recorded
+    assert [int(item['result'], 16) for item in replayed[1]] == [chain.wallet_balance] * 3
@@ -0,0 +1,72 @@
+"""
+Tests for the hierarchical timing wheel behind the trigger engine
+"""
+
+import random
+
+from utils.trigger_engine import TimingWheel
+
+START = 1700000000
+
+def test_fires_at_due_tick():
+    wheel = TimingWheel(start=START)
+    wheel.insert('a', START + 5)
+    assert wheel.advance(START + 4) == []
+    assert wheel.advance(START + 5) == ['a']
+    assert len(wheel) == 0
+
+def test_overdue_key_fires_next_tick():
+    wheel = TimingWheel(start=START)
+    wheel.insert('late', START - 3600)
+    assert wheel.advance(START + 1) == ['late']
+
+def test_reschedule_replaces_earlier_schedule():
+    wheel = TimingWheel(start=START)
+    wheel.insert('a', START + 10)
+    wheel.insert('a', START + 20)
+    assert wheel.advance(START + 15) == []
+    assert wheel.advance(START + 20) == ['a']
+    assert wheel.advance(START + 100) == []
+
+def test_removed_key_never_fires():
+    wheel = TimingWheel(start=START)
+    wheel.insert('a', START + 10)
+    wheel.remove('a')
+    assert wheel.advance(START + 20) == []
+    assert len(wheel) == 0
+
+def test_entries_cascade_from_upper_levels():
+    # 4 slots x 3 levels spans 64 ticks; later entries go round the top level again
+    wheel = TimingWheel(slot_bits=2, levels=3, start=START)
+    due = {f'k{offset}': START + offset for offset in (1, 3, 4, 17, 63, 64, 65, 200, 1000)}
+    for key, due_time in due.items():
+        wheel.insert(key, due_time)
+
+    fired = {}
+    for now in range(START + 1, START + 1001):
+        for key in wheel.advance(now):
+            fired[key] = now
+    assert fired == due
+
+def test_matches_sorted_order_for_random_schedules():
+    rng = random.Random(3)
+    wheel = TimingWheel(slot_bits=3, levels=4, start=START)
+    due = {key: START + rng.randint(1, 5000) for key in range(2000)}
+    for key, due_time in due.items():
+        wheel.insert(key, due_time)
+
+    fired_at = {}
+    for now in range(START, START + 5001 + 37, 37):
+        for key in wheel.advance(now):
+            fired_at[key] = now
+
+    assert set(fired_at) == set(due)
+    # Each key fires on the first advance at or after its due time
+    assert all(fired_at[key] - 37 < due_time <= fired_at[key] for key, due_time in due.items())
+
+def test_coarse_ticks_round_due_times_up():
+    start = 1700000040  # On a minute boundary
+    wheel = TimingWheel(tick_seconds=60, start=start)
+    wheel.insert('a', start + 61)
+    assert wheel.advance(start + 119) == []
+    assert wheel.advance(start + 120) == ['a']
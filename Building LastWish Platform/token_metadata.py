@@ -0,0 +1,169 @@
+"""
+Token Metadata Cache for LastWish Crypto Inheritance
+Keeps ERC-20 decimals, symbol and name in an in-memory LRU backed by the token_metadata table
+"""
+
+import threading
+import logging
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from flask import has_app_context
+from sqlalchemy.orm import Session
+from web3 import Web3
+
+from models.user import db
+from models.crypto_assets import TokenMetadata, BlockchainNetwork
+from utils.multicall import ContractCall, Multicall3Aggregator
+
+logger = logging.getLogger(__name__)
+
+class TokenMetadataCache:
+    """LRU cache of token metadata keyed by (network, contract_address)"""
+
+    def __init__(self, max_size: int = 10000):
+        self.max_size = max_size
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(network: str, contract_address: str) -> Tuple[str, str]:
+        return network, Web3.to_checksum_address(contract_address)
+
+    def get(self, network: str, contract_address: str) -> Optional[Dict]:
+        """Return cached metadata without touching the chain or the database"""
+        key = self._key(network, contract_address)
+        with self._lock:
+            metadata = self._entries.get(key)
+            if metadata is not None:
+                self._entries.move_to_end(key)
+            return metadata
+
+    def put(self, network: str, contract_address: str, metadata: Dict):
+        """Store metadata in memory, evicting the least recently used entry when full"""
+        key = self._key(network, contract_address)
+        with self._lock:
+            self._entries[key] = metadata
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def warm(self, network: Optional[str] = None) -> int:
+        """Load persisted metadata into memory (requires an application context)"""
+        try:
+            query = TokenMetadata.query
+            if network:
+                query = query.filter_by(blockchain_network=BlockchainNetwork(network))
+
+            rows = query.order_by(TokenMetadata.last_updated.desc()).limit(self.max_size).all()
+            for row in reversed(rows):
+                self.put(row.blockchain_network.value, row.contract_address, {
+                    'decimals': row.decimals,
+                    'symbol': row.symbol,
+                    'name': row.name
+                })
+
+            logger.info(f"Warmed token metadata cache with {len(rows)} tokens")
+            return len(rows)
+
+        except Exception as e:
+            logger.error(f"Error warming token metadata cache: {str(e)}")
+            return 0
+
+    def get_many(self, network: str, contract_addresses: List[str], w3: Web3) -> Dict[str, Optional[Dict]]:
+        """Return metadata for every token, fetching all cache misses in one Multicall3 request"""
+        metadata = {}
+        missing = []
+        for address in contract_addresses:
+            cached = self.get(network, address)
+            metadata[address] = cached
+            if cached is None:
+                missing.append(address)
+
+        if missing:
+            fetched = self._fetch(missing, w3)
+            for address, token_metadata in fetched.items():
+                if token_metadata is not None:
+                    self.put(network, address, token_metadata)
+                metadata[address] = token_metadata
+            self._persist(network, {a: m for a, m in fetched.items() if m is not None})
+
+        return metadata
+
+    def _fetch(self, contract_addresses: List[str], w3: Web3) -> Dict[str, Optional[Dict]]:
+        calls = {}
+        for address in contract_addresses:
+            calls[(address, 'decimals')] = ContractCall(address, 'decimals()', [], ['uint8'])
+            calls[(address, 'symbol')] = ContractCall(address, 'symbol()', [], ['string'])
+            calls[(address, 'name')] = ContractCall(address, 'name()', [], ['string'])
+
+        reads = Multicall3Aggregator(w3).aggregate_named(calls)
+
+        fetched = {}
+        for address in contract_addresses:
+            decimals = reads[(address, 'decimals')]
+            if not decimals['success']:
+                logger.warning(f"Could not read decimals for token {address}: {decimals['error']}")
+                fetched[address] = None
+                continue
+
+            fetched[address] = {
+                'decimals': decimals['result'],
+                'symbol': reads[(address, 'symbol')]['result'],
+                'name': reads[(address, 'name')]['result']
+            }
+        return fetched
+
+    def _persist(self, network: str, fetched: Dict[str, Dict]):
+        """Save fetched metadata in its own session and transaction
+
+        This runs on the request path, so committing or rolling back the shared scoped session
+        would end the caller's unit of work.
+        """
+        if not fetched:
+            return
+
+        if not has_app_context():
+            logger.debug("No application context, token metadata kept in memory only")
+            return
+
+        try:
+            blockchain_network = BlockchainNetwork(network)
+            addresses = [Web3.to_checksum_address(a) for a in fetched.keys()]
+            with Session(db.engine) as session, session.begin():
+                self._upsert(session, blockchain_network, addresses, fetched)
+
+        except Exception as e:
+            logger.error(f"Error persisting token metadata for {network}: {str(e)}")
+
+    @staticmethod
+    def _upsert(session: Session, blockchain_network: BlockchainNetwork, addresses: List[str], fetched: Dict[str, Dict]):
+        existing = {
+            row.contract_address: row
+            for row in session.query(TokenMetadata).filter(
+                TokenMetadata.blockchain_network == blockchain_network,
+                TokenMetadata.contract_address.in_(addresses)
+            ).all()
+        }
+
+        for address, token_metadata in fetched.items():
+            address = Web3.to_checksum_address(address)
+            row = existing.get(address)
+            if row is None:
+                row = TokenMetadata(blockchain_network=blockchain_network, contract_address=address)
+                session.add(row)
+            row.decimals = token_metadata['decimals']
+            row.symbol = token_metadata['symbol']
+            row.name = token_metadata['name']
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_token_metadata_cache() -> TokenMetadataCache:
+    """Return the process-wide token metadata cache"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = TokenMetadataCache()
+    return _cache
@@ -0,0 +1,389 @@
+"""
+Transaction Pipeline for LastWish Crypto Inheritance
+Pre-allocates nonces, signs transfers up front, broadcasts them together and tracks receipts per block
+"""
+
+import threading
+import time
+import logging
+from typing import Dict, List, Optional, Tuple
+
+from eth_account import Account
+from web3 import Web3
+
+from utils.rpc_connections import get_connection_registry
+from utils.balance_cache import get_block_watcher
+from utils.gas_oracle import get_gas_oracle
+
+logger = logging.getLogger(__name__)
+
+class NonceManager:
+    """Hands out nonces locally so many transactions can be signed without a round trip each"""
+
+    def __init__(self):
+        self.connections = get_connection_registry()
+        self._next_nonce: Dict[Tuple[str, str], int] = {}
+        self._lock = threading.Lock()
+
+    def allocate(self, network: str, address: str, count: int = 1) -> List[int]:
+        """Reserve count consecutive nonces for an address"""
+        key = (network, address.lower())
+        with self._lock:
+            if key not in self._next_nonce:
+                w3 = self.connections.get_connection(network)
+                if not w3:
+                    raise ConnectionError(f'No connection to {network}')
+                self._next_nonce[key] = w3.eth.get_transaction_count(Web3.to_checksum_address(address), 'pending')
+
+            start = self._next_nonce[key]
+            self._next_nonce[key] = start + count
+            return list(range(start, start + count))
+
+    def reset(self, network: str, address: str):
+        """Forget the local nonce so the next allocation re-reads the pending count"""
+        with self._lock:
+            self._next_nonce.pop((network, address.lower()), None)
+
+class PendingTransaction:
+    """A broadcast transaction awaiting its receipt, with every hash that shares its nonce"""
+
+    def __init__(self, network: str, tx: Dict, tx_hash: str, broadcast_block: Optional[int]):
+        self.network = network
+        self.tx = tx
+        self.tx_hashes = [tx_hash]
+        self.broadcast_block = broadcast_block
+        self.receipt = None
+        self.replacements = 0
+        self.tracked = False
+        self.done = threading.Event()
+
+    @property
+    def current_hash(self) -> str:
+        return self.tx_hashes[-1]
+
+class ReceiptWatcher:
+    """Matches pending transactions against new blocks from the shared head watcher"""
+
+    def __init__(self, replacement_after_blocks: int = 3, max_replacements: int = 3, fee_bump: float = 1.2, abandon_after_blocks: int = 256):
+        self.replacement_after_blocks = replacement_after_blocks
+        self.max_replacements = max_replacements
+        self.fee_bump = fee_bump
+        self.abandon_after_blocks = abandon_after_blocks  # untracked even if no caller gives up on it first
+
+        self.connections = get_connection_registry()
+        self.block_watcher = get_block_watcher()
+
+        self._pending: Dict[str, PendingTransaction] = {}  # tx hash -> pending transaction
+        # sender address -> private key for fee-bump replacements, held only while the sender has tracked transactions
+        self._signers: Dict[str, str] = {}
+        self._signer_refs: Dict[str, int] = {}
+        self._last_block: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+        self.block_watcher.add_listener(self._on_new_head)
+
+    def track(self, pending: PendingTransaction, private_key: str):
+        sender = pending.tx['from'].lower()
+        with self._lock:
+            for tx_hash in pending.tx_hashes:
+                self._pending[tx_hash] = pending
+            pending.tracked = True
+            self._signers[sender] = private_key
+            self._signer_refs[sender] = self._signer_refs.get(sender, 0) + 1
+
+            # Scan from the broadcast block so inclusions before the next head poll are not missed
+            last_block = self._last_block.get(pending.network)
+            if pending.broadcast_block is not None and (last_block is None or last_block > pending.broadcast_block):
+                self._last_block[pending.network] = pending.broadcast_block
+        self.block_watcher.watch(pending.network)
+
+    def catch_up(self, network: str):
+        """Scan blocks the head watcher already reported while nothing was tracked yet
+
+        A head seen mid-broadcast moves the scan start past the new transactions; without this
+        they would only be found once another block arrives.
+        """
+        head = self.block_watcher.get_head(network)
+        with self._lock:
+            last_block = self._last_block.get(network)
+        if head is not None and last_block is not None and head > last_block:
+            self._on_new_head(network, head)
+
+    def _on_new_head(self, network: str, head: int):
+        # Claim the block range under the lock so a concurrent catch_up does not scan it twice
+        with self._lock:
+            tracked = {h: p for h, p in self._pending.items() if p.network == network and not p.done.is_set()}
+            first_block = self._last_block.get(network, head - 1) + 1
+            self._last_block[network] = max(head, self._last_block.get(network, head))
+        if not tracked or first_block > head:
+            return
+
+        # One batch for every new block's transaction hashes, then one batch for matched receipts
+        block_calls = [('eth_getBlockByNumber', [hex(n), False]) for n in range(first_block, head + 1)]
+        included = set()
+        for response in self.connections.batch_request(network, block_calls):
+            if response['result']:
+                included.update(tx_hash.lower() for tx_hash in response['result'].get('transactions', []))
+
+        matched = [tx_hash for tx_hash in tracked if tx_hash.lower() in included]
+        if matched:
+            receipts = self.connections.batch_request(
+                network, [('eth_getTransactionReceipt', [tx_hash]) for tx_hash in matched]
+            )
+            for tx_hash, response in zip(matched, receipts):
+                if response['result']:
+                    self._complete(tracked[tx_hash], response['result'])
+
+        expired = [
+            pending for pending in set(tracked.values())
+            if not pending.done.is_set() and pending.broadcast_block is not None
+            and head - pending.broadcast_block >= self.abandon_after_blocks
+        ]
+        for pending in expired:
+            logger.warning(f"Giving up on nonce {pending.tx['nonce']} on {network} after {self.abandon_after_blocks} blocks")
+            self.abandon(pending)
+
+        stuck = [
+            pending for pending in set(tracked.values())
+            if pending.tracked and not pending.done.is_set() and pending.broadcast_block is not None
+            and head - pending.broadcast_block >= self.replacement_after_blocks * (pending.replacements + 1)
+        ]
+        if not stuck:
+            return
+
+        # Confirm directly before bumping, in case inclusion landed before tracking started
+        hashes = [(pending, tx_hash) for pending in stuck for tx_hash in pending.tx_hashes]
+        receipts = self.connections.batch_request(
+            network, [('eth_getTransactionReceipt', [tx_hash]) for _, tx_hash in hashes]
+        )
+        for (pending, _), response in zip(hashes, receipts):
+            if response['result'] and not pending.done.is_set():
+                self._complete(pending, response['result'])
+
+        for pending in stuck:
+            if not pending.done.is_set():
+                self._replace(pending, head)
+
+    def _complete(self, pending: PendingTransaction, receipt: Dict):
+        pending.receipt = receipt
+        pending.done.set()
+        self._release(pending)
+
+    def abandon(self, pending: PendingTransaction):
+        """Stop tracking a transaction its caller gave up waiting for"""
+        self._release(pending)
+
+    def _release(self, pending: PendingTransaction):
+        """Forget a transaction's hashes, and its sender's key once none of the sender's transactions are tracked"""
+        sender = pending.tx['from'].lower()
+        with self._lock:
+            if not pending.tracked:
+                return
+            pending.tracked = False
+            for tx_hash in pending.tx_hashes:
+                self._pending.pop(tx_hash, None)
+            self._signer_refs[sender] -= 1
+            if not self._signer_refs[sender]:
+                del self._signer_refs[sender]
+                del self._signers[sender]
+
+    def _replace(self, pending: PendingTransaction, head: int):
+        """Re-sign a stuck transaction at the same nonce with bumped fees and rebroadcast it"""
+        if pending.replacements >= self.max_replacements:
+            return
+
+        with self._lock:
+            private_key = self._signers.get(pending.tx['from'].lower()) if pending.tracked else None
+        if not private_key:
+            return
+
+        tx = dict(pending.tx)
+        for field in ('maxFeePerGas', 'maxPriorityFeePerGas', 'gasPrice'):
+            if field in tx:
+                tx[field] = int(tx[field] * self.fee_bump)
+
+        signed = Account.sign_transaction({k: v for k, v in tx.items() if k != 'from'}, private_key)
+        response = self.connections.batch_request(
+            pending.network, [('eth_sendRawTransaction', [Web3.to_hex(signed.rawTransaction)])]
+        )[0]
+        if response['error']:
+            logger.warning(f"Replacement for nonce {tx['nonce']} on {pending.network} failed: {response['error']}")
+            return
+
+        pending.tx = tx
+        pending.replacements += 1
+        pending.tx_hashes.append(response['result'])
+        with self._lock:
+            if pending.tracked:
+                self._pending[response['result']] = pending
+        logger.info(f"Replaced stuck transaction nonce {tx['nonce']} on {pending.network} at block {head}")
+
+class TransactionPipeline:
+    """Signs and broadcasts a set of transfers from one account as a single pipeline"""
+
+    def __init__(self, networks: Dict[str, Dict], nonce_manager: NonceManager = None, receipt_watcher: ReceiptWatcher = None):
+        self.networks = networks
+        self.connections = get_connection_registry()
+        self.nonce_manager = nonce_manager or NonceManager()
+        self.receipt_watcher = receipt_watcher or ReceiptWatcher()
+
+    def get_fee_fields(self, network: str) -> Dict:
+        """Fee fields for new transactions, taken from the gas oracle's fast tier"""
+        estimates = get_gas_oracle(network).get_estimates()
+        if estimates and estimates['fast']['max_fee_per_gas'] is not None:
+            return {
+                'maxFeePerGas': estimates['fast']['max_fee_per_gas'],
+                'maxPriorityFeePerGas': estimates['fast']['max_priority_fee_per_gas']
+            }
+        if estimates and estimates['fast']['gas_price']:
+            return {'gasPrice': estimates['fast']['gas_price']}
+
+        w3 = self.connections.get_connection(network)
+        return {'gasPrice': w3.eth.gas_price}
+
+    def build_and_sign(
+        self,
+        network: str,
+        private_key: str,
+        transfers: List[Dict],
+        gas_limit: int = 21000
+    ) -> List[Tuple[Dict, str]]:
+        """Allocate nonces and sign every transfer; each needs 'value' (wei) and 'to', unless it deploys a contract"""
+        account = Account.from_key(private_key)
+        nonces = self.nonce_manager.allocate(network, account.address, len(transfers))
+        fee_fields = self.get_fee_fields(network)
+        chain_id = self.networks[network]['chain_id']
+
+        signed = []
+        for transfer, nonce in zip(transfers, nonces):
+            tx = {
+                'chainId': chain_id,
+                'nonce': nonce,
+                'value': int(transfer['value']),
+                'gas': transfer.get('gas', gas_limit),
+                'data': transfer.get('data', b''),
+                **fee_fields
+            }
+            if transfer.get('to'):
+                tx['to'] = Web3.to_checksum_address(transfer['to'])
+            raw = Account.sign_transaction(tx, private_key).rawTransaction
+            signed.append((dict(tx, **{'from': account.address}), Web3.to_hex(raw)))
+        return signed
+
+    def broadcast(self, network: str, signed: List[Tuple[Dict, str, str]]) -> List[Tuple[Dict, Optional[PendingTransaction]]]:
+        """Send (tx, raw, private_key) triples, possibly from many signers, in one batch and track their receipts"""
+        broadcast_block = self.receipt_watcher.block_watcher.poll(network)
+
+        # Every signed transaction goes out in one batch payload
+        responses = self.connections.batch_request(
+            network, [('eth_sendRawTransaction', [raw]) for _, raw, _ in signed]
+        )
+
+        broadcasts = []
+        rejected: Dict[str, Dict[int, str]] = {}  # sender -> {rejected nonce: private key}
+        accepted: Dict[str, int] = {}  # sender -> highest accepted nonce
+        for (tx, raw, private_key), response in zip(signed, responses):
+            if response['error']:
+                broadcasts.append(({'status': 'failed', 'transaction_hash': None, 'nonce': tx['nonce'], 'error': response['error']}, None))
+                rejected.setdefault(tx['from'], {})[tx['nonce']] = private_key
+                continue
+
+            pending = PendingTransaction(network, tx, response['result'], broadcast_block)
+            self.receipt_watcher.track(pending, private_key)
+            broadcasts.append(({'status': 'pending', 'transaction_hash': response['result'], 'nonce': tx['nonce'], 'error': None}, pending))
+            accepted[tx['from']] = max(accepted.get(tx['from'], tx['nonce']), tx['nonce'])
+
+        # A rejected nonce strands every later transaction from the same sender, and fee bumps cannot
+        # clear a gap; fill each one with a zero-value self-transfer so the accepted ones still go through
+        gaps = [
+            (sender, nonce, private_key)
+            for sender, nonces in rejected.items()
+            for nonce, private_key in sorted(nonces.items())
+            if nonce < accepted.get(sender, -1)
+        ]
+        if gaps:
+            self._fill_nonce_gaps(network, gaps, broadcast_block)
+
+        # Re-read the pending count next time rather than trusting the local nonce
+        for sender in rejected:
+            self.nonce_manager.reset(network, sender)
+        self.receipt_watcher.catch_up(network)
+        return broadcasts
+
+    def _fill_nonce_gaps(self, network: str, gaps: List[Tuple[str, int, str]], broadcast_block: Optional[int]):
+        """Broadcast one tracked self-transfer per (sender, nonce, private_key) gap at current fees"""
+        fee_fields = self.get_fee_fields(network)
+        fillers = []
+        for sender, nonce, private_key in gaps:
+            tx = {
+                'chainId': self.networks[network]['chain_id'],
+                'nonce': nonce,
+                'to': Web3.to_checksum_address(sender),
+                'value': 0,
+                'gas': 21000,
+                'data': b'',
+                **fee_fields
+            }
+            raw = Web3.to_hex(Account.sign_transaction(tx, private_key).rawTransaction)
+            fillers.append((dict(tx, **{'from': sender}), raw, private_key))
+
+        responses = self.connections.batch_request(network, [('eth_sendRawTransaction', [raw]) for _, raw, _ in fillers])
+        for (tx, _, private_key), response in zip(fillers, responses):
+            if response['error']:
+                logger.error(f"Could not fill nonce gap {tx['nonce']} for {tx['from']} on {network}: {response['error']}")
+                continue
+            self.receipt_watcher.track(PendingTransaction(network, tx, response['result'], broadcast_block), private_key)
+            logger.warning(f"Filled nonce gap {tx['nonce']} for {tx['from']} on {network} after a rejected broadcast")
+
+    @staticmethod
+    def apply_receipt(result: Dict, pending: PendingTransaction) -> Dict:
+        """Fill a broadcast result from the receipt of a completed pending transaction"""
+        receipt = pending.receipt
+        result['transaction_hash'] = receipt['transactionHash']
+        result['block_number'] = int(receipt['blockNumber'], 16)
+        result['gas_used'] = int(receipt['gasUsed'], 16)
+        result['effective_gas_price'] = int(receipt.get('effectiveGasPrice') or '0x0', 16)
+        result['contract_address'] = receipt.get('contractAddress')
+        result['replacements'] = pending.replacements
+        if int(receipt['status'], 16) == 1:
+            result['status'] = 'completed'
+        else:
+            result['status'] = 'failed'
+            result['error'] = 'Transaction reverted'
+        return result
+
+    def execute(
+        self,
+        network: str,
+        private_key: str,
+        transfers: List[Dict],
+        timeout: float = 600,
+        gas_limit: int = 21000
+    ) -> List[Dict]:
+        """Sign, broadcast and confirm transfers, returning one result per transfer in input order"""
+        signed = self.build_and_sign(network, private_key, transfers, gas_limit)
+        broadcasts = self.broadcast(network, [(tx, raw, private_key) for tx, raw in signed])
+
+        deadline = time.monotonic() + timeout
+        for result, pending in broadcasts:
+            if pending is None:
+                continue
+            if not pending.done.wait(max(0.0, deadline - time.monotonic())):
+                self.receipt_watcher.abandon(pending)
+                result['error'] = 'Timed out waiting for receipt'
+                continue
+            self.apply_receipt(result, pending)
+
+        return [result for result, _ in broadcasts]
+
+_pipeline = None
+_pipeline_lock = threading.Lock()
+
+def get_transaction_pipeline(networks: Dict[str, Dict]) -> TransactionPipeline:
+    """Return the process-wide transaction pipeline"""
+    global _pipeline
+    if _pipeline is None:
+        with _pipeline_lock:
+            if _pipeline is None:
+                _pipeline = TransactionPipeline(networks)
+    return _pipeline
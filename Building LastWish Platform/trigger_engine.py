@@ -0,0 +1,521 @@
+"""
+Trigger Engine for LastWish Crypto Inheritance
+Evaluates dead-man-switch deadlines from a hierarchical timing wheel fed by indexed next_due_at columns
+"""
+
+import os
+import threading
+import time
+import logging
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Hashable, List, Optional
+
+import requests
+from web3 import Web3
+
+from models.user import db
+from models.crypto_assets import CryptoInheritancePlan, InheritanceStatus
+from models import estate_models
+from utils.transaction_pipeline import get_transaction_pipeline
+from utils.event_indexer import get_indexed_event_summaries
+
+logger = logging.getLogger(__name__)
+
+TRIGGER_INHERITANCE_SELECTOR = bytes(Web3.keccak(text='triggerInheritance()')[:4])
+
+# A plan with a contract past its deadline stays in this state until triggerInheritance() is mined
+TRIGGER_PENDING = 'trigger_pending'
+
+# How often a pending trigger is re-checked against the event index and attempted again
+TRIGGER_RETRY_INTERVAL = timedelta(hours=1)
+
+# Fired for each later attempt; only handlers registered for it by name receive it, so notifiers hear of a plan once
+TRIGGER_RETRY_EVENT = 'trigger_retry'
+
+class TimingWheel:
+    """Hierarchical timing wheel: O(1) insert, amortized O(1) per tick
+
+    Level n has `slots` buckets each spanning slots**n ticks; entries cascade down a level as
+    their bucket comes round, and fire from level 0. Keys rescheduled or removed are dropped lazily.
+    """
+
+    def __init__(self, tick_seconds: float = 1.0, slot_bits: int = 6, levels: int = 6, start: Optional[float] = None):
+        self.tick_seconds = tick_seconds
+        self.slot_bits = slot_bits
+        self.slots = 1 << slot_bits
+        self.levels = levels
+        self.current_tick = int((time.time() if start is None else start) / tick_seconds)
+
+        self._wheels = [[[] for _ in range(self.slots)] for _ in range(levels)]
+        self._due: Dict[Hashable, int] = {}  # key -> due tick of its live entry
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._due)
+
+    def insert(self, key: Hashable, due_time: float):
+        """Schedule key at due_time (unix seconds), replacing any earlier schedule; overdue keys fire next tick"""
+        with self._lock:
+            due_tick = max(int(-(-due_time // self.tick_seconds)), self.current_tick + 1)
+            if self._due.get(key) == due_tick:
+                return
+            self._due[key] = due_tick
+            self._place(key, due_tick)
+
+    def remove(self, key: Hashable):
+        with self._lock:
+            self._due.pop(key, None)
+
+    def _place(self, key: Hashable, due_tick: int):
+        delta = due_tick - self.current_tick
+        level = 0
+        while level < self.levels - 1 and delta >= 1 << (self.slot_bits * (level + 1)):
+            level += 1
+        slot = (due_tick >> (self.slot_bits * level)) & (self.slots - 1)
+        self._wheels[level][slot].append((due_tick, key))
+
+    def advance(self, now: Optional[float] = None) -> List[Hashable]:
+        """Move the wheel up to now and return the keys that came due"""
+        target = int((time.time() if now is None else now) / self.tick_seconds)
+        expired = []
+        with self._lock:
+            while self.current_tick < target:
+                self.current_tick += 1
+                tick = self.current_tick
+
+                # When a lower level wraps, redistribute the next bucket of the level above
+                for level in range(1, self.levels):
+                    if tick & ((1 << (self.slot_bits * level)) - 1):
+                        break
+                    slot = (tick >> (self.slot_bits * level)) & (self.slots - 1)
+                    bucket, self._wheels[level][slot] = self._wheels[level][slot], []
+                    for due_tick, key in bucket:
+                        if self._due.get(key) == due_tick:
+                            self._place(key, due_tick)
+
+                bucket, self._wheels[0][tick & (self.slots - 1)] = self._wheels[0][tick & (self.slots - 1)], []
+                for due_tick, key in bucket:
+                    if self._due.get(key) != due_tick:
+                        continue
+                    if due_tick <= tick:
+                        del self._due[key]
+                        expired.append(key)
+                    else:
+                        # Beyond the top level's span; goes round again
+                        self._place(key, due_tick)
+        return expired
+
+class TriggerSource:
+    """A table with an indexed next_due_at column and how to evaluate one of its rows when due"""
+
+    def __init__(
+        self,
+        name: str,
+        model,
+        database,
+        pending_filter: Callable[[], object],
+        compute_due: Callable[[object], Optional[datetime]],
+        evaluate: Callable[[object, datetime], List[Dict]]
+    ):
+        self.name = name
+        self.model = model
+        self.database = database  # Flask-SQLAlchemy instance that owns the model
+        self.pending_filter = pending_filter  # callable() -> filter clause for rows that can still fire
+        self.compute_due = compute_due  # callable(row) -> deadline for the row's current stage
+        self.evaluate = evaluate  # callable(row, now) -> events; updates row.next_due_at
+
+def plan_onchain_events(plan: CryptoInheritancePlan) -> Dict[str, Dict]:
+    """Indexed event summaries of a plan's contract, {} for plans without a valid contract address"""
+    if not plan.smart_contract_network or not Web3.is_address(plan.smart_contract_address or ''):
+        return {}
+    address = Web3.to_checksum_address(plan.smart_contract_address)
+    return get_indexed_event_summaries(plan.smart_contract_network.value, [address]).get(address, {})
+
+def plan_next_due_at(plan: CryptoInheritancePlan) -> Optional[datetime]:
+    """Inactivity deadline of a plan that has not been triggered yet
+
+    Runs from the latest of the owner's check-in and the contract's indexed ActivityRecorded
+    events, so the deadline matches the lastActivity the contract itself enforces.
+    """
+    if plan.plan_status == InheritanceStatus.EXECUTED or plan.execution_status not in (None, TRIGGER_PENDING):
+        return None
+    inactivity_period = (plan.trigger_conditions or {}).get('inactivity_period', 365)
+    activity = plan_onchain_events(plan).get('ActivityRecorded')
+    onchain_activity = datetime.utcfromtimestamp(activity['last_timestamp']) if activity and activity['last_timestamp'] else None
+    last_activity = max(d for d in (plan.last_verification, onchain_activity, plan.created_at or datetime.utcnow()) if d is not None)
+    return last_activity + timedelta(days=inactivity_period)
+
+def _plan_event(plan: CryptoInheritancePlan, event: str, now: datetime) -> Dict:
+    return {
+        'event': event,
+        'source': 'crypto_inheritance_plans',
+        'id': plan.id,
+        'user_id': plan.user_id,
+        'network': plan.smart_contract_network.value if plan.smart_contract_network else None,
+        'contract_address': plan.smart_contract_address,
+        'fired_at': now.isoformat()
+    }
+
+def mark_plan_triggered(plan: CryptoInheritancePlan, now: datetime):
+    """Start a triggered plan's time delay"""
+    plan.execution_status = 'triggered'
+    plan.next_due_at = now + timedelta(days=plan.time_delay or 0)
+
+def _evaluate_plan(plan: CryptoInheritancePlan, now: datetime) -> List[Dict]:
+    """Advance a plan through inactivity -> (contract triggered) -> time delay -> ready for execution"""
+    if plan.execution_status == 'triggered':
+        plan.execution_status = 'awaiting_execution'
+        plan.next_due_at = None
+        return [_plan_event(plan, 'time_delay_elapsed', now)]
+
+    # Activity recorded since the deadline was stored, or since a trigger attempt, moves it later instead of firing
+    deadline = plan_next_due_at(plan)
+    if deadline is None or deadline > now:
+        if plan.execution_status == TRIGGER_PENDING:
+            plan.execution_status = None
+        plan.next_due_at = deadline
+        return []
+
+    first_attempt = plan.execution_status is None
+    if not plan.smart_contract_address or 'InheritanceTriggered' in plan_onchain_events(plan):
+        mark_plan_triggered(plan, now)
+        return [_plan_event(plan, 'inactivity_threshold_reached', now)] if first_attempt else []
+
+    # ContractTriggerHandler marks the plan triggered once the transaction succeeds; until then it is retried
+    plan.execution_status = TRIGGER_PENDING
+    plan.next_due_at = now + TRIGGER_RETRY_INTERVAL
+    return [_plan_event(plan, 'inactivity_threshold_reached' if first_attempt else TRIGGER_RETRY_EVENT, now)]
+
+def smart_contract_next_due_at(contract) -> Optional[datetime]:
+    """Heartbeat or time-based deadline of an estate smart contract that is still live"""
+    if contract.status not in ('deployed', 'active'):
+        return None
+    started = contract.deployed_at or contract.created_at or datetime.utcnow()
+    if contract.trigger_condition == 'heartbeat' and contract.heartbeat_frequency:
+        return (contract.last_heartbeat or started) + timedelta(days=contract.heartbeat_frequency)
+    if contract.trigger_condition == 'time_based' and contract.trigger_duration:
+        return started + timedelta(days=contract.trigger_duration)
+    return None
+
+def _evaluate_smart_contract(contract, now: datetime) -> List[Dict]:
+    deadline = smart_contract_next_due_at(contract)
+    if deadline is None or deadline > now:
+        contract.next_due_at = deadline
+        return []
+
+    contract.status = 'triggered'
+    contract.triggered_at = now
+    contract.next_due_at = None
+    return [{
+        'event': 'heartbeat_missed' if contract.trigger_condition == 'heartbeat' else 'trigger_duration_elapsed',
+        'source': 'smart_contracts',
+        'id': contract.id,
+        'user_id': contract.user_id,
+        'network': contract.network,
+        'contract_address': contract.contract_address,
+        'fired_at': now.isoformat()
+    }]
+
+def default_sources() -> List[TriggerSource]:
+    """Inheritance plans and estate smart contracts"""
+    SmartContract = estate_models.SmartContract
+    return [
+        TriggerSource(
+            'crypto_inheritance_plans', CryptoInheritancePlan, db,
+            lambda: (CryptoInheritancePlan.plan_status != InheritanceStatus.EXECUTED) & (
+                CryptoInheritancePlan.execution_status.is_(None) |
+                CryptoInheritancePlan.execution_status.in_(['triggered', TRIGGER_PENDING])
+            ),
+            plan_next_due_at,
+            _evaluate_plan
+        ),
+        TriggerSource(
+            'smart_contracts', SmartContract, estate_models.db,
+            lambda: SmartContract.status.in_(['deployed', 'active']),
+            smart_contract_next_due_at,
+            _evaluate_smart_contract
+        )
+    ]
+
+class N8nWebhookNotifier:
+    """Posts trigger events to the n8n automation webhook, if one is configured"""
+
+    def __init__(self, webhook_url: Optional[str] = None, timeout: float = 10):
+        self.webhook_url = webhook_url if webhook_url is not None else os.environ.get('N8N_WEBHOOK_URL')
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def __call__(self, event: Dict):
+        if not self.webhook_url:
+            logger.info(f"Trigger event {event['event']} for {event['source']} {event['id']}")
+            return
+        response = self.session.post(self.webhook_url, json=event, timeout=self.timeout)
+        response.raise_for_status()
+
+class ContractTriggerHandler:
+    """Calls triggerInheritance() on a plan's contract once its inactivity threshold is reached
+
+    Waits for the receipt on the trigger worker and only marks the plan triggered if the call
+    succeeded; a reverted or unmined call leaves it pending for the engine to retry.
+    """
+
+    def __init__(self, networks: Dict[str, Dict], key_provider: Callable[[int], Optional[str]], gas_limit: int = 80000, receipt_timeout: float = 600):
+        self.networks = networks
+        self.key_provider = key_provider  # callable(plan_id) -> owner or authorized trigger key
+        self.gas_limit = gas_limit
+        self.receipt_timeout = receipt_timeout
+        self.pipeline = get_transaction_pipeline(networks)
+
+    def __call__(self, event: Dict):
+        if event['source'] != 'crypto_inheritance_plans' or not event.get('contract_address'):
+            return
+        if event['network'] not in self.networks:
+            return
+
+        plan = db.session.get(CryptoInheritancePlan, event['id'])
+        if plan is None or plan.execution_status != TRIGGER_PENDING:
+            return
+
+        private_key = self.key_provider(event['id'])
+        if not private_key:
+            logger.warning(f"No trigger key for plan {event['id']}; contract must be triggered manually")
+            return
+
+        tx, raw = self.pipeline.build_and_sign(
+            event['network'],
+            private_key,
+            [{'to': event['contract_address'], 'value': 0, 'data': TRIGGER_INHERITANCE_SELECTOR}],
+            gas_limit=self.gas_limit
+        )[0]
+        result, pending = self.pipeline.broadcast(event['network'], [(tx, raw, private_key)])[0]
+        if pending is None:
+            raise RuntimeError(f"triggerInheritance broadcast failed: {result['error']}")
+        if not pending.done.wait(self.receipt_timeout):
+            self.pipeline.receipt_watcher.abandon(pending)
+            raise RuntimeError(f"triggerInheritance {result['transaction_hash']} not mined after {self.receipt_timeout}s")
+
+        self.pipeline.apply_receipt(result, pending)
+        if result['status'] != 'completed':
+            raise RuntimeError(f"triggerInheritance {result['transaction_hash']} failed: {result['error']}")
+
+        # Another attempt or a check-in may have moved the plan on while the transaction was mined
+        db.session.refresh(plan)
+        if plan.execution_status != TRIGGER_PENDING:
+            return
+        mark_plan_triggered(plan, datetime.utcnow())
+        db.session.commit()
+        get_trigger_engine().schedule('crypto_inheritance_plans', plan.id, plan.next_due_at)
+        logger.info(f"Triggered inheritance contract {event['contract_address']} for plan {plan.id}")
+
+class TriggerEngine:
+    """Loads deadlines due within a horizon into a timing wheel and evaluates them on a bounded worker pool"""
+
+    def __init__(
+        self,
+        sources: List[TriggerSource] = None,
+        tick_seconds: float = 1.0,
+        horizon: timedelta = timedelta(hours=6),
+        refill_interval: int = 300,
+        batch_size: int = 200,
+        max_workers: int = 8,
+        max_pending_batches: int = 32
+    ):
+        self.sources = {s.name: s for s in (sources if sources is not None else default_sources())}
+        self.tick_seconds = tick_seconds
+        self.horizon = horizon
+        self.refill_interval = refill_interval
+        self.batch_size = batch_size
+
+        self.wheel = TimingWheel(tick_seconds)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='trigger-worker')
+        # Bounds queued work so a burst of deadlines applies backpressure to the tick thread
+        self._slots = threading.BoundedSemaphore(max_pending_batches)
+
+        self._handlers: Dict[Optional[str], List[Callable[[Dict], None]]] = defaultdict(list)
+        self._loaded_until: Dict[str, datetime] = {}
+        self._active_sources: List[str] = []
+        self._app = None
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def add_handler(self, handler: Callable[[Dict], None], event: Optional[str] = None):
+        """Call handler(event) for every fired event except retries, or only for events with the given name"""
+        self._handlers[event].append(handler)
+
+    def start(self, app):
+        """Run the wheel on a background thread inside the given application's context"""
+        if self._thread and self._thread.is_alive():
+            return
+
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._app = app
+            self._stop_event.clear()
+            self._thread = threading.Thread(
+                target=self._run_loop,
+                name='trigger-engine',
+                daemon=True
+            )
+            self._thread.start()
+
+    def stop(self):
+        """Stop the tick thread and let queued evaluations finish"""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+        self.executor.shutdown(wait=True)
+
+    def schedule(self, source_name: str, row_id: int, due_at: Optional[datetime]):
+        """Put a changed deadline on the wheel if it falls inside the loaded horizon"""
+        key = (source_name, row_id)
+        if due_at is None:
+            self.wheel.remove(key)
+            return
+        loaded_until = self._loaded_until.get(source_name)
+        if loaded_until is not None and due_at <= loaded_until:
+            self.wheel.insert(key, self._timestamp(due_at))
+
+    def get_stats(self) -> Dict:
+        return {
+            'sources': list(self._active_sources),
+            'wheel_entries': len(self.wheel),
+            'loaded_until': {name: until.isoformat() for name, until in self._loaded_until.items()}
+        }
+
+    @staticmethod
+    def _timestamp(value: datetime) -> float:
+        # Deadlines are stored as naive UTC
+        return (value - datetime(1970, 1, 1)).total_seconds()
+
+    def _run_loop(self):
+        with self._app.app_context():
+            for name, source in self.sources.items():
+                try:
+                    self.backfill(source)
+                    self._active_sources.append(name)
+                except Exception as e:
+                    logger.warning(f"Trigger source {name} unavailable: {str(e)}")
+                finally:
+                    source.database.session.remove()
+
+        next_refill = 0.0
+        while not self._stop_event.is_set():
+            now = time.time()
+            if now >= next_refill:
+                self._refill()
+                next_refill = now + self.refill_interval
+
+            self._dispatch(self.wheel.advance(now))
+            next_tick = (self.wheel.current_tick + 1) * self.tick_seconds
+            self._stop_event.wait(max(0.0, next_tick - time.time()))
+
+    def backfill(self, source: TriggerSource) -> int:
+        """Compute next_due_at for live rows that predate the column, in keyset batches"""
+        updated = 0
+        last_id = 0
+        while True:
+            rows = source.model.query.filter(
+                source.pending_filter(),
+                source.model.next_due_at.is_(None),
+                source.model.id > last_id
+            ).order_by(source.model.id).limit(self.batch_size).all()
+            if not rows:
+                break
+            last_id = rows[-1].id
+            for row in rows:
+                row.next_due_at = source.compute_due(row)
+                updated += row.next_due_at is not None
+            source.database.session.commit()
+        return updated
+
+    def _refill(self):
+        """Load deadlines up to now + horizon that are not on the wheel yet, one index range scan per source"""
+        horizon_end = datetime.utcnow() + self.horizon
+        with self._app.app_context():
+            for name in self._active_sources:
+                source = self.sources[name]
+                try:
+                    query = source.model.query.filter(
+                        source.pending_filter(),
+                        source.model.next_due_at <= horizon_end
+                    )
+                    loaded_until = self._loaded_until.get(name)
+                    if loaded_until is not None:
+                        query = query.filter(source.model.next_due_at > loaded_until)
+                    for row_id, due_at in query.with_entities(source.model.id, source.model.next_due_at):
+                        self.wheel.insert((name, row_id), self._timestamp(due_at))
+                    self._loaded_until[name] = horizon_end
+                except Exception as e:
+                    logger.error(f"Error loading {name} deadlines: {str(e)}")
+                finally:
+                    source.database.session.remove()
+
+    def _dispatch(self, keys: List[tuple]):
+        by_source = defaultdict(list)
+        for source_name, row_id in keys:
+            by_source[source_name].append(row_id)
+
+        for source_name, row_ids in by_source.items():
+            for start in range(0, len(row_ids), self.batch_size):
+                self._slots.acquire()
+                future = self.executor.submit(self._evaluate_batch, source_name, row_ids[start:start + self.batch_size])
+                future.add_done_callback(lambda _: self._slots.release())
+
+    def _evaluate_batch(self, source_name: str, row_ids: List[int]):
+        """Re-check due rows, advance their state, commit, then fire their events"""
+        source = self.sources[source_name]
+        now = datetime.utcnow()
+        events = []
+        with self._app.app_context():
+            try:
+                # Every worker process runs an engine; rows another one is evaluating are skipped, and
+                # are no longer due once it commits. SQLite has no row locks and compiles this away.
+                rows = source.model.query.filter(
+                    source.model.id.in_(row_ids), source.pending_filter()
+                ).with_for_update(skip_locked=True).all()
+                for row in rows:
+                    # Rows whose deadline moved since they were loaded are only put back on the wheel
+                    if row.next_due_at is not None and row.next_due_at <= now:
+                        events.extend(source.evaluate(row, now))
+                source.database.session.commit()
+
+                for row in rows:
+                    self.schedule(source_name, row.id, row.next_due_at)
+            except Exception as e:
+                source.database.session.rollback()
+                logger.error(f"Error evaluating {source_name} triggers: {str(e)}")
+                return
+            finally:
+                source.database.session.remove()
+
+        if not events:
+            return
+        # Handlers may read and update rows themselves
+        with self._app.app_context():
+            try:
+                for event in events:
+                    wildcard = [] if event['event'] == TRIGGER_RETRY_EVENT else self._handlers.get(None, [])
+                    for handler in wildcard + self._handlers.get(event['event'], []):
+                        try:
+                            handler(event)
+                        except Exception as e:
+                            db.session.rollback()
+                            logger.error(f"Trigger handler failed for {event['event']} on {source_name} {event['id']}: {str(e)}")
+            finally:
+                db.session.remove()
+
+_engine = None
+_engine_lock = threading.Lock()
+
+def get_trigger_engine() -> TriggerEngine:
+    """Return the process-wide trigger engine"""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = TriggerEngine()
+    return _engine